@@ -2,11 +2,11 @@ import sys
 sys.path.append(".")  # allows for importing from the current directory
 
 import nltk
-from flask import Flask, jsonify, request
+from flask import Flask, Response, request
 from flask_cors import CORS
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from ranking_challenge.request import RankingRequest
-from ranking_challenge.response import RankingResponse
+from ranking_challenge.response import encode_ranking_response
 from ranking_challenge.grafana_metrics_middleware import GrafanaMetricsMiddleware
 
 from sample_data import NEW_POSTS
@@ -51,17 +51,15 @@ def analyze_sentiment():
     new_post = NEW_POSTS[0]
     ranked_ids.insert(0, new_post["id"])
 
-    result = {
-        "ranked_ids": ranked_ids,
-        "new_items": [
-            {
-                "id": new_post["id"],
-                "url": new_post["url"],
-            }
-        ],
-    }
+    new_items = [
+        {
+            "id": new_post["id"],
+            "url": new_post["url"],
+        }
+    ]
 
-    RankingResponse(**result)  # ensure that the response is valid as a side-effect
+    # Serialize the response directly; in debug mode it is also validated as a side-effect
+    body = encode_ranking_response(ranked_ids, new_items, debug=app.debug)
 
     # Add custom metrics
     grafana_middleware.add_custom_metric("request_count", 1, "Number of requests processed")
@@ -69,7 +67,7 @@ def analyze_sentiment():
         average_sentiment = total_sentiment / len(ranked_results)
         grafana_middleware.add_custom_metric("average_sentiment", average_sentiment, "Average sentiment score")
 
-    return jsonify(result)
+    return Response(body, mimetype="application/json")
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
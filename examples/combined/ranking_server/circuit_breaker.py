@@ -0,0 +1,135 @@
+"""Circuit breaker for calls to a dependency that may get overloaded, such as the scorers.
+
+When the scorer queue backs up, every scoring call waits out its full deadline. Without a
+breaker, each request then pays that wait, and the extra load keeps the queue backed up. The
+breaker watches the outcome of recent calls (and, optionally, a load signal such as the
+queue depth), and stops making calls while the dependency is struggling:
+
+ - CLOSED: calls go through. If at least `failure_rate` of the last `window` calls failed,
+   or the load signal exceeds `max_load`, the breaker opens.
+ - OPEN: calls are refused, and the caller falls back to something cheaper. After
+   `reset_seconds`, the breaker lets a probe call through.
+ - HALF_OPEN: one probe call is in flight, the others are refused. If the probe succeeds
+   the breaker closes, and if it fails the breaker opens again. A probe that hasn't
+   reported back after another `reset_seconds` is replaced by a new one.
+"""
+
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+from enum import IntEnum
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """Failure-rate and load based circuit breaker.
+
+    Args:
+        name (str): Label for the metrics and logs.
+        failure_rate (float): Fraction of failed calls in the window that opens the breaker.
+        window (int): Number of recent calls the failure rate is computed over.
+        min_calls (int): Calls needed in the window before the failure rate counts.
+        reset_seconds (float): Time an open breaker waits before letting a probe through.
+        max_load (float | None): Load (e.g. queue depth) that opens the breaker; see
+            `observe_load`. None disables this check.
+        registry (CollectorRegistry | None): If given, the state and transitions are
+            exported to this Prometheus registry.
+        clock (Callable[[], float]): Monotonic time source, replaceable for tests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        reset_seconds: float = 5.0,
+        max_load: float | None = None,
+        registry: CollectorRegistry | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_seconds = reset_seconds
+        self.max_load = max_load
+        self.clock = clock
+        self.state = BreakerState.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+
+        self._state_gauge = None
+        self._transition_counter = None
+        if registry is not None:
+            self._state_gauge = Gauge(
+                "circuit_breaker_state",
+                "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+                ["breaker"],
+                registry=registry,
+            ).labels(name)
+            self._state_gauge.set(self.state)
+            self._transition_counter = Counter(
+                "circuit_breaker_transitions_total",
+                "Circuit breaker state changes, by the state changed to",
+                ["breaker", "state"],
+                registry=registry,
+            )
+
+    def allow(self) -> bool:
+        """Whether to make a call now. A call that is allowed must report its `record`."""
+        if self.state == BreakerState.OPEN:
+            if self.clock() - self._opened_at < self.reset_seconds:
+                return False
+            self._transition(BreakerState.HALF_OPEN)
+            return True
+        if self.state == BreakerState.HALF_OPEN:
+            # the probe is the only call, unless it has not reported back in time
+            if self.clock() - self._probe_at < self.reset_seconds:
+                return False
+            self._probe_at = self.clock()
+        return True
+
+    def record(self, success: bool):
+        """Report the outcome of an allowed call."""
+        if self.state == BreakerState.HALF_OPEN:
+            self._outcomes.clear()
+            self._transition(BreakerState.CLOSED if success else BreakerState.OPEN)
+            return
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if (
+            self.state == BreakerState.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and failures >= self.failure_rate * len(self._outcomes)
+        ):
+            logger.warning(f"{self.name}: {failures}/{len(self._outcomes)} calls failed")
+            self._transition(BreakerState.OPEN)
+
+    def observe_load(self, load: float):
+        """Open the breaker if `load` exceeds `max_load`, without waiting for failures."""
+        overloaded = self.max_load is not None and load > self.max_load
+        if overloaded and self.state == BreakerState.CLOSED:
+            logger.warning(f"{self.name}: load {load} exceeds {self.max_load}")
+            self._transition(BreakerState.OPEN)
+
+    def _transition(self, state: BreakerState):
+        if state == BreakerState.OPEN:
+            self._opened_at = self.clock()
+        elif state == BreakerState.HALF_OPEN:
+            self._probe_at = self.clock()
+        logger.info(f"{self.name}: circuit breaker {self.state.name} -> {state.name}")
+        self.state = state
+        if self._state_gauge is not None:
+            self._state_gauge.set(state)
+            self._transition_counter.labels(self.name, state.name.lower()).inc()
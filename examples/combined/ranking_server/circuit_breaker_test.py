@@ -0,0 +1,78 @@
+from prometheus_client import CollectorRegistry
+
+from ranking_server.circuit_breaker import BreakerState, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_on_failure_rate_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker("scorer", failure_rate=0.5, window=4, min_calls=4, clock=clock)
+
+    for success in [True, False, True]:
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == BreakerState.CLOSED
+    breaker.record(False)
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+
+    # one probe after the reset time; it fails, so the breaker stays open
+    clock.now = 5
+    assert breaker.allow()
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == BreakerState.CLOSED
+    # the window starts afresh
+    breaker.record(False)
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_lost_probe_is_replaced():
+    clock = FakeClock()
+    breaker = CircuitBreaker("scorer", window=1, min_calls=1, clock=clock)
+    breaker.record(False)
+    clock.now = 5
+    assert breaker.allow()
+    clock.now = 9
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+
+
+def test_opens_on_load():
+    breaker = CircuitBreaker("scorer", max_load=100)
+    breaker.observe_load(100)
+    assert breaker.state == BreakerState.CLOSED
+    breaker.observe_load(101)
+    assert breaker.state == BreakerState.OPEN
+
+    CircuitBreaker("unbounded").observe_load(10**6)
+
+
+def test_metrics():
+    registry = CollectorRegistry()
+    breaker = CircuitBreaker("scorer", window=1, min_calls=1, registry=registry)
+    labels = {"breaker": "scorer"}
+    assert registry.get_sample_value("circuit_breaker_state", labels) == 0
+
+    breaker.record(False)
+
+    assert registry.get_sample_value("circuit_breaker_state", labels) == 2
+    assert (
+        registry.get_sample_value("circuit_breaker_transitions_total", {**labels, "state": "open"})
+        == 1
+    )
@@ -0,0 +1,116 @@
+"""Multi-pattern matching of named entities in item text.
+
+`EntityMatcher` is an Aho-Corasick automaton: it is built once per entity set, and then
+checks a text for all of the entities in a single pass, however many there are.
+`TopEntities` keeps the matcher for the entity set most recently published by the
+`count_top_named_entities` job, and only rebuilds it when a new version is published.
+"""
+
+import json
+from collections import deque
+from collections.abc import Iterable
+
+
+class EntityMatcher:
+    """Aho-Corasick automaton over a fixed set of entities.
+
+    Args:
+        entities (Iterable[str]): The strings to look for. Matching is case-sensitive, like
+            `entity in text`.
+        substring_search_max (int): Up to this many entities, `matches` runs one substring
+            search per entity instead: `str.__contains__` is native code, so it is faster
+            than walking the automaton in Python until there are about a hundred entities
+            (see `entity_matcher_benchmark.py`).
+    """
+
+    def __init__(self, entities: Iterable[str], substring_search_max: int = 64):
+        self.entities = frozenset(entities)
+        self._substring_search = len(self.entities) <= substring_search_max
+        # state 0 is the root; _out[s] is True when some entity ends at s or at one of
+        # its failure-link ancestors
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[bool] = [False]
+        for entity in self.entities:
+            state = 0
+            for ch in entity:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(False)
+                state = nxt
+            self._out[state] = True
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def matches(self, text: str) -> bool:
+        """True if any of the entities occurs in `text`."""
+        if self._substring_search:
+            return any(entity in text for entity in self.entities)
+        goto, fail, out = self._goto, self._fail, self._out
+        if out[0]:
+            return True  # the empty string is in every text
+        state = 0
+        for ch in text:
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if out[state]:
+                return True
+        return False
+
+
+class TopEntities:
+    """The matcher for the latest published set of top named entities.
+
+    The published record is versioned by its `timestamp`: the automaton is only rebuilt when
+    the timestamp changes, and replaced with a single assignment, so concurrent requests see
+    either the old matcher or the new one.
+    """
+
+    EMPTY = EntityMatcher(())
+
+    def __init__(self):
+        # (raw record, timestamp, matcher)
+        self._current: tuple[bytes | None, str | None, EntityMatcher] = (None, None, self.EMPTY)
+
+    @property
+    def version(self) -> str | None:
+        return self._current[1]
+
+    def matcher(self, raw_record: bytes | None) -> EntityMatcher:
+        """Return the matcher for a record read from redis, building it if it is new.
+
+        Args:
+            raw_record (bytes | None): The JSON record, with `timestamp` and
+                `top_named_entities` (a list of `[entity, count]` pairs), or None if nothing
+                has been published yet.
+        """
+        if raw_record is None:
+            return self.EMPTY
+        raw, version, matcher = self._current
+        if raw_record == raw:
+            return matcher
+
+        record = json.loads(raw_record)
+        if record.get("timestamp") is None or record["timestamp"] != version:
+            version = record.get("timestamp")
+            matcher = EntityMatcher(x[0] for x in record["top_named_entities"])
+        self._current = (raw_record, version, matcher)
+        return matcher
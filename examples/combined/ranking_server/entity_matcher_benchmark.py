@@ -0,0 +1,62 @@
+"""Compare the entity matcher with per-entity substring search.
+
+python -m ranking_server.entity_matcher_benchmark --entities 10 1000 10000
+"""
+
+import argparse
+import random
+import timeit
+
+from ranking_server.entity_matcher import EntityMatcher
+
+WORDS = [
+    "".join(random.Random(i).choice("abcdefghijklmnopqrstuvwxyz") for _ in range(3 + i % 8))
+    for i in range(50_000)
+]
+
+
+def fake_texts(n: int, words_per_text: int = 40) -> list[str]:
+    rng = random.Random(1)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_text)) for _ in range(n)]
+
+
+def fake_entities(n: int) -> list[str]:
+    rng = random.Random(2)
+    # two-word entities, so that hardly any text matches and every entity has to be checked
+    return [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}" for _ in range(n)]
+
+
+def run(entities: list[str], texts: list[str], repeat: int):
+    n = len(entities)
+    entity_set = set(entities)
+    build = min(timeit.repeat(lambda: EntityMatcher(entities, 0), number=1, repeat=repeat))
+    automaton = EntityMatcher(entities, substring_search_max=0)
+    matcher = EntityMatcher(entities)
+
+    results = {}
+    for name, fn in [
+        ("substring", lambda: [any(ne in text for ne in entity_set) for text in texts]),
+        ("automaton", lambda: [automaton.matches(text) for text in texts]),
+        ("matcher", lambda: [matcher.matches(text) for text in texts]),
+    ]:
+        results[name] = fn()
+        seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print(f"{n:>6} entities: {name:>9} {seconds * 1000:8.2f}ms/feed")
+    assert results["substring"] == results["automaton"] == results["matcher"]
+    print(f"{n:>6} entities: automaton built in {build * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--items", type=int, default=100, help="texts per feed")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = fake_texts(args.items)
+    for n in args.entities:
+        run(fake_entities(n), texts, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
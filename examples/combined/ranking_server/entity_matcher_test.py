@@ -0,0 +1,65 @@
+import json
+import random
+import string
+
+from ranking_server.entity_matcher import EntityMatcher, TopEntities
+
+
+def naive_matches(entities, text):
+    return any(ne in text for ne in entities)
+
+
+def test_overlapping_entities():
+    matcher = EntityMatcher(["he", "she", "his", "hers"], substring_search_max=0)
+    assert matcher.matches("ushers")
+    assert matcher.matches("ahishers")
+    assert not matcher.matches("hi thr, sh")
+    assert not matcher.matches("")
+
+
+def test_suffix_found_through_failure_links():
+    assert EntityMatcher(["abcd", "bc"], substring_search_max=0).matches("xabcx")
+    assert not EntityMatcher(["abcd", "bce"], substring_search_max=0).matches("xabcx")
+
+
+def test_matches_like_substring_search():
+    rng = random.Random(0)
+
+    def word(n):
+        return "".join(rng.choice("abc ") for _ in range(n))
+
+    for _ in range(200):
+        entities = [word(rng.randint(1, 5)) for _ in range(rng.randint(0, 10))]
+        text = word(rng.randint(0, 40))
+        expected = naive_matches(entities, text)
+        assert EntityMatcher(entities, substring_search_max=0).matches(text) == expected
+        assert EntityMatcher(entities).matches(text) == expected
+
+
+def test_case_sensitive_and_empty_entity():
+    assert not EntityMatcher(["Foo"], substring_search_max=0).matches("foo")
+    assert EntityMatcher([""], substring_search_max=0).matches("anything")
+    assert not EntityMatcher([], substring_search_max=0).matches(string.ascii_letters)
+
+
+def record(timestamp, entities):
+    return json.dumps(
+        {"timestamp": timestamp, "top_named_entities": [[x, 1] for x in entities]}
+    ).encode()
+
+
+def test_top_entities_rebuilds_only_on_new_version():
+    top_entities = TopEntities()
+    assert top_entities.matcher(None) is TopEntities.EMPTY
+
+    first = top_entities.matcher(record("2024-06-01T00:00:00", ["foo"]))
+    assert first.matches("a foo")
+    assert top_entities.version == "2024-06-01T00:00:00"
+    assert top_entities.matcher(record("2024-06-01T00:00:00", ["foo"])) is first
+    # same version, re-serialized differently
+    same = json.dumps({"top_named_entities": [["foo", 1]], "timestamp": "2024-06-01T00:00:00"})
+    assert top_entities.matcher(same.encode()) is first
+
+    second = top_entities.matcher(record("2024-06-01T00:05:00", ["bar"]))
+    assert second is not first
+    assert second.matches("a bar") and not second.matches("a foo")
@@ -1,14 +1,30 @@
-import json
+import asyncio
 import logging
+import math
 import os
-from concurrent.futures.thread import ThreadPoolExecutor
+import time
+from contextlib import asynccontextmanager
 
 import redis
+import redis.asyncio as aioredis
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CollectorRegistry, Counter
+from ranking_challenge.prometheus_metrics_otel_middleware import expose_metrics
 from ranking_challenge.request import RankingRequest
 from ranking_challenge.response import RankingResponse
-from scorer_worker.scorer_basic import compute_scores as compute_scores_basic
+from scorer_worker.celery_app import BACKEND, INTERACTIVE_QUEUE, PREFETCH_QUEUE
+from scorer_worker.score_cache import AsyncScoreCache
+from scorer_worker.scorer_advanced import ScorerType, ScoringInput, ScoringOutput
+from scorer_worker.scorer_async import compute_scores_async
+from scorer_worker.scorer_local import LocalScorer
+from scorer_worker.scoring_metrics import ScoringMetrics
+from scorer_worker.tracing import setup_tracing, shutdown_tracing, span
+
+from ranking_server.circuit_breaker import CircuitBreaker
+from ranking_server.entity_matcher import TopEntities
+from ranking_server.redis_pool import RedisMetrics, close_client, create_client
+from ranking_server.snapshot import RedisSnapshot, keyspace_channel
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,11 +35,84 @@ logger = logging.getLogger(__name__)
 logger.info("Starting up")
 
 REDIS_DB = f"{os.getenv('REDIS_CONNECTION_STRING', 'redis://localhost:6379')}/0"
+SENTIMENT_TASK = ScorerType.SENTIMENT.runner
+TOP_ENTITIES_KEY = "my_worker:scheduled:top_named_entities"
+SCORING_DEADLINE_SECONDS = 0.5
+# Scheduled worker outputs are re-read this often, or as soon as a change is published
+SNAPSHOT_TTL_SECONDS = float(os.getenv("SNAPSHOT_TTL_SECONDS", "30"))
+# All Redis access shares one pool per process. Size it for the number of concurrent
+# requests you expect, plus one connection held by the snapshot's subscription.
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "20"))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "1.0"))
+# Celery's Redis (result backend and broker) gets a pool of its own. Collecting results
+# holds a connection per request in flight, so size it like REDIS_POOL_SIZE.
+CELERY_REDIS_POOL_SIZE = int(os.getenv("CELERY_REDIS_POOL_SIZE", str(REDIS_POOL_SIZE)))
+# "celery" sends scoring to the Celery workers; "local" scores in a pool of processes
+# started by this server, skipping the broker and result backend (see `scorer_local`)
+SCORER_MODE = os.getenv("SCORER_MODE", "celery")
+LOCAL_SCORER_PROCESSES = int(os.getenv("LOCAL_SCORER_PROCESSES", "2"))
+# Stop waiting on the scorers while they are failing, or while more than this many tasks
+# are queued for them; retry after SCORER_BREAKER_RESET_SECONDS (see `circuit_breaker`)
+SCORER_MAX_QUEUE_DEPTH = int(os.getenv("SCORER_MAX_QUEUE_DEPTH", "1000"))
+SCORER_BREAKER_RESET_SECONDS = float(os.getenv("SCORER_BREAKER_RESET_SECONDS", "5"))
+QUEUE_DEPTH_TTL_SECONDS = 1.0
+
+metrics_registry = CollectorRegistry()
+redis_metrics = RedisMetrics(metrics_registry)
+scoring_metrics = ScoringMetrics(metrics_registry)
+scorer_breaker = CircuitBreaker(
+    "scorer",
+    max_load=SCORER_MAX_QUEUE_DEPTH,
+    reset_seconds=SCORER_BREAKER_RESET_SECONDS,
+    registry=metrics_registry,
+)
+ranking_fallbacks = Counter(
+    "ranking_fallbacks_total",
+    "Requests answered without waiting for new scores, by reason",
+    ["reason"],
+    registry=metrics_registry,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global memoized_redis_client, memoized_score_cache, memoized_snapshot, local_scorer
+    global celery_client
+    setup_tracing("ranking_server")
+    memoized_redis_client = create_client(
+        REDIS_DB,
+        max_connections=REDIS_POOL_SIZE,
+        timeout=REDIS_POOL_TIMEOUT_SECONDS,
+        metrics=redis_metrics,
+    )
+    await snapshot().start()
+    if SCORER_MODE == "local":
+        local_scorer = LocalScorer(LOCAL_SCORER_PROCESSES)
+        await asyncio.to_thread(local_scorer.start)
+    else:
+        celery_client = create_client(
+            BACKEND,
+            max_connections=CELERY_REDIS_POOL_SIZE,
+            timeout=REDIS_POOL_TIMEOUT_SECONDS,
+            metrics=redis_metrics,
+        )
+    yield
+    if local_scorer is not None:
+        local_scorer.stop()
+    if celery_client is not None:
+        await close_client(celery_client)
+    await snapshot().stop()
+    await close_client(memoized_redis_client)
+    memoized_redis_client = memoized_score_cache = memoized_snapshot = local_scorer = None
+    celery_client = None
+    shutdown_tracing()
+
 
 app = FastAPI(
     title="Prosocial Ranking Challenge combined example",
     description="Ranks input based on how unpopular the things and people in it are.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Set up CORS. This is necessary if calling this code directly from a
@@ -35,17 +124,86 @@ app.add_middleware(
     allow_methods=["HEAD", "OPTIONS", "GET", "POST"],
     allow_headers=["*"],
 )
+expose_metrics(app, registry=metrics_registry)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # with TRACE_FILE set, a span per request; scoring spans and scorer task spans nest in it
+    with span(f"{request.method} {request.url.path}", carrier=request.headers, server=True):
+        return await call_next(request)
+
 
 memoized_redis_client = None
 
 
-def redis_client():
-    global memoized_redis_client
+def redis_client() -> aioredis.Redis:
+    """The client on the shared connection pool, which is opened by `lifespan`."""
     if memoized_redis_client is None:
-        memoized_redis_client = redis.Redis.from_url(REDIS_DB)
+        raise RuntimeError("The redis pool is created when the app starts")
     return memoized_redis_client
 
 
+memoized_score_cache = None
+
+
+def score_cache():
+    global memoized_score_cache
+    if memoized_score_cache is None:
+        memoized_score_cache = AsyncScoreCache(redis_client())
+    return memoized_score_cache
+
+
+top_entities = TopEntities()
+
+local_scorer = None
+celery_client = None  # result backend (and broker) client, opened by `lifespan`
+queue_depth = (0, -math.inf)  # (depth, monotonic time it was read)
+
+
+async def scorer_queue_depth() -> int:
+    """Number of tasks waiting in the interactive scorer queue, re-read once a second.
+
+    With the Redis broker, a queue is a list named after it; the broker is the same Redis
+    as the result backend. Local scoring has no queue.
+    """
+    global queue_depth
+    depth, read_at = queue_depth
+    if celery_client is None or time.monotonic() - read_at < QUEUE_DEPTH_TTL_SECONDS:
+        return depth
+    try:
+        depth = await celery_client.llen(INTERACTIVE_QUEUE)
+    except redis.RedisError as e:
+        logger.error(f"Error reading the scorer queue depth: {e}")
+    queue_depth = (depth, time.monotonic())
+    return depth
+
+
+async def compute_scores(input: list[ScoringInput], **kwargs) -> list[ScoringOutput]:
+    """Score with the configured SCORER_MODE"""
+    if local_scorer is not None:
+        return await local_scorer.compute_scores_async(input, **kwargs)
+    return await compute_scores_async(input, client=celery_client, **kwargs)
+
+
+memoized_snapshot = None
+
+
+def snapshot():
+    global memoized_snapshot
+    if memoized_snapshot is None:
+        # The publisher notifies on a channel named after the key; keyspace notifications
+        # work too, if they are enabled on the Redis server
+        memoized_snapshot = RedisSnapshot(
+            redis_client(),
+            [TOP_ENTITIES_KEY],
+            ttl=SNAPSHOT_TTL_SECONDS,
+            channels=[TOP_ENTITIES_KEY, keyspace_channel(TOP_ENTITIES_KEY)],
+            registry=metrics_registry,
+        )
+    return memoized_snapshot
+
+
 # Straw-man fake hypothesis for why this ranker example is worthwhile:
 # Paying too much attention to popular things or people makes a user sad.
 # So let's identify the popular named entities in the user's feeds and
@@ -66,17 +224,12 @@ async def rank(fastapi_req: Request) -> RankingResponse:
 
     logger.info("Received ranking request")
     ranked_results = []
-    # get the named entities from redis
-    result_key = "my_worker:scheduled:top_named_entities"
-
-    top_entities = []
-    cached_results = redis_client().get(result_key)
-    if cached_results is not None:
-        top_entities_record = json.loads(cached_results.decode("utf-8"))
-        top_entities = set(x[0] for x in top_entities_record["top_named_entities"])
+    # get the named entities from the local snapshot of redis; the matcher is only rebuilt
+    # when they change
+    matcher = top_entities.matcher(snapshot().get(TOP_ENTITIES_KEY))
 
     for item in ranking_request.items:
-        score = -1 if any(ne in item.text for ne in top_entities) else 1
+        score = -1 if matcher.matches(item.text) else 1
         ranked_results.append({"id": item.id, "score": score})
 
     ranked_results.sort(key=lambda x: x["score"], reverse=True)
@@ -86,17 +239,45 @@ async def rank(fastapi_req: Request) -> RankingResponse:
     result = {
         "ranked_ids": ranked_ids,
     }
-    with ThreadPoolExecutor() as executor:
-        data = [{"item_id": x.id, "text": x.text} for x in ranking_request.items]
-        future = executor.submit(compute_scores_basic, "scorer_worker.tasks.sentiment_scorer", data)
+    # Only items that haven't been scored recently are sent to the scoring queue. The scores
+    # don't affect this example's ranking; they are cached for later requests.
+    data = [{"item_id": x.id, "text": x.text} for x in ranking_request.items]
+    cached = await score_cache().get_many(SENTIMENT_TASK, data)
+    misses = [x for x in data if x["item_id"] not in cached]
+    logger.info(f"Found {len(cached)} cached scores, scoring {len(misses)} items")
+    if misses:
+        scorer_breaker.observe_load(await scorer_queue_depth())
+        if not scorer_breaker.allow():
+            # the ranking doesn't wait on scores; the items get scored once the scorers
+            # recover
+            logger.warning("Scorer circuit breaker is open, skipping scoring")
+            ranking_fallbacks.labels("breaker_open").inc()
+            misses = []
+    if misses:
+        # Awaiting the scores keeps this worker free to serve other requests meanwhile
         try:
-            # logger.info("Submitting score computation task")
-            scoring_result = future.result(timeout=0.5)
-        except TimeoutError:
-            logger.error("Timed out waiting for score results")
+            scoring_result = await compute_scores(
+                [ScoringInput(ScorerType.SENTIMENT, x) for x in misses],
+                deadline_seconds=SCORING_DEADLINE_SECONDS,
+                # prefetches give way to requests that a user is waiting for
+                queue=PREFETCH_QUEUE if ranking_request.session.prefetch else INTERACTIVE_QUEUE,
+            )
         except Exception as e:
             logger.error(f"Error computing scores: {e}")
+            scorer_breaker.record(success=False)
+            ranking_fallbacks.labels("scoring_error").inc()
         else:
-            logger.info(f"Computed scores: {scoring_result}")
+            scoring_metrics.observe(scoring_result)
+            scored = [
+                {"item_id": x.item_id, "score": x.score} for x in scoring_result if x.error is None
+            ]
+            timed_out = [x for x in scoring_result if x.error == "Timed out waiting for results"]
+            scorer_breaker.record(success=not timed_out)
+            if timed_out:
+                ranking_fallbacks.labels("scoring_timeout").inc()
+            if len(scored) < len(scoring_result):
+                logger.error(f"Missing {len(scoring_result) - len(scored)} score results")
+            logger.info(f"Computed scores: {scored}")
+            await score_cache().set_many(SENTIMENT_TASK, misses, scored)
 
     return RankingResponse(**result)
@@ -1,39 +1,87 @@
+import copy
 import json
+import math
+import time
 from datetime import UTC, datetime
 from unittest.mock import patch
 
 import fakeredis
 import pytest
-import test_data
 from fastapi.testclient import TestClient
+from scorer_worker.celery_app import INTERACTIVE_QUEUE, PREFETCH_QUEUE
+from scorer_worker.score_cache import AsyncScoreCache, ScoreCache
+from scorer_worker.scorer_advanced import ScoringOutput, Timings
 
-import ranking_server
+from ranking_server import ranking_server, test_data
+from ranking_server.circuit_breaker import BreakerState, CircuitBreaker
+from ranking_server.snapshot import RedisSnapshot
 
 
 @pytest.fixture
-def app(redis_client):
-    with patch("ranking_server.redis_client", return_value=redis_client):
+def score_cache(redis_client):
+    return AsyncScoreCache(redis_client)
+
+
+@pytest.fixture
+def snapshot(redis_client):
+    key = ranking_server.TOP_ENTITIES_KEY
+    return RedisSnapshot(redis_client, [key], ttl=60, channels=[key])
+
+
+@pytest.fixture
+def app(redis_client, score_cache, snapshot):
+    with (
+        patch.object(ranking_server, "create_client", return_value=redis_client),
+        patch.object(ranking_server, "score_cache", return_value=score_cache),
+        patch.object(ranking_server, "snapshot", return_value=snapshot),
+    ):
         app = ranking_server.app
         yield app
 
 
 @pytest.fixture
 def client(app):
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def scorer_breaker(monkeypatch):
+    breaker = CircuitBreaker("scorer", window=4, min_calls=2, reset_seconds=60, max_load=5)
+    monkeypatch.setattr(ranking_server, "scorer_breaker", breaker)
+    monkeypatch.setattr(ranking_server, "queue_depth", (0, -math.inf))
+    return breaker
 
 
 @pytest.fixture
-def redis_client(request):
-    redis_client = fakeredis.FakeRedis()
-    return redis_client
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    # the server's client; tests set up data with `sync_redis_client`
+    return fakeredis.FakeAsyncRedis(server=redis_server)
+
+
+@pytest.fixture
+def sync_redis_client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
 
 
-def test_rank(client, redis_client):
+def test_rank(client, sync_redis_client, snapshot):
     # put named entities in redis
     result_key = "my_worker:scheduled:top_named_entities"
 
     fake_named_entities = ["foo", "bar", "baz"]
-    redis_client.set(
+    sync_redis_client.set(
         result_key,
         json.dumps(
             {
@@ -42,6 +90,9 @@ def test_rank(client, redis_client):
             }
         ),
     )
+    # the snapshot picks up the change as soon as it is announced
+    sync_redis_client.publish(result_key, "updated")
+    assert wait_for(lambda: snapshot.get(result_key) is not None)
 
     # Send POST request to the API
     response = client.post("/rank", json=test_data.BASIC_EXAMPLE)
@@ -60,3 +111,185 @@ def test_rank(client, redis_client):
         "should-rank-high-2",
         "should-rank-low",
     ]
+
+
+def test_rank_scores_only_cache_misses(client, sync_redis_client):
+    items = test_data.BASIC_EXAMPLE["items"]
+    cached = [{"item_id": x["id"], "text": x["text"]} for x in items[:2]]
+    results = [{"item_id": x["item_id"], "score": 0.1} for x in cached]
+    # scored by another server process
+    ScoreCache(sync_redis_client).set_many(ranking_server.SENTIMENT_TASK, cached, results)
+
+    async def fake_compute_scores(input, **kwargs):
+        return [
+            ScoringOutput(x.data["item_id"], x.scorer_type, Timings("task"), score=0.2)
+            for x in input
+        ]
+
+    with patch.object(
+        ranking_server, "compute_scores_async", side_effect=fake_compute_scores
+    ) as compute:
+        response = client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    assert response.status_code == 200
+    compute.assert_called_once()
+    assert [x.data["item_id"] for x in compute.call_args.args[0]] == [items[2]["id"]]
+    # results are collected on the server's pool, not a pool of scorer_async's own
+    assert compute.call_args.kwargs["client"] is ranking_server.celery_client
+
+    # the new score was cached, so a second request doesn't need the queue at all
+    with patch.object(ranking_server, "compute_scores_async") as compute:
+        client.post("/rank", json=test_data.BASIC_EXAMPLE)
+    compute.assert_not_called()
+
+
+def test_rank_does_not_cache_failed_scores(client):
+
+    async def fake_compute_scores(input, **kwargs):
+        return [
+            ScoringOutput(
+                x.data["item_id"],
+                x.scorer_type,
+                Timings("task"),
+                error="Timed out waiting for results",
+            )
+            for x in input
+        ]
+
+    with patch.object(
+        ranking_server, "compute_scores_async", side_effect=fake_compute_scores
+    ) as compute:
+        response = client.post("/rank", json=test_data.BASIC_EXAMPLE)
+        assert response.status_code == 200
+        client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    assert compute.call_count == 2
+    assert len(compute.call_args.args[0]) == len(test_data.BASIC_EXAMPLE["items"])
+
+
+def test_metrics(client):
+    client.post("/rank", json=test_data.BASIC_EXAMPLE)
+    metrics = client.get("/metrics").text
+    assert "redis_pool_wait_seconds" in metrics
+    assert "redis_command_duration_seconds" in metrics
+
+
+def test_scoring_timings_metrics(client):
+    async def fake_compute_scores(input, **kwargs):
+        timings = Timings("task", sent=0.001, enqueued=0.002, started=0.01, completed=0.03)
+        timings.result_received, timings.success = 0.04, True
+        return [ScoringOutput(x.data["item_id"], x.scorer_type, timings, 0.5) for x in input]
+
+    def sample(name, **labels):
+        labels = {"scorer_type": "SENTIMENT", **labels}
+        return ranking_server.metrics_registry.get_sample_value(name, labels) or 0
+
+    before = sample("scoring_items_total", outcome="ok")
+    with patch.object(ranking_server, "compute_scores_async", side_effect=fake_compute_scores):
+        client.post("/rank", json=test_data.BASIC_EXAMPLE)
+    metrics = client.get("/metrics").text
+
+    for phase in ["dispatch", "queue_wait", "execution", "result_fetch", "latency"]:
+        assert f'scoring_{phase}_seconds_count{{scorer_type="SENTIMENT"}}' in metrics
+    assert sample("scoring_items_total", outcome="ok") - before == len(
+        test_data.BASIC_EXAMPLE["items"]
+    )
+
+
+def test_prefetch_scores_use_prefetch_queue(client):
+    request = copy.deepcopy(test_data.BASIC_EXAMPLE)
+    request["session"]["prefetch"] = True
+
+    async def fake_compute_scores(input, **kwargs):
+        return []
+
+    with patch.object(
+        ranking_server, "compute_scores_async", side_effect=fake_compute_scores
+    ) as compute:
+        client.post("/rank", json=request)
+        client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    assert [x.kwargs["queue"] for x in compute.call_args_list] == [
+        PREFETCH_QUEUE,
+        INTERACTIVE_QUEUE,
+    ]
+
+
+def test_local_scorer_mode(app, sync_redis_client, monkeypatch):
+    monkeypatch.setattr(ranking_server, "SCORER_MODE", "local")
+    monkeypatch.setattr(ranking_server, "LOCAL_SCORER_PROCESSES", 1)
+    monkeypatch.setattr(ranking_server, "SCORING_DEADLINE_SECONDS", 5)
+    items = test_data.BASIC_EXAMPLE["items"]
+
+    with (
+        TestClient(app) as client,
+        patch.object(ranking_server, "compute_scores_async") as compute_celery,
+    ):
+        response = client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    assert response.status_code == 200
+    compute_celery.assert_not_called()
+    data = [{"item_id": x["id"], "text": x["text"]} for x in items]
+    cached = ScoreCache(sync_redis_client).get_many(ranking_server.SENTIMENT_TASK, data)
+    assert sorted(cached) == sorted(x["id"] for x in items)
+    assert ranking_server.local_scorer is None  # stopped with the app
+
+
+def fallback_count(reason):
+    value = ranking_server.metrics_registry.get_sample_value(
+        "ranking_fallbacks_total", {"reason": reason}
+    )
+    return value or 0
+
+
+def test_breaker_opens_after_scoring_timeouts(client, scorer_breaker):
+    async def fake_compute_scores(input, **kwargs):
+        return [
+            ScoringOutput(
+                x.data["item_id"],
+                x.scorer_type,
+                Timings("task"),
+                error="Timed out waiting for results",
+            )
+            for x in input
+        ]
+
+    skipped = fallback_count("breaker_open")
+    with patch.object(
+        ranking_server, "compute_scores_async", side_effect=fake_compute_scores
+    ) as compute:
+        responses = [client.post("/rank", json=test_data.BASIC_EXAMPLE) for _ in range(4)]
+
+    # the ranking is still returned, without waiting on the scorers once the breaker opened
+    assert [x.status_code for x in responses] == [200] * 4
+    assert responses[3].json() == responses[0].json()
+    assert compute.call_count == 2
+    assert scorer_breaker.state == BreakerState.OPEN
+    assert fallback_count("breaker_open") - skipped == 2
+
+
+def test_breaker_probe_closes_it_again(client, scorer_breaker):
+    scorer_breaker.reset_seconds = 0
+    scorer_breaker._transition(BreakerState.OPEN)
+
+    async def fake_compute_scores(input, **kwargs):
+        return []
+
+    with patch.object(
+        ranking_server, "compute_scores_async", side_effect=fake_compute_scores
+    ) as compute:
+        client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    compute.assert_called_once()
+    assert scorer_breaker.state == BreakerState.CLOSED
+
+
+def test_breaker_opens_on_queue_depth(client, sync_redis_client, scorer_breaker):
+    sync_redis_client.lpush(INTERACTIVE_QUEUE, *[f"task-{i}" for i in range(10)])
+
+    with patch.object(ranking_server, "compute_scores_async") as compute:
+        response = client.post("/rank", json=test_data.BASIC_EXAMPLE)
+
+    assert response.status_code == 200
+    compute.assert_not_called()
+    assert scorer_breaker.state == BreakerState.OPEN
@@ -0,0 +1,114 @@
+"""Shared `redis.asyncio` connection pool for the ranking server, with latency metrics.
+
+All of the server's Redis traffic goes through one `BlockingConnectionPool`: when all of its
+connections are in use, commands wait (up to `timeout` seconds) for one to be released
+instead of opening more connections. Two histograms show whether the pool is big enough:
+
+ - `redis_pool_wait_seconds`: time spent waiting for a connection from the pool
+ - `redis_command_duration_seconds{command}`: time per command (including the pool wait);
+   a pipeline is one `PIPELINE` command
+
+Example:
+
+    metrics = RedisMetrics(registry)
+    client = create_client("redis://localhost:6379/0", max_connections=20, metrics=metrics)
+    ...
+    await close_client(client)
+"""
+
+import time
+
+import redis.asyncio as aioredis
+from prometheus_client import CollectorRegistry, Histogram
+from redis.asyncio.client import Pipeline
+
+# Redis round trips are usually well under a millisecond; waits for a busy pool are longer
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class RedisMetrics:
+    """Pool-wait and command-latency histograms, registered in `registry`."""
+
+    def __init__(self, registry: CollectorRegistry):
+        self.pool_wait = Histogram(
+            "redis_pool_wait_seconds",
+            "Time spent waiting for a connection from the Redis pool",
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.command_duration = Histogram(
+            "redis_command_duration_seconds",
+            "Duration of Redis commands, including the wait for a connection",
+            ["command"],
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+
+
+class InstrumentedConnectionPool(aioredis.BlockingConnectionPool):
+    def __init__(self, *args, metrics: RedisMetrics | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            if self.metrics is not None:
+                self.metrics.pool_wait.observe(time.perf_counter() - start)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            metrics = getattr(self.connection_pool, "metrics", None)
+            if metrics is not None:
+                metrics.command_duration.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            metrics = getattr(self.connection_pool, "metrics", None)
+            if metrics is not None:
+                command = str(args[0]).split(" ")[0].upper()
+                metrics.command_duration.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+def create_client(
+    url: str,
+    max_connections: int = 20,
+    timeout: float = 1.0,
+    metrics: RedisMetrics | None = None,
+) -> aioredis.Redis:
+    """A client on a new pool of at most `max_connections` connections to `url`.
+
+    Args:
+        url (str): Redis URL.
+        max_connections (int): Pool size. Commands wait for a free connection beyond this.
+        timeout (float): Seconds to wait for a free connection before raising
+            `redis.ConnectionError`.
+        metrics (RedisMetrics | None): Where to record latencies, if anywhere.
+    """
+    pool = InstrumentedConnectionPool.from_url(
+        url, max_connections=max_connections, timeout=timeout, metrics=metrics
+    )
+    return InstrumentedRedis(connection_pool=pool)
+
+
+async def close_client(client: aioredis.Redis):
+    """Close the client and disconnect all of its pool's connections."""
+    await client.aclose()
+    await client.connection_pool.disconnect()
@@ -0,0 +1,44 @@
+import asyncio
+
+import fakeredis
+from fakeredis.aioredis import FakeConnection
+from prometheus_client import CollectorRegistry
+
+from ranking_server.redis_pool import (
+    InstrumentedConnectionPool,
+    InstrumentedRedis,
+    RedisMetrics,
+    close_client,
+)
+
+
+def test_latency_metrics():
+    registry = CollectorRegistry()
+    pool = InstrumentedConnectionPool(
+        max_connections=2,
+        connection_class=FakeConnection,
+        server=fakeredis.FakeServer(),
+        metrics=RedisMetrics(registry),
+    )
+    client = InstrumentedRedis(connection_pool=pool)
+
+    async def run():
+        await client.set("a", "1")
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.get("a")
+            pipe.get("b")
+            result = await pipe.execute()
+        await asyncio.gather(*(client.get("a") for _ in range(10)))
+        await close_client(client)
+        return result
+
+    assert asyncio.run(run()) == [b"1", None]
+
+    def count(name, labels=None):
+        return registry.get_sample_value(f"{name}_count", labels or {})
+
+    assert count("redis_command_duration_seconds", {"command": "SET"}) == 1
+    assert count("redis_command_duration_seconds", {"command": "GET"}) == 10
+    assert count("redis_command_duration_seconds", {"command": "PIPELINE"}) == 1
+    # every command, including the 10 concurrent ones sharing 2 connections, waited
+    assert count("redis_pool_wait_seconds") == 12
@@ -0,0 +1,177 @@
+"""Local snapshot of values that scheduled workers publish to Redis.
+
+Jobs like `count_top_named_entities` write their output to a Redis key every few minutes.
+Rather than reading those keys on every request, the ranking server keeps a local copy that
+a background task refreshes every `ttl` seconds, and immediately when it is notified of a
+change. Request handlers read the copy, so they never wait on Redis; if Redis is down they
+keep using the last values they saw, and the staleness metrics say how old those are.
+
+Change notifications can come from a plain pub/sub channel that the publisher writes to
+after updating the key, or from Redis keyspace notifications (enable them with
+`CONFIG SET notify-keyspace-events K$` and subscribe to `keyspace_channel(key)`).
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Iterable
+
+import redis
+import redis.asyncio as aioredis
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+
+def keyspace_channel(key: str, db: int = 0) -> str:
+    """The channel Redis keyspace notifications for `key` are published on."""
+    return f"__keyspace@{db}__:{key}"
+
+
+class RedisSnapshot:
+    """Background-refreshed local copy of some Redis keys.
+
+    Args:
+        redis_client (aioredis.Redis): Client used by the background task. A subscription
+            holds one of its pool's connections for as long as the snapshot runs.
+        keys (Iterable[str]): The keys to copy.
+        ttl (float): Seconds between refreshes when no change is notified.
+        channels (Iterable[str]): Pub/sub channels whose messages trigger a refresh.
+        registry (CollectorRegistry | None): If given, staleness and refresh metrics are
+            exported to this Prometheus registry.
+
+    Attributes:
+        refreshes, errors, invalidations (int): Successful refreshes, failed refreshes, and
+            refreshes triggered by a change notification.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        keys: Iterable[str],
+        ttl: float = 30.0,
+        channels: Iterable[str] = (),
+        registry: CollectorRegistry | None = None,
+    ):
+        self.redis_client = redis_client
+        self.keys = list(keys)
+        self.ttl = ttl
+        self.channels = list(channels)
+        self.refreshes = 0
+        self.errors = 0
+        self.invalidations = 0
+        # replaced as a whole on refresh, so readers never see a partial update
+        self._values: dict[str, bytes | None] = {}
+        self._refreshed_at: float | None = None
+        self._task: asyncio.Task | None = None
+        self._pubsub = None
+
+        self._refresh_counter = None
+        self._invalidation_counter = None
+        if registry is not None:
+            age = Gauge(
+                "redis_snapshot_age_seconds",
+                "Seconds since the local snapshot of Redis values was last refreshed",
+                registry=registry,
+            )
+            age.set_function(self.age)
+            self._refresh_counter = Counter(
+                "redis_snapshot_refreshes_total",
+                "Refreshes of the local snapshot of Redis values",
+                ["result"],
+                registry=registry,
+            )
+            self._invalidation_counter = Counter(
+                "redis_snapshot_invalidations_total",
+                "Change notifications received for the local snapshot of Redis values",
+                registry=registry,
+            )
+
+    def get(self, key: str) -> bytes | None:
+        """The value of `key` at the last refresh; None if it was not set (or not fetched yet)."""
+        return self._values.get(key)
+
+    def age(self) -> float:
+        """Seconds since the last successful refresh; infinite before the first one."""
+        if self._refreshed_at is None:
+            return math.inf
+        return time.monotonic() - self._refreshed_at
+
+    async def refresh(self) -> bool:
+        """Fetch all keys with one MGET. On error the previous values are kept."""
+        try:
+            values = await self.redis_client.mget(self.keys)
+        except redis.RedisError as e:
+            logger.error(f"Error refreshing snapshot from redis: {e}")
+            self.errors += 1
+            if self._refresh_counter is not None:
+                self._refresh_counter.labels("error").inc()
+            return False
+        self._values = dict(zip(self.keys, values))
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+        if self._refresh_counter is not None:
+            self._refresh_counter.labels("ok").inc()
+        return True
+
+    async def start(self):
+        """Refresh once, then keep refreshing in a background task until `stop()`."""
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _run(self):
+        while True:
+            if self.channels and self._pubsub is None:
+                await self._subscribe()
+            if await self._wait_for_change():
+                self.invalidations += 1
+                if self._invalidation_counter is not None:
+                    self._invalidation_counter.inc()
+            await self.refresh()
+
+    async def _subscribe(self):
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(*self.channels)
+        except redis.RedisError as e:
+            logger.error(f"Error subscribing to snapshot invalidations: {e}")
+            await pubsub.aclose()
+        else:
+            self._pubsub = pubsub
+
+    async def _wait_for_change(self) -> bool:
+        """Wait up to `ttl` seconds; True if a change notification arrived."""
+        if self._pubsub is None:
+            await asyncio.sleep(self.ttl)
+            return False
+        deadline = time.monotonic() + self.ttl
+        try:
+            await asyncio.wait_for(self._next_message(), self.ttl)
+        except TimeoutError:
+            return False
+        except redis.RedisError as e:
+            logger.error(f"Error reading snapshot invalidations: {e}")
+            await self._pubsub.aclose()
+            self._pubsub = None  # resubscribe on the next round
+            await asyncio.sleep(max(deadline - time.monotonic(), 0))
+            return False
+        return True
+
+    async def _next_message(self):
+        while True:
+            message = await self._pubsub.get_message(timeout=None)
+            if message is not None and message["type"] == "message":
+                return message
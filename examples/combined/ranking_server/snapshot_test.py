@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+import redis
+from prometheus_client import CollectorRegistry
+
+from ranking_server.snapshot import RedisSnapshot
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    return fakeredis.FakeAsyncRedis(server=redis_server)
+
+
+@pytest.fixture
+def sync_redis_client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+def test_refresh_and_get(redis_client, sync_redis_client):
+    snapshot = RedisSnapshot(redis_client, ["a", "b"])
+    assert snapshot.get("a") is None
+    assert snapshot.age() == float("inf")
+
+    sync_redis_client.set("a", "1")
+    assert asyncio.run(snapshot.refresh())
+    assert snapshot.get("a") == b"1"
+    assert snapshot.get("b") is None
+    assert snapshot.age() < 1
+    assert snapshot.refreshes == 1
+
+
+def test_redis_errors_keep_last_values(redis_client, sync_redis_client, monkeypatch):
+    registry = CollectorRegistry()
+    snapshot = RedisSnapshot(redis_client, ["a"], registry=registry)
+    sync_redis_client.set("a", "1")
+
+    async def fail(keys):
+        raise redis.ConnectionError("down")
+
+    async def run():
+        await snapshot.refresh()
+        monkeypatch.setattr(redis_client, "mget", fail)
+        return await snapshot.refresh()
+
+    assert not asyncio.run(run())
+    assert snapshot.get("a") == b"1"
+    assert snapshot.errors == 1
+    assert registry.get_sample_value("redis_snapshot_refreshes_total", {"result": "ok"}) == 1
+    assert registry.get_sample_value("redis_snapshot_refreshes_total", {"result": "error"}) == 1
+    assert registry.get_sample_value("redis_snapshot_age_seconds") < 1
+
+
+def test_refreshes_every_ttl(redis_client, sync_redis_client):
+    snapshot = RedisSnapshot(redis_client, ["a"], ttl=0.05)
+
+    async def run():
+        await snapshot.start()
+        try:
+            sync_redis_client.set("a", "1")
+            return await wait_for(lambda: snapshot.get("a") == b"1")
+        finally:
+            await snapshot.stop()
+
+    assert asyncio.run(run())
+
+
+def test_refreshes_on_notification(redis_client, sync_redis_client):
+    snapshot = RedisSnapshot(redis_client, ["a"], ttl=60, channels=["a"])
+
+    async def run():
+        await snapshot.start()
+        try:
+            await wait_for(lambda: sync_redis_client.pubsub_numsub("a")[0][1] == 1)
+            sync_redis_client.set("a", "1")
+            sync_redis_client.publish("a", "updated")
+            return await wait_for(lambda: snapshot.get("a") == b"1")
+        finally:
+            await snapshot.stop()
+
+    assert asyncio.run(run())
+    assert snapshot.invalidations == 1
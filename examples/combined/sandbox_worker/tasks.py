@@ -132,6 +132,8 @@ SELECT post_blob FROM posts WHERE created_at BETWEEN '{from_}' AND '{to}';"""
                 }
             ),
         )
+        # let readers that keep a local copy (like the ranking server) know it changed
+        r.publish(result_key, "updated")
         return True
     finally:
         con.close()
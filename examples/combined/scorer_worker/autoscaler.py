@@ -0,0 +1,255 @@
+"""Autoscaling controller for the scorer workers
+
+A worker started with a fixed `--concurrency` is either too small for peak load (tasks
+queue up and requests miss the deadline) or too large the rest of the time. This controller
+adjusts the pool size of running workers, with Celery's `pool_grow` / `pool_shrink` remote
+control commands, to hold a target p95 scoring latency:
+ - every `interval` seconds it reads the depth of the scorer queue from the broker, and the
+   item latencies published by the dispatchers (see `scorer_advanced.publish_timings`; set
+   SCORER_PUBLISH_TIMINGS=1 wherever `compute_scores*` runs)
+ - if the p95 latency is above the target, or the queue holds more than
+   `backlog_per_process` tasks per worker process, the pool grows by a quarter (at least
+   one process); items that timed out count as infinitely slow
+ - if the p95 latency is well below the target (`shrink_below`) and the queue is empty,
+   the pool shrinks by one process
+ - after a change, only samples taken since then are considered, and nothing changes for
+   `cooldown_seconds`; new processes load their models before they take tasks
+
+Processes are added to the worker with the smallest pool, and removed from the one with
+the largest. Workers must use the prefork pool (Celery's default).
+
+To try it out with a local Redis and the random scorer's `sleep` parameter:
+
+    docker compose up -d redis-celery-broker
+    celery -A scorer_worker.tasks worker --concurrency 1 -Q scorer
+    python -m scorer_worker.autoscaler --target-p95 0.5
+    python -m scorer_worker.autoscaler --load 20 --sleep 0.1  # requests per second
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import redis
+
+from scorer_worker import scorer_advanced
+from scorer_worker.celery_app import BROKER, INTERACTIVE_QUEUE
+from scorer_worker.celery_app import app as celery_app
+from scorer_worker.scorer_advanced import TIMINGS_KEY, ScorerType, ScoringInput
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Observation:
+    """What the controller saw in one step
+
+    Attributes:
+        queue_depth (int): Tasks waiting in the watched queues.
+        p95 (float | None): 95th percentile item latency, in seconds; None if there were too
+            few samples. Infinite if more than 5% of the items timed out.
+        samples (int): Number of latency samples used.
+        concurrency (dict[str, int]): Pool size of each worker.
+    """
+
+    queue_depth: int
+    p95: float | None
+    samples: int
+    concurrency: dict[str, int]
+
+
+def percentile(latencies: list[float | None], q: float) -> float:
+    """Nearest-rank percentile; None (a timed out item) counts as infinitely slow"""
+    values = sorted(math.inf if x is None else x for x in latencies)
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+class Autoscaler:
+    """Grows and shrinks the worker pools to hold a target p95 latency.
+
+    Args:
+        target_p95 (float): Target 95th percentile item latency, in seconds.
+        min_concurrency (int): Smallest total number of worker processes.
+        max_concurrency (int): Largest total number of worker processes.
+        queues (list[str]): Queues whose depth counts as backlog.
+        window_seconds (float): Age of the oldest latency sample considered.
+        min_samples (int): Samples needed before the latency is taken into account.
+        backlog_per_process (float): Queued tasks per process beyond which the pool grows.
+        shrink_below (float): Fraction of the target under which the pool may shrink.
+        cooldown_seconds (float): Minimum time between two changes.
+        control: Celery's remote control; defaults to the app's.
+        broker_client (redis.Redis | None): Client for the broker; defaults to BROKER.
+        backend_client (redis.Redis | None): Client for the result backend, where the
+            timings are published; defaults to the app's.
+        clock (Callable[[], float]): Time source (as `time.time`), replaceable for tests.
+    """
+
+    def __init__(
+        self,
+        target_p95: float = 0.5,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        queues: list[str] = (INTERACTIVE_QUEUE,),
+        window_seconds: float = 30,
+        min_samples: int = 20,
+        backlog_per_process: float = 2,
+        shrink_below: float = 0.5,
+        cooldown_seconds: float = 10,
+        control: Any = None,
+        broker_client: redis.Redis | None = None,
+        backend_client: redis.Redis | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.target_p95 = target_p95
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.queues = list(queues)
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.backlog_per_process = backlog_per_process
+        self.shrink_below = shrink_below
+        self.cooldown_seconds = cooldown_seconds
+        self.control = control or celery_app.control
+        self.broker_client = broker_client or redis.Redis.from_url(BROKER)
+        self.backend_client = backend_client or celery_app.backend.client
+        self.clock = clock
+        self.last_change = -math.inf
+
+    def worker_concurrency(self) -> dict[str, int]:
+        """Pool size of each running worker"""
+        stats = self.control.inspect(timeout=1).stats() or {}
+        concurrency = {}
+        for worker, worker_stats in stats.items():
+            pool = worker_stats.get("pool", {})
+            processes = pool.get("processes")
+            concurrency[worker] = len(processes) if processes else pool.get("max-concurrency", 1)
+        return concurrency
+
+    def observe(self) -> Observation:
+        now = self.clock()
+        since = max(now - self.window_seconds, self.last_change)
+        pipe = self.broker_client.pipeline(transaction=False)
+        for queue in self.queues:
+            pipe.llen(queue)
+        queue_depth = sum(pipe.execute())
+
+        latencies = []
+        for value in self.backend_client.lrange(TIMINGS_KEY, 0, -1):
+            sample = json.loads(value)
+            if sample["t"] < since:
+                break  # newest first
+            latencies.append(sample["latency"])
+        p95 = percentile(latencies, 0.95) if len(latencies) >= self.min_samples else None
+        return Observation(queue_depth, p95, len(latencies), self.worker_concurrency())
+
+    def decide(self, observation: Observation) -> int:
+        """Change in the total number of processes, given an observation"""
+        total = sum(observation.concurrency.values())
+        if not total or self.clock() - self.last_change < self.cooldown_seconds:
+            return 0
+        p95 = observation.p95
+        backlog = observation.queue_depth > self.backlog_per_process * total
+        if (p95 is not None and p95 > self.target_p95) or backlog:
+            return max(0, min(math.ceil(total / 4), self.max_concurrency - total))
+        if (
+            p95 is not None
+            and p95 < self.shrink_below * self.target_p95
+            and observation.queue_depth == 0
+            and total > self.min_concurrency
+        ):
+            return -1
+        return 0
+
+    def apply(self, concurrency: dict[str, int], delta: int) -> None:
+        """Spread `delta` processes over the workers, with `pool_grow` or `pool_shrink`"""
+        concurrency = dict(concurrency)
+        changes: dict[str, int] = {}
+        for _ in range(abs(delta)):
+            if delta > 0:
+                worker = min(concurrency, key=concurrency.get)
+            else:
+                worker = max(concurrency, key=concurrency.get)
+                if concurrency[worker] <= 1:
+                    break
+            step = 1 if delta > 0 else -1
+            concurrency[worker] += step
+            changes[worker] = changes.get(worker, 0) + step
+        for worker, change in changes.items():
+            if change > 0:
+                self.control.pool_grow(change, destination=[worker])
+            else:
+                self.control.pool_shrink(-change, destination=[worker])
+        if changes:
+            self.last_change = self.clock()
+
+    def step(self) -> int:
+        """Observe, decide and apply once. Returns the change in processes."""
+        observation = self.observe()
+        delta = self.decide(observation)
+        logger.info(
+            f"queue {observation.queue_depth}, p95 {observation.p95} "
+            f"({observation.samples} samples), pools {observation.concurrency}, change {delta}"
+        )
+        if delta:
+            self.apply(observation.concurrency, delta)
+        return delta
+
+    def run(self, interval: float = 2.0) -> None:
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Autoscaler step failed: {e}")
+            time.sleep(interval)
+
+
+async def generate_load(rate: float, items: int, sleep: float) -> None:
+    """Send `rate` requests per second of `items` random scorer tasks that take `sleep`"""
+    from scorer_worker.scorer_async import compute_scores_async
+
+    scorer_advanced.PUBLISH_TIMINGS = True
+    input = [
+        ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x", "sleep": sleep})
+        for i in range(items)
+    ]
+    requests = set()
+    while True:
+        request = asyncio.create_task(compute_scores_async(input))
+        requests.add(request)
+        request.add_done_callback(requests.discard)
+        await asyncio.sleep(1 / rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-p95", type=float, default=0.5, help="seconds")
+    parser.add_argument("--min-concurrency", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between steps")
+    parser.add_argument("--cooldown", type=float, default=10.0, help="seconds")
+    parser.add_argument("--queues", nargs="+", default=[INTERACTIVE_QUEUE])
+    parser.add_argument("--load", type=float, help="generate this many requests per second")
+    parser.add_argument("--items", type=int, default=5, help="items per generated request")
+    parser.add_argument("--sleep", type=float, default=0.1, help="seconds per generated task")
+    args = parser.parse_args()
+
+    if args.load:
+        asyncio.run(generate_load(args.load, args.items, args.sleep))
+        return
+    Autoscaler(
+        target_p95=args.target_p95,
+        min_concurrency=args.min_concurrency,
+        max_concurrency=args.max_concurrency,
+        queues=args.queues,
+        cooldown_seconds=args.cooldown,
+    ).run(args.interval)
+
+
+if __name__ == "__main__":
+    main()
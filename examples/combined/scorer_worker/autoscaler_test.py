@@ -0,0 +1,130 @@
+import json
+import math
+
+import fakeredis
+import pytest
+
+from scorer_worker import scorer_advanced
+from scorer_worker.autoscaler import Autoscaler, Observation, percentile
+from scorer_worker.celery_app import INTERACTIVE_QUEUE
+from scorer_worker.scorer_advanced import (
+    TIMINGS_KEY,
+    ScorerType,
+    ScoringOutput,
+    Timings,
+    publish_timings,
+)
+
+
+class FakeControl:
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.calls = []
+
+    def inspect(self, timeout):
+        stats = {w: {"pool": {"processes": list(range(n))}} for w, n in self.concurrency.items()}
+        return type("Inspect", (), {"stats": lambda _: stats})()
+
+    def pool_grow(self, n, destination):
+        self.calls.append(("grow", n, destination))
+        self.concurrency[destination[0]] += n
+
+    def pool_shrink(self, n, destination):
+        self.calls.append(("shrink", n, destination))
+        self.concurrency[destination[0]] -= n
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def make_autoscaler(control, redis_client, clock, **kwargs):
+    return Autoscaler(
+        control=control,
+        broker_client=redis_client,
+        backend_client=redis_client,
+        clock=clock,
+        min_samples=5,
+        **kwargs,
+    )
+
+
+def add_samples(client, latencies, t):
+    for latency in latencies:
+        client.lpush(TIMINGS_KEY, json.dumps({"t": t, "latency": latency}))
+
+
+def test_percentile():
+    assert percentile([0.1, 0.2, 0.3, 0.4], 0.5) == 0.2
+    assert percentile([0.1] * 19 + [0.9], 0.95) == 0.1
+    assert percentile([0.1] * 18 + [None, None], 0.95) == math.inf
+
+
+def test_grows_when_slow_then_shrinks(redis_client, clock):
+    control = FakeControl({"a": 2, "b": 1})
+    autoscaler = make_autoscaler(control, redis_client, clock, target_p95=0.5)
+    add_samples(redis_client, [0.2] * 10 + [0.9] * 5, clock.now - 1)
+
+    assert autoscaler.step() == 1
+    assert control.calls == [("grow", 1, ["b"])]
+
+    # within the cooldown, and old samples no longer count
+    clock.now += 5
+    assert autoscaler.step() == 0
+    assert autoscaler.observe().samples == 0
+
+    clock.now += 10
+    add_samples(redis_client, [0.1] * 10, clock.now - 1)
+    assert autoscaler.step() == -1
+    assert control.calls[-1] == ("shrink", 1, ["a"])
+
+
+def test_grows_on_backlog(redis_client, clock):
+    control = FakeControl({"a": 4})
+    autoscaler = make_autoscaler(control, redis_client, clock, max_concurrency=5)
+    redis_client.rpush(INTERACTIVE_QUEUE, *range(20))
+
+    observation = autoscaler.observe()
+    assert (observation.queue_depth, observation.p95) == (20, None)
+    assert autoscaler.step() == 1  # a quarter of 4, and capped at max_concurrency
+    assert control.concurrency == {"a": 5}
+
+
+def test_keeps_bounds(redis_client, clock):
+    autoscaler = make_autoscaler(FakeControl({}), redis_client, clock, min_concurrency=2)
+    fast = Observation(queue_depth=0, p95=0.01, samples=10, concurrency={"a": 1, "b": 1})
+    assert autoscaler.decide(fast) == 0
+    slow = Observation(queue_depth=0, p95=5, samples=10, concurrency={"a": 16})
+    assert autoscaler.decide(slow) == 0
+    assert autoscaler.decide(Observation(100, None, 0, {})) == 0
+
+
+def test_publish_timings(my_celery_app, fake_backend, monkeypatch):
+    monkeypatch.setattr(scorer_advanced, "PUBLISH_TIMINGS", True)
+    done = Timings("a", enqueued=0.01, started=0.05, completed=0.15)
+    done.success, done.result_received = True, 0.2
+    output = [
+        ScoringOutput("1", ScorerType.RANDOM, done, score=0.5),
+        ScoringOutput("2", ScorerType.RANDOM, Timings("b"), error="Timed out waiting for results"),
+        ScoringOutput("3", ScorerType.RANDOM, Timings("c"), error="boom"),
+    ]
+
+    publish_timings(output, fake_backend)
+
+    samples = [json.loads(x) for x in fake_backend.client.lrange(TIMINGS_KEY, 0, -1)]
+    assert sorted([x["latency"] for x in samples], key=lambda x: x is None) == [0.2, None]
+    assert samples[0]["scorer_type"] == "RANDOM"
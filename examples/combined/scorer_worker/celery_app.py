@@ -6,14 +6,115 @@ so that it can be imported without the possibly heavyweight task dependencies.
 NOTE: When specifying the app location in the `celery` command, you should
       STILL target the `tasks` module (which imports the app from here).
       If you specify this module instead, runtime imports may not work properly.
+
+Scorer work is split over three queues, so that scoring for a user waiting on `/rank` never
+queues behind work that is less urgent:
+ - INTERACTIVE_QUEUE (the default): scores needed to answer a ranking request
+ - PREFETCH_QUEUE: scores for prefetch requests (`Session.prefetch=True`)
+ - BATCH_QUEUE: backfills and other bulk scoring
+Workers should consume all three, most urgent first; with the Redis broker, a worker always
+takes from the first non-empty queue in its list:
+
+    celery -A scorer_worker.tasks worker -Q scorer,scorer_prefetch,scorer_batch
 """
 
+import logging
 import os
 
+import redis
 from celery import Celery
+from celery.backends.redis import RedisBackend
+from kombu import Queue
+
+from scorer_worker.tracing import inject_context
+
+logger = logging.getLogger(__name__)
 
 BROKER = f"{os.getenv('CELERY_BROKER', 'redis://localhost:6380')}/0"
 BACKEND = f"{os.getenv('CELERY_BACKEND', 'redis://localhost:6380')}/0"
 app = Celery("scorer_worker", backend=BACKEND, broker=BROKER)
 app.autodiscover_tasks(["scorer_worker.tasks"])
-app.conf.task_default_queue = "scorer"
+
+INTERACTIVE_QUEUE = "scorer"
+PREFETCH_QUEUE = "scorer_prefetch"
+BATCH_QUEUE = "scorer_batch"
+
+app.conf.task_queues = [Queue(INTERACTIVE_QUEUE), Queue(PREFETCH_QUEUE), Queue(BATCH_QUEUE)]
+app.conf.task_default_queue = INTERACTIVE_QUEUE
+app.conf.broker_transport_options = {"queue_order_strategy": "priority"}
+# Don't let a worker reserve queued batch tasks while interactive ones arrive
+app.conf.worker_prefetch_multiplier = 1
+
+"""How long the result backend keeps task results. The dispatchers delete the results they
+collect (see `release_results`), so this only bounds results that arrive too late"""
+RESULT_TTL_SECONDS = int(os.getenv("SCORER_RESULT_TTL_SECONDS", "60"))
+app.conf.result_expires = RESULT_TTL_SECONDS
+
+
+"""Hash of the number of tasks dropped because their deadline had passed, by task name"""
+EXPIRED_DROPS_KEY = "scorer_worker:expired_drops"
+
+
+def task_options(queue: str | None = None, deadline: float | None = None, **options) -> dict:
+    """Celery options to route a task to `queue`, and drop it after `deadline`.
+
+    Args:
+        queue (str | None): One of the queues above; defaults to the app's default queue.
+        deadline (float | None): Absolute time (as from `time.time()`) after which nobody
+            will read the result. It is sent as the `deadline` header; a worker that only gets
+            to the task later skips it (see `tasks.ScoringTask`).
+        options: Other options, e.g. `task_id`.
+
+    The current trace context, if any, is also sent in the headers (see `tracing`).
+    """
+    options["queue"] = queue or app.conf.task_default_queue
+    headers = inject_context(dict(options.get("headers", {})))
+    if deadline is not None:
+        headers["deadline"] = deadline
+    if headers:
+        options["headers"] = headers
+    return options
+
+
+def release_results(task_ids: list[str], unfinished: list[str] = (), backend=None) -> None:
+    """Forget the results of a request's tasks, and revoke the tasks that are unfinished.
+
+    Dispatchers call this once they stop waiting, so that a request leaves nothing behind in
+    the result backend. Failures are logged, not raised: the results expire anyway.
+
+    Args:
+        task_ids (list[str]): Tasks whose results were collected (or are no longer needed).
+        unfinished (list[str]): Tasks that missed the deadline. Workers that have not started
+            them yet drop them; if they do finish, their results expire after
+            RESULT_TTL_SECONDS.
+        backend: The Celery result backend; defaults to the app's.
+    """
+    backend = backend or app.backend
+    try:
+        if isinstance(backend, RedisBackend):
+            keys = [backend.get_key_for_task(x) for x in [*task_ids, *unfinished]]
+            if keys:
+                backend.client.delete(*keys)
+        else:
+            for task_id in [*task_ids, *unfinished]:
+                backend.forget(task_id)
+        if unfinished:
+            app.control.revoke(list(unfinished))
+    except Exception as e:
+        logger.error(f"Error releasing task results: {e}")
+
+
+def expired_drop_counts(backend=None) -> dict[str, int]:
+    """Number of tasks that workers skipped because their deadline had passed, by task name.
+
+    The counts are kept in the Redis result backend; with other backends this is empty.
+    """
+    backend = backend or app.backend
+    if not isinstance(backend, RedisBackend):
+        return {}
+    try:
+        counts = backend.client.hgetall(EXPIRED_DROPS_KEY)
+    except redis.RedisError as e:
+        logger.error(f"Error reading expired drop counts: {e}")
+        return {}
+    return {name.decode(): int(count) for name, count in counts.items()}
@@ -0,0 +1,105 @@
+"""Compact transport for scoring results.
+
+By default, every Celery task stores its result as a JSON document (result plus metadata)
+under its own key in the result backend, and the dispatcher reads the keys back. For
+high-volume scoring, this module provides a leaner channel:
+
+ - each result record is packed into a few bytes: a status byte and three little-endian
+   doubles (`score`, `t_start`, `t_end`), or a status byte and an error message
+ - all tasks of a request append their records to one Redis stream (`result_stream` task
+   header), tagged with the task's position in the request (`result_index` header)
+ - the dispatcher blocks on `XREAD`, which returns every record that arrived since its last
+   read in one call, and deletes the stream when it is done
+
+Tasks sent this way are sent with `ignore_result=True`, so Celery stores nothing for them.
+"""
+
+import struct
+import time
+from typing import Any
+
+import redis
+
+"""Streams are deleted by the dispatcher; this TTL only cleans up after dispatchers that died"""
+RESULT_STREAM_TTL_SECONDS = 60
+
+_OK = struct.Struct("<Bddd")
+_ERROR = struct.Struct("<BH")
+
+
+def pack_records(records: list[dict[str, Any]]) -> bytes:
+    """Pack task result records (as returned by the scoring tasks) into bytes.
+
+    Records with an `error` are kept as errors, with messages truncated to 65535 bytes; the
+    other fields of a record (such as `item_id`, which the dispatcher already knows) are
+    dropped.
+    """
+    out = bytearray()
+    for record in records:
+        if "error" in record:
+            # truncated to the length field's range, on a character boundary
+            message = str(record["error"]).encode("utf-8")[:0xFFFF]
+            message = message.decode("utf-8", errors="ignore").encode("utf-8")
+            out += _ERROR.pack(1, len(message)) + message
+        else:
+            out += _OK.pack(0, record["score"], record.get("t_start", 0), record.get("t_end", 0))
+    return bytes(out)
+
+
+def unpack_records(data: bytes) -> list[dict[str, Any]]:
+    """Inverse of `pack_records`"""
+    records = []
+    offset = 0
+    while offset < len(data):
+        if data[offset] == 0:
+            _, score, t_start, t_end = _OK.unpack_from(data, offset)
+            records.append({"score": score, "t_start": t_start, "t_end": t_end})
+            offset += _OK.size
+        else:
+            _, length = _ERROR.unpack_from(data, offset)
+            offset += _ERROR.size
+            records.append({"error": data[offset : offset + length].decode("utf-8")})
+            offset += length
+    return records
+
+
+def write_records(client: redis.Redis, stream: str, index: int, records: list[dict[str, Any]]):
+    """Append a task's packed records to a request's result stream (one round trip)."""
+    with client.pipeline(transaction=False) as pipe:
+        pipe.xadd(stream, {"i": index, "r": pack_records(records)})
+        pipe.expire(stream, RESULT_STREAM_TTL_SECONDS)
+        pipe.execute()
+
+
+def read_records(
+    client: redis.Redis, stream: str, n_tasks: int, deadline: float
+) -> dict[int, list[dict[str, Any]]]:
+    """Read the records of a request's tasks until all have arrived or the deadline passes.
+
+    Args:
+        client (redis.Redis): Client for the Redis instance the tasks write to.
+        stream (str): The request's result stream. It is deleted before returning.
+        n_tasks (int): Number of tasks in the request.
+        deadline (float): Absolute time (as from `time.time()`) to stop waiting at.
+
+    Returns:
+        dict[int, list[dict[str, Any]]]: Unpacked records, keyed by `result_index`. Tasks that
+        did not report before the deadline are missing.
+    """
+    results: dict[int, list[dict[str, Any]]] = {}
+    last_id = "0-0"
+    try:
+        while len(results) < n_tasks:
+            remaining_ms = int((deadline - time.time()) * 1000)
+            if remaining_ms <= 0:
+                break
+            response = client.xread({stream: last_id}, block=remaining_ms)
+            if not response:
+                break
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    results[int(fields[b"i"])] = unpack_records(fields[b"r"])
+    finally:
+        client.delete(stream)
+    return results
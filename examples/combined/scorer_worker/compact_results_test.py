@@ -0,0 +1,70 @@
+import time
+
+import fakeredis
+import pytest
+
+from scorer_worker.compact_results import (
+    RESULT_STREAM_TTL_SECONDS,
+    pack_records,
+    read_records,
+    unpack_records,
+    write_records,
+)
+
+STREAM = "scorer_worker:results:test"
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def test_pack_round_trip():
+    records = [
+        {"item_id": "0", "score": 0.25, "t_start": 1.5, "t_end": 2.5},
+        {"item_id": "1", "error": "Sentiment scoring failed: ünïcode"},
+        {"item_id": "2", "score": -1.0},
+    ]
+
+    data = pack_records(records)
+
+    assert len(data) == 25 + 3 + len(records[1]["error"].encode()) + 25
+    assert unpack_records(data) == [
+        {"score": 0.25, "t_start": 1.5, "t_end": 2.5},
+        {"error": records[1]["error"]},
+        {"score": -1.0, "t_start": 0, "t_end": 0},
+    ]
+    assert unpack_records(b"") == []
+
+
+def test_pack_truncates_long_errors_on_a_character_boundary():
+    error = "é" * 0x8000  # two bytes per character, so byte 0xFFFF splits one
+
+    [record] = unpack_records(pack_records([{"error": error}]))
+
+    assert record["error"] == "é" * 0x7FFF
+
+
+def test_write_and_read(client):
+    write_records(client, STREAM, 1, [{"score": 0.5}])
+    write_records(client, STREAM, 0, [{"score": 0.1}, {"error": "boom"}])
+    assert 0 < client.ttl(STREAM) <= RESULT_STREAM_TTL_SECONDS
+
+    results = read_records(client, STREAM, 2, time.time() + 1)
+
+    assert results[0][0]["score"] == 0.1
+    assert results[0][1] == {"error": "boom"}
+    assert results[1][0]["score"] == 0.5
+    assert not client.exists(STREAM)
+
+
+def test_read_stops_at_deadline(client):
+    write_records(client, STREAM, 0, [{"score": 0.5}])
+
+    t_start = time.time()
+    results = read_records(client, STREAM, 2, t_start + 0.2)
+    elapsed = time.time() - t_start
+
+    assert list(results) == [0]
+    assert 0.15 <= elapsed < 0.5
+    assert not client.exists(STREAM)
@@ -1,7 +1,9 @@
 import sys
 from pathlib import Path
 
+import fakeredis
 import pytest
+from celery.backends.redis import RedisBackend
 
 from scorer_worker.celery_app import app as celery_app
 
@@ -42,3 +44,16 @@ def my_celery_app():
     celery_app.conf.task_default_queue = "celery"
     # ^ this is the default queue name used by test workers
     return celery_app
+
+
+@pytest.fixture
+def fake_backend(my_celery_app):
+    backend = RedisBackend(app=my_celery_app, url="redis://localhost:6380/0")
+    backend.__dict__["client"] = fakeredis.FakeRedis()  # replaces the cached client property
+    return backend
+
+
+@pytest.fixture
+def app_backend(my_celery_app, fake_backend, monkeypatch):
+    """Makes `fake_backend` the app's result backend"""
+    monkeypatch.setattr(my_celery_app._local, "backend", fake_backend, raising=False)
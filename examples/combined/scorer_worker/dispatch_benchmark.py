@@ -0,0 +1,115 @@
+"""Compare thread-pool, asyncio and local scoring dispatch under concurrent requests.
+
+The thread-pool variant is what the ranking server used to do: every request creates a
+`ThreadPoolExecutor` and blocks a thread in `scorer_advanced.compute_scores`. The asyncio
+variant awaits `scorer_async.compute_scores_async` on the shared connection pool. The local
+variant awaits `scorer_local.LocalScorer.compute_scores_async`, which skips Celery.
+
+The Celery variants need a running broker, result backend and scorer workers, e.g.:
+
+    docker compose up -d redis-celery-broker
+    celery -A scorer_worker.tasks worker -Q scorer --concurrency 8
+    python -m scorer_worker.dispatch_benchmark --concurrency 50 200
+
+Compare with local scoring in as many processes:
+
+    python -m scorer_worker.dispatch_benchmark --concurrency 50 200 --modes asyncio local \
+        --processes 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scorer_worker.scorer_advanced import ScorerType, ScoringInput, compute_scores
+from scorer_worker.scorer_async import compute_scores_async
+from scorer_worker.scorer_local import LocalScorer
+
+
+def request_input(items: int) -> list[ScoringInput]:
+    return [
+        ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "asdf", "mean": 0.5})
+        for i in range(items)
+    ]
+
+
+def thread_request(items: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor() as executor:
+        executor.submit(compute_scores, request_input(items)).result()
+    return time.perf_counter() - start
+
+
+def run_threads(concurrency: int, items: int) -> tuple[list[float], int]:
+    peak_threads = threading.active_count()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        futures = [clients.submit(thread_request, items) for _ in range(concurrency)]
+        while not all(f.done() for f in futures):
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.005)
+        return [f.result() for f in futures], peak_threads
+
+
+async def async_request(compute, items: int) -> float:
+    start = time.perf_counter()
+    await compute(request_input(items))
+    return time.perf_counter() - start
+
+
+async def run_async(concurrency: int, items: int, compute=compute_scores_async):
+    peak_threads = threading.active_count()
+    task = asyncio.gather(*(async_request(compute, items) for _ in range(concurrency)))
+    while not task.done():
+        peak_threads = max(peak_threads, threading.active_count())
+        await asyncio.sleep(0.005)
+    return await task, peak_threads
+
+
+def report(name: str, concurrency: int, latencies: list[float], threads: int, wall: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:>8} x{concurrency:<4} p50 {statistics.median(latencies) * 1000:7.1f}ms"
+        f"  p95 {p95 * 1000:7.1f}ms  {concurrency / wall:6.1f} req/s  peak threads {threads}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--items", type=int, default=10, help="items scored per request")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["threads", "asyncio"],
+        choices=["threads", "asyncio", "local"],
+    )
+    parser.add_argument("--processes", type=int, help="processes for local scoring")
+    args = parser.parse_args()
+
+    local_scorer = None
+    if "local" in args.modes:
+        local_scorer = LocalScorer(args.processes)
+        local_scorer.start()
+
+    for concurrency in args.concurrency:
+        for mode in args.modes:
+            start = time.perf_counter()
+            if mode == "threads":
+                latencies, threads = run_threads(concurrency, args.items)
+            elif mode == "asyncio":
+                latencies, threads = asyncio.run(run_async(concurrency, args.items))
+            else:
+                compute = local_scorer.compute_scores_async
+                latencies, threads = asyncio.run(run_async(concurrency, args.items, compute))
+            report(mode, concurrency, latencies, threads, time.perf_counter() - start)
+
+    if local_scorer is not None:
+        local_scorer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Soak test: scoring requests must not leave task results behind in the result backend.
+
+Runs thousands of simulated requests against a local (in-process) Redis. Most tasks finish
+in time; every tenth request has a task that misses the deadline and only finishes during
+the next request, so its result lands after its dispatcher stopped waiting.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from celery.result import AsyncResult
+
+from scorer_worker import scorer_advanced
+from scorer_worker.celery_app import RESULT_TTL_SECONDS
+from scorer_worker.scorer_advanced import ScorerType, ScoringInput
+
+REQUESTS = 2000
+ITEMS = 5
+
+
+@pytest.mark.usefixtures("app_backend")
+@pytest.mark.parametrize(
+    "dispatch", [scorer_advanced.compute_scores, scorer_advanced.compute_scores_batched]
+)
+def test_result_keys_stay_bounded(my_celery_app, fake_backend, monkeypatch, dispatch):
+    late: list[str] = []  # tasks that will finish after their request timed out
+    stats = SimpleNamespace(requests=0, late_results=0)
+
+    class FakeGroup:
+        def __init__(self, tasks):
+            self.task_ids = [x.options["task_id"] for x in tasks]
+
+        def apply_async(self):
+            while late:
+                fake_backend.store_result(late.pop(), {"score": 0.5}, "SUCCESS")
+                stats.late_results += 1
+            stats.requests += 1
+            stuck = self.task_ids[-1:] if stats.requests % 10 == 0 else []
+            for task_id in self.task_ids:
+                if task_id not in stuck:
+                    result = {"score": 0.5}
+                    if dispatch is scorer_advanced.compute_scores_batched:
+                        result = [result] * ITEMS
+                    fake_backend.store_result(task_id, result, "SUCCESS")
+            late.extend(stuck)
+            return SimpleNamespace(
+                results=[
+                    AsyncResult(x, backend=fake_backend, app=my_celery_app) for x in self.task_ids
+                ]
+            )
+
+    revoked = []
+    monkeypatch.setattr(scorer_advanced, "group", FakeGroup)
+    monkeypatch.setattr(scorer_advanced, "RESULT_COLLECTION", "mget")
+    monkeypatch.setattr(scorer_advanced, "DEADLINE_SECONDS", 0.02)
+    monkeypatch.setattr(scorer_advanced, "HEDGE_AFTER", 0)
+    monkeypatch.setattr(my_celery_app.control, "revoke", revoked.extend)
+    client = fake_backend.client
+    input = [
+        ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x"}) for i in range(ITEMS)
+    ]
+
+    peak_keys = 0
+    for _ in range(REQUESTS):
+        if dispatch is scorer_advanced.compute_scores_batched:
+            dispatch(input, chunk_size=ITEMS)
+        else:
+            dispatch(input)
+        peak_keys = max(peak_keys, client.dbsize())
+
+    # only results that arrived too late are left, and they expire
+    assert stats.late_results == REQUESTS // 10 - 1
+    assert client.dbsize() == stats.late_results
+    assert peak_keys <= stats.late_results + ITEMS
+    assert all(0 < client.ttl(key) <= RESULT_TTL_SECONDS for key in client.scan_iter())
+    assert len(revoked) >= REQUESTS // 10  # a slow test machine may time out more
@@ -0,0 +1,106 @@
+"""Compare Celery result keys with the compact result transport.
+
+For a request of `--items` items scored in batches of `--chunk-size`, this stores the
+results the way each transport does and reports the bytes stored per item and the time
+the dispatcher needs to fetch all of them:
+
+ - celery: one JSON result document per task, read back with one `MGET`
+ - compact: packed records in one stream per request, read back with `XREAD`
+   (see `compact_results`)
+
+No workers are needed. Without `--redis-url` this runs against fakeredis, which shows the
+size difference but not network round-trip costs; point it at a real Redis for latency:
+
+    python -m scorer_worker.result_transport_benchmark --redis-url redis://localhost:6380/1
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import fakeredis
+import redis
+from celery import Celery
+from celery.backends.redis import RedisBackend
+from celery.utils import uuid
+
+from scorer_worker.compact_results import read_records, write_records
+
+
+def batch_results(chunk_size: int) -> list[dict]:
+    now = time.time()
+    return [
+        {"item_id": uuid(), "score": random.random(), "t_start": now, "t_end": now + 0.001}
+        for _ in range(chunk_size)
+    ]
+
+
+def run_celery(backend: RedisBackend, batches: list[list[dict]]) -> tuple[int, float]:
+    task_ids = [uuid() for _ in batches]
+    for task_id, results in zip(task_ids, batches):
+        backend.store_result(task_id, results, "SUCCESS")
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    stored = sum(backend.client.strlen(key) for key in keys)
+
+    start = time.perf_counter()
+    metas = [backend.decode_result(value) for value in backend.client.mget(keys)]
+    elapsed = time.perf_counter() - start
+
+    assert all(meta["status"] == "SUCCESS" for meta in metas)
+    backend.client.delete(*keys)
+    return stored, elapsed
+
+
+def run_compact(client: redis.Redis, batches: list[list[dict]]) -> tuple[int, float]:
+    stream = f"scorer_worker:results:{uuid()}"
+    for index, results in enumerate(batches):
+        write_records(client, stream, index, results)
+    stored = sum(
+        len(key) + len(value)
+        for _, fields in client.xrange(stream)
+        for key, value in fields.items()
+    )
+
+    start = time.perf_counter()
+    records = read_records(client, stream, len(batches), time.time() + 1)
+    elapsed = time.perf_counter() - start
+
+    assert len(records) == len(batches)
+    return stored, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", help="Redis to use; defaults to an in-process fakeredis")
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--chunk-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.redis_url:
+        client = redis.Redis.from_url(args.redis_url)
+    else:
+        client = fakeredis.FakeRedis()
+    backend = RedisBackend(app=Celery(), url=args.redis_url or "redis://localhost:6379/0")
+    backend.__dict__["client"] = client  # replaces the cached client property
+
+    for items in args.items:
+        sizes = [args.chunk_size] * (items // args.chunk_size)
+        if items % args.chunk_size:
+            sizes.append(items % args.chunk_size)
+        for name, run, target in [
+            ("celery", run_celery, backend),
+            ("compact", run_compact, client),
+        ]:
+            runs = [run(target, [batch_results(n) for n in sizes]) for _ in range(args.repeat)]
+            stored = runs[0][0]
+            fetch = statistics.median(elapsed for _, elapsed in runs)
+            print(
+                f"{name:>8} {items:>5} items  {stored / items:6.1f} bytes/item"
+                f"  fetch {fetch * 1000:7.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
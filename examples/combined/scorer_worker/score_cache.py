@@ -0,0 +1,213 @@
+"""Item score cache
+
+The same item is often shown in many users' feeds within a short time, and item IDs are
+(mostly) stable between requests. Caching scores lets the ranking server send only the items
+it hasn't seen before to the scoring queue.
+
+Scores are keyed by `(item_id, hash(text), scorer)`: including the text hash means an edited
+post is rescored, and including the scorer name keeps different scoring tasks apart.
+
+There are two tiers:
+ - a local in-memory LRU, private to each ranking server process, with a short TTL
+ - an optional Redis tier shared by all processes, with a longer TTL
+
+Lookups check the local tier first, then fetch all remaining keys from Redis in one `MGET`.
+Redis hits are copied into the local tier.
+
+Example:
+
+    cache = ScoreCache(redis_client, local_ttl=60, redis_ttl=3600)
+    scores = cache.get_many("sentiment", data)  # {item_id: score} for the cached items
+    misses = [x for x in data if x["item_id"] not in scores]
+    results = compute_scores_basic("scorer_worker.tasks.sentiment_scorer", misses)
+    cache.set_many("sentiment", misses, results)
+
+`AsyncScoreCache` has the same interface, with coroutines, for a `redis.asyncio` client.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """Stable (across processes) short hash of an item's text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class LocalTier:
+    """Thread-safe in-memory LRU with a per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys: list[str]) -> dict[str, float]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires, score = entry
+                if expires < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = score
+        return found
+
+    def set_many(self, scores: dict[str, float]):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = (expires, score)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class ScoreCache:
+    """Two-tier (local + Redis) cache of per-item scores.
+
+    Args:
+        redis_client (redis.Redis | None): Client for the shared tier; None disables it.
+        local_size (int): Maximum number of scores kept in the local tier.
+        local_ttl (float): Seconds a score stays in the local tier.
+        redis_ttl (int): Seconds a score stays in Redis.
+        prefix (str): Prefix of the Redis keys.
+
+    Redis errors are logged and treated as misses, so an unavailable Redis only costs
+    cache hits, never requests.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis | None = None,
+        local_size: int = 100_000,
+        local_ttl: float = 60,
+        redis_ttl: int = 3600,
+        prefix: str = "score_cache",
+    ):
+        self.redis_client = redis_client
+        self.local = LocalTier(local_size, local_ttl)
+        self.redis_ttl = redis_ttl
+        self.prefix = prefix
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, scorer: str, item_id: str, text: str) -> str:
+        return f"{self.prefix}:{scorer}:{item_id}:{text_hash(text)}"
+
+    def get_many(self, scorer: str, items: list[dict[str, Any]]) -> dict[str, float]:
+        """Look up cached scores.
+
+        Args:
+            scorer (str): Name of the scorer that produced the scores.
+            items (list[dict[str, Any]]): Scoring inputs, with at least `item_id` and `text`.
+
+        Returns:
+            dict[str, float]: Cached scores keyed by item_id. Items without a cached score
+            are left out.
+        """
+        keys, found, remaining = self._local_lookup(scorer, items)
+        values = []
+        if remaining and self.redis_client is not None:
+            try:
+                values = self.redis_client.mget(remaining)
+            except redis.RedisError as e:
+                logger.error(f"Error reading scores from redis: {e}")
+        return self._merge_lookup(keys, found, remaining, values)
+
+    def _local_lookup(self, scorer: str, items: list[dict[str, Any]]):
+        keys = {self.key(scorer, x["item_id"], x["text"]): x["item_id"] for x in items}
+        found = self.local.get_many(list(keys))
+        self.local_hits += len(found)
+        remaining = [key for key in keys if key not in found]
+        return keys, found, remaining
+
+    def _merge_lookup(self, keys, found, remaining, values) -> dict[str, float]:
+        from_redis = {
+            key: float(value) for key, value in zip(remaining, values) if value is not None
+        }
+        self.redis_hits += len(from_redis)
+        self.local.set_many(from_redis)
+        found.update(from_redis)
+
+        self.misses += len(keys) - len(found)
+        return {keys[key]: score for key, score in found.items()}
+
+    def set_many(self, scorer: str, items: list[dict[str, Any]], results: list[dict[str, Any]]):
+        """Store scores in both tiers.
+
+        Args:
+            scorer (str): Name of the scorer that produced the scores.
+            items (list[dict[str, Any]]): The scoring inputs, used to find each item's text.
+            results (list[dict[str, Any]]): Scoring outputs, with `item_id` and `score`.
+                Items without a result (e.g. timed out) are not stored.
+        """
+        scores = self._local_store(scorer, items, results)
+        if scores and self.redis_client is not None:
+            try:
+                with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key, score in scores.items():
+                        pipe.set(key, score, ex=self.redis_ttl)
+                    pipe.execute()
+            except redis.RedisError as e:
+                logger.error(f"Error writing scores to redis: {e}")
+
+    def _local_store(self, scorer, items, results) -> dict[str, float]:
+        texts = {x["item_id"]: x["text"] for x in items}
+        scores = {
+            self.key(scorer, result["item_id"], texts[result["item_id"]]): result["score"]
+            for result in results
+            if result["item_id"] in texts
+        }
+        self.local.set_many(scores)
+        return scores
+
+
+class AsyncScoreCache(ScoreCache):
+    """`ScoreCache` for asyncio servers: `get_many` and `set_many` are coroutines.
+
+    Args:
+        redis_client (redis.asyncio.Redis | None): Client for the shared tier; None disables
+            it. The other arguments are as for `ScoreCache`.
+    """
+
+    async def get_many(self, scorer: str, items: list[dict[str, Any]]) -> dict[str, float]:
+        keys, found, remaining = self._local_lookup(scorer, items)
+        values = []
+        if remaining and self.redis_client is not None:
+            try:
+                values = await self.redis_client.mget(remaining)
+            except redis.RedisError as e:
+                logger.error(f"Error reading scores from redis: {e}")
+        return self._merge_lookup(keys, found, remaining, values)
+
+    async def set_many(
+        self, scorer: str, items: list[dict[str, Any]], results: list[dict[str, Any]]
+    ):
+        scores = self._local_store(scorer, items, results)
+        if scores and self.redis_client is not None:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key, score in scores.items():
+                        pipe.set(key, score, ex=self.redis_ttl)
+                    await pipe.execute()
+            except redis.RedisError as e:
+                logger.error(f"Error writing scores to redis: {e}")
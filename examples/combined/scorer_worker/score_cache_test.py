@@ -0,0 +1,77 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from scorer_worker.score_cache import AsyncScoreCache, ScoreCache
+
+SCORER = "scorer_worker.tasks.sentiment_scorer"
+
+
+@pytest.fixture
+def items():
+    return [{"item_id": str(i), "text": f"post number {i}"} for i in range(4)]
+
+
+def results_for(items, score=0.5):
+    return [{"item_id": x["item_id"], "score": score} for x in items]
+
+
+def test_local_tier(items):
+    cache = ScoreCache()
+    assert cache.get_many(SCORER, items) == {}
+
+    cache.set_many(SCORER, items[:2], results_for(items[:2]))
+
+    assert cache.get_many(SCORER, items) == {"0": 0.5, "1": 0.5}
+    assert (cache.local_hits, cache.redis_hits, cache.misses) == (2, 0, 6)
+
+
+def test_key_includes_text_and_scorer(items):
+    cache = ScoreCache()
+    cache.set_many(SCORER, items, results_for(items))
+
+    edited = [{"item_id": "0", "text": "edited text"}]
+    assert cache.get_many(SCORER, edited) == {}
+    assert cache.get_many("another_scorer", items) == {}
+
+
+def test_redis_tier_is_shared(items):
+    redis_client = fakeredis.FakeRedis()
+    writer = ScoreCache(redis_client, redis_ttl=60)
+    reader = ScoreCache(redis_client)
+
+    writer.set_many(SCORER, items, results_for(items, score=-0.25))
+
+    assert reader.get_many(SCORER, items) == {x["item_id"]: -0.25 for x in items}
+    assert reader.redis_hits == 4
+    assert all(0 < redis_client.ttl(key) <= 60 for key in redis_client.keys())
+
+    # redis hits are copied to the local tier
+    reader.get_many(SCORER, items)
+    assert reader.local_hits == 4
+
+
+def test_local_tier_eviction(items):
+    cache = ScoreCache(local_size=2)
+    cache.set_many(SCORER, items, results_for(items))
+
+    assert len(cache.local) == 2
+    assert set(cache.get_many(SCORER, items)) == {"2", "3"}
+
+
+def test_async_cache_shares_redis_tier(items):
+    server = fakeredis.FakeServer()
+    writer = ScoreCache(fakeredis.FakeRedis(server=server), redis_ttl=60)
+    writer.set_many(SCORER, items[:2], results_for(items[:2]))
+
+    async def run():
+        reader = AsyncScoreCache(fakeredis.FakeAsyncRedis(server=server), redis_ttl=60)
+        found = await reader.get_many(SCORER, items)
+        await reader.set_many(SCORER, items[2:], results_for(items[2:], score=0.75))
+        return reader, found
+
+    reader, found = asyncio.run(run())
+    assert found == {"0": 0.5, "1": 0.5}
+    assert (reader.local_hits, reader.redis_hits, reader.misses) == (0, 2, 2)
+    assert writer.get_many(SCORER, items[2:]) == {"2": 0.75, "3": 0.75}
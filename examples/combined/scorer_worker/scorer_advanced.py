@@ -19,16 +19,26 @@ This is the middle ground between the "everything is a dict" approach and the
 Feel free to use any of these approaches in your own code based on your taste and judgement.
 """
 
+import json
 import logging
+import math
+import os
+import threading
 import time
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Any, NamedTuple
+from typing import Any, Callable, NamedTuple
 
-from celery import group
+import redis
+from celery import group, states
+from celery.backends.redis import RedisBackend
+from celery.result import AsyncResult
 from celery.utils import uuid
 
 from scorer_worker.celery_app import app as celery_app
+from scorer_worker.celery_app import release_results, task_options
+from scorer_worker.compact_results import read_records
+from scorer_worker.tracing import record_outputs, traced
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,6 +50,31 @@ logger = logging.getLogger(__name__)
 """Maximum duration before we return a partial result set"""
 DEADLINE_SECONDS = 1
 
+"""Batching: aim for this many chunks per worker process, with chunks of at most this size"""
+CHUNKS_PER_WORKER = 2
+MAX_CHUNK_SIZE = 50
+
+"""How often the number of worker processes is re-read from Celery, in the background"""
+WORKER_COUNT_REFRESH_SECONDS = 60
+
+"""How results are collected: "pubsub", "mget" or "poll" (see `collect_results`)"""
+RESULT_COLLECTION = os.getenv("SCORER_RESULT_COLLECTION", "pubsub")
+POLL_INTERVAL_SECONDS = 0.02
+
+"""Key prefix of the per-request result streams used by `compute_scores_compact`"""
+RESULT_STREAM_PREFIX = "scorer_worker:results:"
+
+"""Per-item timings of recent requests, kept in a capped list on the Redis result backend for
+the autoscaler (see `autoscaler`). Set SCORER_PUBLISH_TIMINGS=1 to publish them."""
+TIMINGS_KEY = "scorer_worker:timings"
+TIMINGS_MAX_SAMPLES = 2000
+PUBLISH_TIMINGS = os.getenv("SCORER_PUBLISH_TIMINGS", "0") == "1"
+
+"""Hedging: tasks still running after this fraction of the deadline get a duplicate, sent
+to HEDGE_QUEUE (or the original's queue). 0 disables hedging."""
+HEDGE_AFTER = float(os.getenv("SCORER_HEDGE_AFTER", "0"))
+HEDGE_QUEUE = os.getenv("SCORER_HEDGE_QUEUE") or None
+
 
 class ScorerType(Enum):
     """Rich label for the different types of scoring tasks we can run
@@ -49,18 +84,28 @@ class ScorerType(Enum):
     Attributes:
         name (str): The name of the task.
         runner (str): The registered celery task runner function.
+        batch_runner (str): The registered celery task that scores a list of items.
 
     This functionality may also be rolled into a more heavyweight class,
     possibly in the `tasks.py` module, that can tie together the task label,
     input/output models, and runner function.
     """
 
-    SENTIMENT = (auto(), "scorer_worker.tasks.sentiment_scorer")
-    RANDOM = (auto(), "scorer_worker.tasks.random_scorer")
-
-    def __init__(self, id, runner):
+    SENTIMENT = (
+        auto(),
+        "scorer_worker.tasks.sentiment_scorer",
+        "scorer_worker.tasks.sentiment_batch_scorer",
+    )
+    RANDOM = (
+        auto(),
+        "scorer_worker.tasks.random_scorer",
+        "scorer_worker.tasks.random_batch_scorer",
+    )
+
+    def __init__(self, id, runner, batch_runner):
         self.id = id
         self.runner = runner
+        self.batch_runner = batch_runner
 
     def __repr__(self):
         return f"<{self.__class__.__name__}.{self.name}>"
@@ -80,7 +125,12 @@ class TaskParams(NamedTuple):
 
 @dataclass
 class Timings:
-    """Timing information for a task"""
+    """Timing information for a task
+
+    If the task was hedged, `hedge_sent` is when the duplicate was sent, and `winner` says
+    whether the "original" or the "hedge" delivered the result. `task_id` and the other
+    timings are then those of the winning copy.
+    """
 
     task_id: str
     sent: float = 0
@@ -89,6 +139,8 @@ class Timings:
     completed: float = 0
     result_received: float = 0
     success: bool = False
+    hedge_sent: float = 0
+    winner: str = "original"
 
     def from_result(self, result: dict, t_start: float):
         """This helper method populates the timings from the result dict"""
@@ -131,11 +183,18 @@ class ScoringOutput:
     error: str | None = None
 
 
-def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
+@traced("compute_scores")
+def compute_scores(
+    input: list[ScoringInput], hedge_after: float | None = None, queue: str | None = None
+) -> list[ScoringOutput]:
     """Task dispatcher/manager.
 
     Args:
         input (list[ScoringInput]): The list of scoring tasks to run.
+        hedge_after (float | None): Fraction of the deadline after which unfinished tasks
+            are hedged (see below); defaults to HEDGE_AFTER. 0 disables hedging.
+        queue (str | None): The queue to send the tasks to (see `celery_app`); defaults to
+            the interactive queue.
 
     Returns:
         list[ScoringOutput]: The list of scoring results.
@@ -146,16 +205,23 @@ def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
 
     The following flow is implemented:
     1. Create a list of tasks from the input data, using the supplied scorer_type label
-       and the associated `tasks.py` runner defined in the ScorerType enum.
+       and the associated `tasks.py` runner defined in the ScorerType enum. Each task carries
+       the deadline, so that workers skip it once nobody is waiting for the result.
     2. Send the task group to Celery for execution; this minimizes the overhead of task creation.
        - a list of pending tasks is maintained, keyed by task_id
-    3. Busy-wait for the results, updating the output list as they arrive. This approach is
-       required due to the limitations of Celery's `get` method, which has seconds-level granularity.
+    3. Wait for the results, updating the output list as they arrive (see `collect_results`).
+       We don't use Celery's `get` method, which has seconds-level granularity.
     4. If the deadline is reached, return a partial result set; here we also use the pending list to
        explicitly mark the tasks that did not complete in time.
 
     Timing information is collected for each task both by this driver function and by the tasks
     themselves. We found it useful to include this information in the output for tuning and profiling.
+
+    Hedging: a single slow worker (or a task stuck behind a long one) can make an item miss the
+    deadline. With hedging enabled, every task still unfinished at `hedge_after * DEADLINE_SECONDS`
+    is sent again, to HEDGE_QUEUE if set. The first copy to finish provides the result, and the
+    other one is revoked. `Timings.winner` records which copy won, so the threshold can be tuned:
+    if hedges rarely win, hedge later (or not at all); if they often do, hedge earlier.
     """
 
     t_start = time.time()
@@ -167,7 +233,11 @@ def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
         task_id = uuid()
         task_params[task_id] = TaskParams(scorer_type=scorer_type, item_id=item_id)
         tasks.append(
-            celery_app.signature(scorer_type.runner, kwargs=item.data, options={"task_id": task_id})
+            celery_app.signature(
+                scorer_type.runner,
+                kwargs=item.data,
+                options=task_options(queue, t_start + DEADLINE_SECONDS, task_id=task_id),
+            )
         )
 
     logger.info("Sending the task group")
@@ -175,10 +245,14 @@ def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
     async_result = group(tasks).apply_async()
     t_enqueued = time.time() - t_start
 
+    hedge_after = HEDGE_AFTER if hedge_after is None else hedge_after
+    hedges: dict[str, str] = {}  # hedge task_id -> original task_id
+    hedge_sent = 0.0
+    winners: dict[str, str] = {}  # original task_id -> task_id of the copy that finished
     output = []
 
     def placeholder_output(task_id: str) -> ScoringOutput:
-        timings = Timings(task_id=task_id, sent=t_sent, enqueued=t_enqueued)
+        timings = Timings(task_id=task_id, sent=t_sent, enqueued=t_enqueued, hedge_sent=hedge_sent)
         return ScoringOutput(
             item_id=task_params[task_id].item_id,
             scorer_type=task_params[task_id].scorer_type,
@@ -187,7 +261,12 @@ def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
 
     def result_callback(task_id: str, result: dict[str, Any]):
         logger.info(f"Received result for task {task_id}")
-        item_output = placeholder_output(task_id)
+        original_id = hedges.get(task_id, task_id)
+        winners[original_id] = task_id
+        item_output = placeholder_output(original_id)
+        if task_id in hedges:
+            item_output.timings.task_id = task_id
+            item_output.timings.winner = "hedge"
         if isinstance(result, Exception):
             logger.error(f"Task {task_id} raised an exception: {result}")
             item_output.error = str(result)
@@ -196,29 +275,434 @@ def compute_scores(input: list[ScoringInput]) -> list[ScoringOutput]:
             item_output.score = result["score"]
         output.append(item_output)
 
-    pending = {result.id: result for result in async_result.results}
-    while True:
-        if time.time() - t_start > DEADLINE_SECONDS:
-            logger.info("Timeout error")
-            break
-        for result_id in list(pending.keys()):
-            if pending[result_id].ready():
-                result = pending.pop(result_id)
-                result_callback(result.id, result.result)
-        if len(pending) == 0:
-            logger.info("Received all results")
-            break
-        time.sleep(0.02)
+    results = async_result.results
+    if 0 < hedge_after < 1:
+        pending = collect_results(
+            results, t_start, result_callback, until=t_start + hedge_after * DEADLINE_SECONDS
+        )
+        if pending:
+            hedge_sent = time.time() - t_start
+            hedge_results = send_hedges(pending, tasks, hedges)
+            logger.info(f"Hedged {len(pending)} tasks")
+            results = [x for x in results if x.id in set(pending)] + hedge_results
+
+    linked = {**hedges, **{original: hedge for hedge, original in hedges.items()}}
+    pending = collect_results(results, t_start, result_callback, linked=linked)
+
+    # the copies that lost the race are no longer needed, nor are the tasks that timed out
+    losers = [
+        hedge if winners[original] == original else original
+        for hedge, original in hedges.items()
+        if original in winners
+    ]
+    unfinished = losers + pending
+    task_ids = [x.id for x in async_result.results] + list(hedges)
+    release_results([x for x in task_ids if x not in unfinished], unfinished)
 
     for task_id in pending:
+        if task_id in hedges:
+            continue  # reported under the original task_id
         item_output = placeholder_output(task_id)
         item_output.error = "Timed out waiting for results"
         output.append(item_output)
 
+    publish_timings(output)
+    record_outputs(output, t_start)
+    logger.info("Sending results")
+    return output
+
+
+def send_hedges(task_ids: list[str], tasks: list[Any], hedges: dict[str, str]) -> list[AsyncResult]:
+    """Send a duplicate of each of the given tasks, to HEDGE_QUEUE if it is set, otherwise to
+    the queue of the original.
+
+    Args:
+        task_ids (list[str]): The tasks to duplicate.
+        tasks (list[Any]): All of the request's task signatures.
+        hedges (dict[str, str]): Updated with the task_id of each duplicate, mapped to the
+            task_id of its original.
+    """
+    by_id = {task.options["task_id"]: task for task in tasks}
+    copies = []
+    for task_id in task_ids:
+        hedge_id = uuid()
+        hedges[hedge_id] = task_id
+        options = {"task_id": hedge_id}
+        if HEDGE_QUEUE:
+            options["queue"] = HEDGE_QUEUE
+        copies.append(by_id[task_id].clone(**options))
+    return group(copies).apply_async().results
+
+
+def collect_results(
+    results: list[AsyncResult],
+    t_start: float,
+    callback: Callable[[str, Any], None],
+    mode: str | None = None,
+    backend: Any = None,
+    until: float | None = None,
+    linked: dict[str, str] | None = None,
+) -> list[str]:
+    """Wait for task results until all have arrived or the deadline passes.
+
+    Args:
+        results (list[AsyncResult]): The results to wait for.
+        t_start (float): Start time of the request; the deadline is relative to it.
+        callback (Callable[[str, Any], None]): Called with the task_id and result (or
+            exception) of each task as soon as it is ready.
+        mode (str | None): One of the collection modes below; defaults to RESULT_COLLECTION.
+        backend: The Celery result backend; defaults to the app's backend.
+        until (float | None): Stop waiting at this time instead of at the deadline.
+        linked (dict[str, str] | None): Maps task_ids to the task_id of another copy of the
+            same work; once either copy is ready, the other is no longer waited for.
+
+    Returns:
+        list[str]: task_ids of the tasks that did not finish (or have a linked copy finish)
+        before the deadline.
+
+    Collection modes:
+     - "pubsub": subscribe to the channels the Redis result backend publishes each result
+       on, and block until a message arrives or the deadline passes. Wakes as soon as a
+       result lands, and costs no Redis traffic while waiting.
+     - "mget": fetch all pending result keys with a single MGET every POLL_INTERVAL_SECONDS.
+     - "poll": check each pending AsyncResult every POLL_INTERVAL_SECONDS (one GET each).
+    The first two need the Redis result backend; with any other backend, "poll" is used.
+    """
+    mode = mode or RESULT_COLLECTION
+    backend = backend or celery_app.backend
+    deadline = until or t_start + DEADLINE_SECONDS
+    pending = {result.id: result for result in results}
+    if linked:
+        callback = _unlinking_callback(callback, pending, linked)
+    if mode != "poll" and not isinstance(backend, RedisBackend):
+        logger.warning(f"Result collection mode {mode} needs a Redis backend, polling instead")
+        mode = "poll"
+
+    if mode == "pubsub":
+        _collect_pubsub(pending, deadline, callback, backend)
+    elif mode == "mget":
+        while pending and time.time() < deadline:
+            _fetch_ready(pending, callback, backend)
+            if pending:
+                time.sleep(min(POLL_INTERVAL_SECONDS, max(deadline - time.time(), 0)))
+    else:
+        while pending and time.time() < deadline:
+            for result_id in list(pending.keys()):
+                if pending[result_id].ready():
+                    result = pending.pop(result_id)
+                    callback(result.id, result.result)
+            if pending:
+                time.sleep(min(POLL_INTERVAL_SECONDS, max(deadline - time.time(), 0)))
+
+    if pending:
+        logger.info("Timeout error")
+    else:
+        logger.info("Received all results")
+    return list(pending)
+
+
+def _unlinking_callback(callback: Callable, pending: dict, linked: dict[str, str]) -> Callable:
+    def unlinking_callback(task_id: str, result: Any):
+        pending.pop(linked.get(task_id), None)
+        callback(task_id, result)
+
+    return unlinking_callback
+
+
+def _handle_meta(task_id: str, meta: dict[str, Any], pending: dict, callback: Callable) -> None:
+    if meta["status"] in states.READY_STATES and pending.pop(task_id, None) is not None:
+        callback(task_id, meta["result"])
+
+
+def _fetch_ready(pending: dict[str, AsyncResult], callback: Callable, backend: Any) -> None:
+    """Fetch all pending results with one MGET, and hand over the ones that are ready"""
+    task_ids = list(pending)
+    values = backend.client.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    for task_id, value in zip(task_ids, values):
+        if value is not None:
+            _handle_meta(task_id, backend.decode_result(value), pending, callback)
+
+
+def _collect_pubsub(
+    pending: dict[str, AsyncResult], deadline: float, callback: Callable, backend: Any
+) -> None:
+    channels = {backend.get_key_for_task(task_id).decode(): task_id for task_id in pending}
+    pubsub = backend.client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(*channels)
+        # results stored before we subscribed were published to nobody, so fetch them once
+        _fetch_ready(pending, callback, backend)
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            message = pubsub.get_message(timeout=remaining)
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            task_id = channels.get(channel.decode() if isinstance(channel, bytes) else channel)
+            if task_id is not None:
+                _handle_meta(task_id, backend.decode_result(message["data"]), pending, callback)
+    finally:
+        pubsub.close()
+
+
+_worker_count = 1  # until the workers first answer
+_worker_count_thread: threading.Thread | None = None
+_worker_count_lock = threading.Lock()
+
+
+def _refresh_worker_count():
+    global _worker_count
+    while True:
+        try:
+            stats = celery_app.control.inspect(timeout=1).stats() or {}
+            count = sum(worker["pool"].get("max-concurrency", 1) for worker in stats.values())
+            _worker_count = max(count, 1)
+        except Exception as e:
+            logger.error(f"Error counting scorer worker processes: {e}")
+        time.sleep(WORKER_COUNT_REFRESH_SECONDS)
+
+
+def worker_count() -> int:
+    """Number of scorer worker processes available.
+
+    Set SCORER_WORKER_COUNT to skip asking Celery. Otherwise the pool sizes reported by the
+    workers are summed by a background thread, started on the first call, every
+    WORKER_COUNT_REFRESH_SECONDS; 1 is assumed until they first answer. Asking the workers
+    is a broadcast that waits for replies, so it never happens on the request path.
+    """
+    global _worker_count_thread
+    if os.getenv("SCORER_WORKER_COUNT"):
+        return int(os.environ["SCORER_WORKER_COUNT"])
+    with _worker_count_lock:
+        if _worker_count_thread is None:
+            _worker_count_thread = threading.Thread(
+                target=_refresh_worker_count, name="worker-count", daemon=True
+            )
+            _worker_count_thread.start()
+    return _worker_count
+
+
+def choose_chunk_size(n_items: int, n_workers: int) -> int:
+    """Pick a batch size that spreads `n_items` over the workers.
+
+    Small feeds are split one item per task, as long as there are enough workers. Larger
+    feeds are cut into about CHUNKS_PER_WORKER chunks per worker, so that one slow chunk
+    doesn't hold up the whole request, and chunks never exceed MAX_CHUNK_SIZE items.
+    """
+    chunk_size = math.ceil(n_items / (n_workers * CHUNKS_PER_WORKER))
+    return max(1, min(chunk_size, MAX_CHUNK_SIZE))
+
+
+@traced("compute_scores_batched")
+def compute_scores_batched(
+    input: list[ScoringInput], chunk_size: int | None = None, queue: str | None = None
+) -> list[ScoringOutput]:
+    """Task dispatcher/manager that sends several items per task.
+
+    Args:
+        input (list[ScoringInput]): The list of scoring tasks to run.
+        chunk_size (int | None): Items per task. If None, it is chosen from the number of
+            items and workers (see `choose_chunk_size`).
+        queue (str | None): The queue to send the tasks to; defaults to the interactive queue.
+
+    Returns:
+        list[ScoringOutput]: The list of scoring results, one per input item.
+
+    This works like `compute_scores`, but uses the `batch_runner` of each ScorerType, so a
+    large feed costs a handful of broker messages and result keys instead of one per item.
+    Results are still reported per item: an item that failed inside a batch gets its own
+    error, and every item of a batch that missed the deadline is marked as timed out.
+    """
+
+    t_start = time.time()
+    by_type: dict[ScorerType, list[dict[str, Any]]] = {}
+    for item in input:
+        by_type.setdefault(item.scorer_type, []).append(item.data)
+
+    tasks = []
+    task_params: dict[str, list[TaskParams]] = {}
+    for scorer_type, items in by_type.items():
+        size = chunk_size or choose_chunk_size(len(items), worker_count())
+        for i in range(0, len(items), size):
+            chunk = items[i : i + size]
+            task_id = uuid()
+            task_params[task_id] = [TaskParams(scorer_type, x["item_id"]) for x in chunk]
+            tasks.append(
+                celery_app.signature(
+                    scorer_type.batch_runner,
+                    args=(chunk,),
+                    options=task_options(queue, t_start + DEADLINE_SECONDS, task_id=task_id),
+                )
+            )
+
+    logger.info(f"Sending the task group ({len(tasks)} batches)")
+    t_sent = time.time() - t_start
+    async_result = group(tasks).apply_async()
+    t_enqueued = time.time() - t_start
+
+    output = []
+
+    def placeholder_output(task_id: str, params: TaskParams) -> ScoringOutput:
+        timings = Timings(task_id=task_id, sent=t_sent, enqueued=t_enqueued)
+        return ScoringOutput(
+            item_id=params.item_id, scorer_type=params.scorer_type, timings=timings
+        )
+
+    def result_callback(task_id: str, result: list[dict[str, Any]] | Exception):
+        logger.info(f"Received result for task {task_id}")
+        for i, params in enumerate(task_params[task_id]):
+            item_output = placeholder_output(task_id, params)
+            if isinstance(result, Exception):
+                item_output.error = str(result)
+            elif "error" in result[i]:
+                item_output.error = result[i]["error"]
+            else:
+                item_output.timings.from_result(result[i], t_start)
+                item_output.score = result[i]["score"]
+            output.append(item_output)
+
+    pending = collect_results(async_result.results, t_start, result_callback)
+    release_results([x for x in task_params if x not in pending], pending)
+
+    for task_id in pending:
+        for params in task_params[task_id]:
+            item_output = placeholder_output(task_id, params)
+            item_output.error = "Timed out waiting for results"
+            output.append(item_output)
+
+    publish_timings(output)
+    record_outputs(output, t_start)
+    logger.info("Sending results")
+    return output
+
+
+@traced("compute_scores_compact")
+def compute_scores_compact(
+    input: list[ScoringInput], chunk_size: int | None = None, queue: str | None = None
+) -> list[ScoringOutput]:
+    """Task dispatcher/manager that uses the compact result transport.
+
+    Args:
+        input (list[ScoringInput]): The list of scoring tasks to run.
+        chunk_size (int | None): Items per task. If None, it is chosen from the number of
+            items and workers (see `choose_chunk_size`).
+        queue (str | None): The queue to send the tasks to; defaults to the interactive queue.
+
+    Returns:
+        list[ScoringOutput]: The list of scoring results, one per input item.
+
+    This works like `compute_scores_batched`, but the tasks store no Celery results.
+    Instead, they append packed records to one Redis stream for the whole request, which
+    is read back with a blocking `XREAD` (see `compact_results`). The workers write the
+    stream to the Redis result backend; with other backends, this falls back to
+    `compute_scores_batched`.
+    """
+
+    backend = celery_app.backend
+    if not isinstance(backend, RedisBackend):
+        logger.warning("Compact results need a Redis backend, using Celery results instead")
+        return compute_scores_batched(input, chunk_size, queue)
+
+    t_start = time.time()
+    by_type: dict[ScorerType, list[dict[str, Any]]] = {}
+    for item in input:
+        by_type.setdefault(item.scorer_type, []).append(item.data)
+
+    stream = f"{RESULT_STREAM_PREFIX}{uuid()}"
+    tasks = []
+    task_ids: list[str] = []
+    task_params: list[list[TaskParams]] = []
+    for scorer_type, items in by_type.items():
+        size = chunk_size or choose_chunk_size(len(items), worker_count())
+        for i in range(0, len(items), size):
+            chunk = items[i : i + size]
+            options = task_options(
+                queue, t_start + DEADLINE_SECONDS, task_id=uuid(), ignore_result=True
+            )
+            options["headers"].update(result_stream=stream, result_index=len(tasks))
+            task_ids.append(options["task_id"])
+            task_params.append([TaskParams(scorer_type, x["item_id"]) for x in chunk])
+            tasks.append(
+                celery_app.signature(scorer_type.batch_runner, args=(chunk,), options=options)
+            )
+
+    logger.info(f"Sending the task group ({len(tasks)} batches)")
+    t_sent = time.time() - t_start
+    group(tasks).apply_async()
+    t_enqueued = time.time() - t_start
+
+    results = read_records(backend.client, stream, len(tasks), t_start + DEADLINE_SECONDS)
+    release_results([], [x for i, x in enumerate(task_ids) if i not in results])
+
+    output = []
+    for index, params_list in enumerate(task_params):
+        records = results.get(index)
+        for i, params in enumerate(params_list):
+            timings = Timings(task_id=task_ids[index], sent=t_sent, enqueued=t_enqueued)
+            item_output = ScoringOutput(
+                item_id=params.item_id, scorer_type=params.scorer_type, timings=timings
+            )
+            if records is None:
+                item_output.error = "Timed out waiting for results"
+            elif "error" in records[i]:
+                item_output.error = records[i]["error"]
+            else:
+                item_output.timings.from_result(records[i], t_start)
+                item_output.score = records[i]["score"]
+            output.append(item_output)
+
+    publish_timings(output, backend)
+    record_outputs(output, t_start)
     logger.info("Sending results")
     return output
 
 
+def timing_samples(output: list[ScoringOutput]) -> list[str]:
+    """JSON records of the timings in `output`, to be stored under TIMINGS_KEY.
+
+    Items that timed out are included with a null latency; items that failed otherwise are
+    left out, as their timings say nothing about the load.
+    """
+    now = time.time()
+    samples = []
+    for x in output:
+        timings = x.timings
+        if timings.success:
+            sample = {
+                "latency": timings.result_received,
+                "queue_wait": timings.started - timings.enqueued,
+                "execution": timings.completed - timings.started,
+            }
+        elif x.error == "Timed out waiting for results":
+            sample = {"latency": None, "queue_wait": None, "execution": None}
+        else:
+            continue
+        samples.append(json.dumps({"t": now, "scorer_type": x.scorer_type.name, **sample}))
+    return samples
+
+
+def publish_timings(output: list[ScoringOutput], backend: Any = None) -> None:
+    """Add the timings of a request to TIMINGS_KEY, if PUBLISH_TIMINGS is set.
+
+    Only the Redis result backend is supported; errors are logged, not raised.
+    """
+    backend = backend or celery_app.backend
+    if not PUBLISH_TIMINGS or not isinstance(backend, RedisBackend):
+        return
+    samples = timing_samples(output)
+    if not samples:
+        return
+    try:
+        pipe = backend.client.pipeline(transaction=False)
+        pipe.lpush(TIMINGS_KEY, *samples)
+        pipe.ltrim(TIMINGS_KEY, 0, TIMINGS_MAX_SAMPLES - 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Error publishing timings: {e}")
+
+
 def group_scores(scores: list[ScoringOutput]) -> dict[str, dict[ScorerType, Any]]:
     """Group the scores by item_id and scorer_type.
 
@@ -0,0 +1,203 @@
+"""Asyncio scoring example
+
+This is an `async` counterpart of `scorer_advanced.compute_scores`, for servers (like the
+FastAPI ranking server) that would otherwise tie up a thread per request while waiting for
+scores.
+
+ - tasks are sent with Celery as usual; publishing is a short blocking call, so it runs in
+   the event loop's default thread pool instead of a fresh executor per request
+ - results are collected on a shared `redis.asyncio` connection pool, by subscribing to the
+   channels that Celery's Redis result backend publishes results on
+ - the deadline is enforced with `asyncio.wait_for`; tasks that miss it are reported with an
+   error and revoked, exactly as in `scorer_advanced`
+ - the request's result keys are deleted on the same pool once it is done
+
+The result backend must be Redis.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+import redis.asyncio as aioredis
+from celery import group, states
+from celery.utils import uuid
+
+from scorer_worker import scorer_advanced
+from scorer_worker.celery_app import BACKEND, task_options
+from scorer_worker.celery_app import app as celery_app
+from scorer_worker.scorer_advanced import (
+    DEADLINE_SECONDS,
+    TIMINGS_KEY,
+    TIMINGS_MAX_SAMPLES,
+    ScoringInput,
+    ScoringOutput,
+    TaskParams,
+    Timings,
+    timing_samples,
+)
+from scorer_worker.tracing import record_outputs, traced
+
+logger = logging.getLogger(__name__)
+
+memoized_backend_client = None
+
+
+def backend_client() -> aioredis.Redis:
+    """Shared asyncio client (and connection pool) for the Celery result backend.
+
+    Must be first called from within the event loop that will use it.
+    """
+    global memoized_backend_client
+    if memoized_backend_client is None:
+        memoized_backend_client = aioredis.Redis.from_url(BACKEND)
+    return memoized_backend_client
+
+
+async def _collect(pending: set[str], callback, client: aioredis.Redis, backend: Any) -> None:
+    """Deliver results to `callback` as they land, until `pending` is empty"""
+    channels = {backend.get_key_for_task(task_id).decode(): task_id for task_id in pending}
+
+    def handle(task_id, value):
+        meta = backend.decode_result(value)
+        if meta["status"] in states.READY_STATES and task_id in pending:
+            pending.discard(task_id)
+            callback(task_id, meta["result"])
+
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(*channels)
+        # results stored before we subscribed were published to nobody, so fetch them once
+        task_ids = list(pending)
+        values = await client.mget([backend.get_key_for_task(x) for x in task_ids])
+        for task_id, value in zip(task_ids, values):
+            if value is not None:
+                handle(task_id, value)
+        while pending:
+            message = await pubsub.get_message(timeout=None)
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            task_id = channels.get(channel.decode() if isinstance(channel, bytes) else channel)
+            if task_id is not None:
+                handle(task_id, message["data"])
+    finally:
+        await pubsub.aclose()
+
+
+async def _release(
+    client: aioredis.Redis, backend: Any, task_ids: list[str], unfinished: list[str]
+) -> None:
+    """Async counterpart of `celery_app.release_results`"""
+    try:
+        if task_ids:
+            await client.delete(*[backend.get_key_for_task(x) for x in task_ids])
+        if unfinished:
+            await asyncio.to_thread(celery_app.control.revoke, unfinished)
+    except Exception as e:
+        logger.error(f"Error releasing task results: {e}")
+
+
+async def _publish_timings(client: aioredis.Redis, output: list[ScoringOutput]) -> None:
+    """Async counterpart of `scorer_advanced.publish_timings`"""
+    if not scorer_advanced.PUBLISH_TIMINGS:
+        return
+    samples = timing_samples(output)
+    if not samples:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.lpush(TIMINGS_KEY, *samples)
+        pipe.ltrim(TIMINGS_KEY, 0, TIMINGS_MAX_SAMPLES - 1)
+        await pipe.execute()
+    except aioredis.RedisError as e:
+        logger.error(f"Error publishing timings: {e}")
+
+
+@traced("compute_scores_async")
+async def compute_scores_async(
+    input: list[ScoringInput],
+    client: aioredis.Redis | None = None,
+    deadline_seconds: float = DEADLINE_SECONDS,
+    backend: Any = None,
+    queue: str | None = None,
+) -> list[ScoringOutput]:
+    """Task dispatcher/manager, for use with `await`.
+
+    Args:
+        input (list[ScoringInput]): The list of scoring tasks to run.
+        client (aioredis.Redis | None): Client for the result backend; defaults to the
+            shared `backend_client()`.
+        deadline_seconds (float): Maximum duration before we return a partial result set.
+        backend: The Celery result backend; defaults to the app's.
+        queue (str | None): The queue to send the tasks to (see `celery_app`); defaults to
+            the interactive queue.
+
+    Returns:
+        list[ScoringOutput]: The list of scoring results, including placeholders with an
+        error for tasks that failed or missed the deadline.
+    """
+
+    t_start = time.time()
+    client = client or backend_client()
+    backend = backend or celery_app.backend
+    tasks = []
+    task_params: dict[str, TaskParams] = {}
+    for item in input:
+        task_id = uuid()
+        task_params[task_id] = TaskParams(
+            scorer_type=item.scorer_type, item_id=item.data["item_id"]
+        )
+        tasks.append(
+            celery_app.signature(
+                item.scorer_type.runner,
+                kwargs=item.data,
+                options=task_options(queue, t_start + deadline_seconds, task_id=task_id),
+            )
+        )
+
+    logger.info("Sending the task group")
+    t_sent = time.time() - t_start
+    await asyncio.to_thread(group(tasks).apply_async)
+    t_enqueued = time.time() - t_start
+
+    output = []
+
+    def placeholder_output(task_id: str) -> ScoringOutput:
+        timings = Timings(task_id=task_id, sent=t_sent, enqueued=t_enqueued)
+        return ScoringOutput(
+            item_id=task_params[task_id].item_id,
+            scorer_type=task_params[task_id].scorer_type,
+            timings=timings,
+        )
+
+    def result_callback(task_id: str, result: dict[str, Any] | Exception):
+        item_output = placeholder_output(task_id)
+        if isinstance(result, Exception):
+            logger.error(f"Task {task_id} raised an exception: {result}")
+            item_output.error = str(result)
+        else:
+            item_output.timings.from_result(result, t_start)
+            item_output.score = result["score"]
+        output.append(item_output)
+
+    pending = set(task_params)
+    remaining = deadline_seconds - (time.time() - t_start)
+    try:
+        await asyncio.wait_for(
+            _collect(pending, result_callback, client, backend), max(remaining, 0)
+        )
+        logger.info("Received all results")
+    except TimeoutError:
+        logger.info("Timeout error")
+    await _release(client, backend, list(task_params), list(pending))
+
+    for task_id in pending:
+        item_output = placeholder_output(task_id)
+        item_output.error = "Timed out waiting for results"
+        output.append(item_output)
+
+    await _publish_timings(client, output)
+    record_outputs(output, t_start)
+    return output
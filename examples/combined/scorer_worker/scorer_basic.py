@@ -24,6 +24,7 @@ from celery.exceptions import TimeoutError
 from celery.utils import uuid
 
 from scorer_worker.celery_app import app as celery_app
+from scorer_worker.celery_app import release_results
 
 logging.basicConfig(
     level=logging.INFO,
@@ -56,15 +57,69 @@ def compute_scores(task_name: str, input: list[dict[str, Any]]) -> list[dict[str
     logger.info("Sending the task group")
     async_result = group(tasks).apply_async()
     finished_tasks = []
+    finished = False
     start = time.time()
     try:
         # if the tasks are very quick, you can try reducing the interval parameter
         # to get higher polling frequency
         finished_tasks = async_result.get(timeout=DEADLINE_SECONDS, interval=0.1)
+        finished = True
     except TimeoutError:
         logger.error(f"Timed out waiting for results after {time.time() - start} seconds")
     except Exception as e:
         logger.error(f"Task runner threw an error: {e}")
+    # the results are not needed anymore; after a failure, revoke whatever is still running
+    task_ids = [x.id for x in async_result.results]
+    if finished:
+        release_results(task_ids)
+    else:
+        release_results([], unfinished=task_ids)
+
+    logger.info(f"Finished tasks: {len(finished_tasks)}")
+    return finished_tasks
+
+
+def compute_scores_batched(
+    task_name: str, input: list[dict[str, Any]], chunk_size: int
+) -> list[dict[str, Any]]:
+    """Task dispatcher/manager for batch tasks.
+
+    Args:
+        task_name (str): A batch task from `tasks.py`, e.g. `sentiment_batch_scorer`.
+        input (list[dict[str, Any]]): List of input dictionaries, one per item.
+        chunk_size (int): Number of items sent in each task.
+
+    Returns:
+        list[dict[str, Any]]: List of output dictionaries, one per item. Items that failed
+                              inside a batch are reported with an `error` key instead of a score.
+
+    See `scorer_advanced.compute_scores_batched` for adaptive chunk sizes and partial results.
+    """
+
+    tasks = []
+    for i in range(0, len(input), chunk_size):
+        chunk = input[i : i + chunk_size]
+        tasks.append(celery_app.signature(task_name, args=(chunk,), options={"task_id": uuid()}))
+
+    logger.info(f"Sending the task group ({len(tasks)} batches)")
+    async_result = group(tasks).apply_async()
+    finished_tasks = []
+    finished = False
+    start = time.time()
+    try:
+        finished_batches = async_result.get(timeout=DEADLINE_SECONDS, interval=0.1)
+        finished_tasks = [result for batch in finished_batches for result in batch]
+        finished = True
+    except TimeoutError:
+        logger.error(f"Timed out waiting for results after {time.time() - start} seconds")
+    except Exception as e:
+        logger.error(f"Task runner threw an error: {e}")
+    # the results are not needed anymore; after a failure, revoke whatever is still running
+    task_ids = [x.id for x in async_result.results]
+    if finished:
+        release_results(task_ids)
+    else:
+        release_results([], unfinished=task_ids)
 
     logger.info(f"Finished tasks: {len(finished_tasks)}")
     return finished_tasks
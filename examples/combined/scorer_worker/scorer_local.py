@@ -0,0 +1,199 @@
+"""Local scoring example
+
+Sending scoring work through Celery costs a broker round trip, a worker hand-off and a
+result round trip for every request. When the scorers are quick and the ranking server's
+host has a few cores to spare, that overhead can be larger than the scoring itself.
+
+`LocalScorer` runs the same scoring tasks in a `ProcessPoolExecutor` owned by the server:
+ - worker processes are started, and load their models, before the first request
+   (`start`); processes use the "spawn" start method, so they don't inherit the server's
+   threads, sockets or event loop
+ - a request's items are split into chunks (see `scorer_advanced.choose_chunk_size`), and
+   each chunk is scored by the task's batch runner, called directly in a worker process
+ - `compute_scores` and `compute_scores_async` take and return the same types as
+   `scorer_advanced.compute_scores` and `scorer_async.compute_scores_async`, so a server can
+   switch between local and Celery scoring with configuration only
+
+Chunks that miss the deadline are reported with an error, as in `scorer_advanced`. A chunk
+that is already running can't be interrupted, and finishes in the background.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any
+
+from scorer_worker.scorer_advanced import (
+    DEADLINE_SECONDS,
+    ScorerType,
+    ScoringInput,
+    ScoringOutput,
+    TaskParams,
+    Timings,
+    choose_chunk_size,
+)
+from scorer_worker.tracing import record_outputs, traced
+
+logger = logging.getLogger(__name__)
+
+
+def _init_process():
+    """Runs in each worker process when it starts: load the models"""
+    from scorer_worker import tasks
+
+    tasks.warm_models()
+
+
+def _model_stats() -> dict[str, float]:
+    from scorer_worker import tasks
+
+    return tasks.model_load_seconds
+
+
+def _run_batch(task_name: str, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Runs in a worker process: call a batch task's function directly, without Celery"""
+    from scorer_worker import tasks
+
+    return tasks.app.tasks[task_name](items)
+
+
+class LocalScorer:
+    """A pool of pre-warmed scoring processes.
+
+    Args:
+        processes (int | None): Number of worker processes; defaults to the number of CPUs.
+    """
+
+    def __init__(self, processes: int | None = None):
+        self.processes = processes or os.cpu_count() or 1
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+
+    def start(self) -> dict[str, float]:
+        """Start the worker processes and wait until they have loaded their models.
+
+        Returns:
+            dict[str, float]: Model load times of one of the processes, in seconds.
+        """
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+        )
+        # processes are started on demand, so ask all of them for something at once
+        futures = [self._executor.submit(_model_stats) for _ in range(self.processes)]
+        stats = [future.result() for future in futures]
+        logger.info(f"Started {self.processes} scoring processes, models loaded: {stats[0]}")
+        return stats[0]
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _submit(self, input: list[ScoringInput]) -> tuple[dict, dict]:
+        """Send a request's items to the pool, in chunks.
+
+        Returns the futures, keyed by a chunk id, and the TaskParams of each chunk's items.
+        """
+        if self._executor is None:
+            raise RuntimeError("The local scorer is not started")
+        by_type: dict[ScorerType, list[dict[str, Any]]] = {}
+        for item in input:
+            by_type.setdefault(item.scorer_type, []).append(item.data)
+
+        futures = {}
+        chunk_params: dict[str, list[TaskParams]] = {}
+        for scorer_type, items in by_type.items():
+            size = choose_chunk_size(len(items), self.processes)
+            for i in range(0, len(items), size):
+                chunk = items[i : i + size]
+                chunk_id = f"local-{scorer_type.name.lower()}-{i}"
+                chunk_params[chunk_id] = [TaskParams(scorer_type, x["item_id"]) for x in chunk]
+                futures[chunk_id] = self._executor.submit(
+                    _run_batch, scorer_type.batch_runner, chunk
+                )
+        return futures, chunk_params
+
+    @traced("compute_scores_local")
+    def compute_scores(
+        self, input: list[ScoringInput], deadline_seconds: float = DEADLINE_SECONDS
+    ) -> list[ScoringOutput]:
+        """Local counterpart of `scorer_advanced.compute_scores`.
+
+        Args:
+            input (list[ScoringInput]): The list of scoring tasks to run.
+            deadline_seconds (float): Maximum duration before we return a partial result set.
+
+        Returns:
+            list[ScoringOutput]: The list of scoring results, including placeholders with an
+            error for items that failed or missed the deadline.
+        """
+        t_start = time.time()
+        futures, chunk_params = self._submit(input)
+        t_sent = time.time() - t_start
+        remaining = t_start + deadline_seconds - time.time()
+        concurrent.futures.wait(futures.values(), timeout=max(remaining, 0))
+        output = self._outputs(futures, chunk_params, t_start, t_sent)
+        record_outputs(output, t_start)
+        return output
+
+    @traced("compute_scores_local")
+    async def compute_scores_async(
+        self,
+        input: list[ScoringInput],
+        deadline_seconds: float = DEADLINE_SECONDS,
+        queue: str | None = None,
+    ) -> list[ScoringOutput]:
+        """Local counterpart of `scorer_async.compute_scores_async`.
+
+        Args:
+            input (list[ScoringInput]): The list of scoring tasks to run.
+            deadline_seconds (float): Maximum duration before we return a partial result set.
+            queue (str | None): Ignored: all items are scored by the same pool. Accepted so
+                that this is a drop-in replacement.
+
+        Returns:
+            list[ScoringOutput]: As for `compute_scores`.
+        """
+        t_start = time.time()
+        futures, chunk_params = self._submit(input)
+        t_sent = time.time() - t_start
+        remaining = t_start + deadline_seconds - time.time()
+        if futures:
+            await asyncio.wait(
+                [asyncio.wrap_future(x) for x in futures.values()], timeout=max(remaining, 0)
+            )
+        output = self._outputs(futures, chunk_params, t_start, t_sent)
+        record_outputs(output, t_start)
+        return output
+
+    def _outputs(
+        self,
+        futures: dict,
+        chunk_params: dict[str, list[TaskParams]],
+        t_start: float,
+        t_sent: float,
+    ) -> list[ScoringOutput]:
+        output = []
+        for chunk_id, future in futures.items():
+            if not future.done():
+                future.cancel()  # only stops chunks that have not started yet
+            for i, params in enumerate(chunk_params[chunk_id]):
+                timings = Timings(task_id=chunk_id, sent=t_sent, enqueued=t_sent)
+                item_output = ScoringOutput(
+                    item_id=params.item_id, scorer_type=params.scorer_type, timings=timings
+                )
+                if not future.done() or future.cancelled():
+                    item_output.error = "Timed out waiting for results"
+                elif future.exception() is not None:
+                    item_output.error = str(future.exception())
+                elif "error" in future.result()[i]:
+                    item_output.error = future.result()[i]["error"]
+                else:
+                    item_output.timings.from_result(future.result()[i], t_start)
+                    item_output.score = future.result()[i]["score"]
+                output.append(item_output)
+        return output
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from scorer_worker.scorer_advanced import ScorerType, ScoringInput
+from scorer_worker.scorer_local import LocalScorer
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    scorer = LocalScorer(processes=2)
+    stats = scorer.start()
+    assert "sentiment" in stats
+    yield scorer
+    scorer.stop()
+
+
+def random_input(n, **kwargs):
+    return [
+        ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x", **kwargs})
+        for i in range(n)
+    ]
+
+
+def test_compute_scores(scorer):
+    input = random_input(4) + [
+        ScoringInput(ScorerType.SENTIMENT, {"item_id": "s", "text": "What a lovely day"})
+    ]
+    input[1].data["raise_exception"] = True
+
+    results = {x.item_id: x for x in scorer.compute_scores(input)}
+
+    assert sorted(results) == ["0", "1", "2", "3", "s"]
+    assert results["1"].error == "Random exception"
+    assert all(results[x].error is None and results[x].timings.success for x in "023")
+    assert results["s"].scorer_type == ScorerType.SENTIMENT and results["s"].score > 0.5
+
+
+def test_compute_scores_async_deadline(scorer):
+    t_start = time.time()
+    results = asyncio.run(
+        scorer.compute_scores_async(random_input(1, sleep=1), deadline_seconds=0.2)
+    )
+    elapsed = time.time() - t_start
+
+    assert results[0].error == "Timed out waiting for results"
+    assert 0.2 <= elapsed < 0.5
+
+
+def test_not_started():
+    with pytest.raises(RuntimeError):
+        LocalScorer(processes=1).compute_scores(random_input(1))
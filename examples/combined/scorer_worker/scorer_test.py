@@ -1,11 +1,29 @@
 # This is an integration test to illustrate the functionality of the scoring example.
+import asyncio
+import threading
+import time
 from itertools import cycle
+from types import SimpleNamespace
 
+import fakeredis
 import pytest
+from celery.backends.redis import RedisBackend
+from celery.result import AsyncResult
 
-from scorer_worker.scorer_advanced import ScorerType, ScoringInput, compute_scores
+from scorer_worker import scorer_advanced, scorer_async, tasks
+from scorer_worker.celery_app import PREFETCH_QUEUE, expired_drop_counts, task_options
+from scorer_worker.compact_results import read_records
+from scorer_worker.scorer_advanced import (
+    ScorerType,
+    ScoringInput,
+    choose_chunk_size,
+    compute_scores,
+    compute_scores_batched,
+    compute_scores_compact,
+)
 from scorer_worker.scorer_basic import compute_scores as compute_scores_basic
-from scorer_worker.tasks import TIME_LIMIT_SECONDS, RandomScoreInput
+from scorer_worker.scorer_basic import compute_scores_batched as compute_scores_basic_batched
+from scorer_worker.tasks import TIME_LIMIT_SECONDS, RandomScoreInput, SentimentScoreInput
 
 sample_posts = [
     "That's horrible",
@@ -76,3 +94,275 @@ def test_scoring_jobs_basic(my_celery_app, celery_worker, sample_data):
     # the task name is the following
     scores = compute_scores_basic("scorer_worker.tasks.random_scorer", data)
     assert len(scores) == len(data)
+
+
+def test_scoring_jobs_basic_batched(my_celery_app, celery_worker, sample_data):
+    scores = compute_scores_basic_batched("scorer_worker.tasks.random_batch_scorer", sample_data, 3)
+    assert [x["item_id"] for x in scores] == [x["item_id"] for x in sample_data]
+
+
+def test_scoring_jobs_batched(my_celery_app, celery_worker, sample_data_with_exception):
+    data = [ScoringInput(ScorerType.RANDOM, x) for x in sample_data_with_exception]
+    scores = compute_scores_batched(data, chunk_size=3)
+    assert len(scores) == len(data)
+    errors = {x.item_id: x.error for x in scores}
+    assert errors["0"] is not None
+    assert all(errors[x["item_id"]] is None for x in sample_data_with_exception[1:])
+
+
+@pytest.mark.parametrize("mode", ["pubsub", "mget", "poll"])
+def test_collect_results(my_celery_app, fake_backend, mode):
+    task_ids = [f"{mode}-{i}" for i in range(4)]
+    results = [AsyncResult(x, backend=fake_backend, app=my_celery_app) for x in task_ids]
+    fake_backend.store_result(task_ids[0], {"score": 0.1}, "SUCCESS")
+
+    def store_later():
+        time.sleep(0.1)
+        fake_backend.store_result(task_ids[1], {"score": 0.2}, "SUCCESS")
+        fake_backend.store_result(task_ids[2], ValueError("boom"), "FAILURE")
+
+    threading.Thread(target=store_later).start()
+    received = {}
+    t_start = time.time()
+    pending = scorer_advanced.collect_results(
+        results, t_start, received.__setitem__, mode=mode, backend=fake_backend
+    )
+    elapsed = time.time() - t_start
+
+    assert pending == [task_ids[3]]
+    assert received[task_ids[0]] == {"score": 0.1}
+    assert received[task_ids[1]] == {"score": 0.2}
+    assert isinstance(received[task_ids[2]], ValueError)
+    assert scorer_advanced.DEADLINE_SECONDS <= elapsed < scorer_advanced.DEADLINE_SECONDS + 0.1
+
+
+def test_compute_scores_async(my_celery_app, monkeypatch):
+    server = fakeredis.FakeServer()
+    backend = RedisBackend(app=my_celery_app, url="redis://localhost:6380/0")
+    backend.__dict__["client"] = fakeredis.FakeRedis(server=server)
+
+    class FakeGroup:
+        def __init__(self, tasks):
+            self.task_ids = [x.options["task_id"] for x in tasks]
+
+        def apply_async(self):
+            # the first task is done before collection starts, the rest land later or never
+            backend.store_result(self.task_ids[0], {"score": 0.1}, "SUCCESS")
+
+            def store_later():
+                time.sleep(0.1)
+                backend.store_result(self.task_ids[1], {"score": 0.2}, "SUCCESS")
+                backend.store_result(self.task_ids[2], ValueError("boom"), "FAILURE")
+
+            threading.Thread(target=store_later).start()
+
+    revoked = []
+    monkeypatch.setattr(scorer_async, "group", FakeGroup)
+    monkeypatch.setattr(scorer_async.celery_app.control, "revoke", revoked.extend)
+    input = [ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x"}) for i in range(4)]
+
+    async def run():
+        client = fakeredis.FakeAsyncRedis(server=server)
+        return await scorer_async.compute_scores_async(input, client=client, backend=backend)
+
+    t_start = time.time()
+    results = {x.item_id: x for x in asyncio.run(run())}
+    elapsed = time.time() - t_start
+
+    assert results["0"].score == 0.1 and results["0"].timings.success
+    assert results["1"].score == 0.2
+    assert results["2"].error == "boom"
+    assert results["3"].error == "Timed out waiting for results"
+    assert scorer_advanced.DEADLINE_SECONDS <= elapsed < scorer_advanced.DEADLINE_SECONDS + 0.2
+    assert revoked == [results["3"].timings.task_id]
+    assert backend.client.keys() == []
+
+
+@pytest.mark.usefixtures("app_backend")
+def test_compute_scores_hedged(my_celery_app, fake_backend, monkeypatch):
+    sent = []
+
+    class FakeGroup:
+        def __init__(self, tasks):
+            self.tasks = tasks
+
+        def apply_async(self):
+            hedging = bool(sent)
+            sent.append(self.tasks)
+            for task in self.tasks:
+                task_id, item_id = task.options["task_id"], task.kwargs["item_id"]
+                # item 0 is quick, item 1 is stuck on a slow worker until hedged, item 2 is
+                # stuck everywhere
+                if (item_id, hedging) in [("0", False), ("1", True)]:
+                    fake_backend.store_result(task_id, {"score": float(item_id)}, "SUCCESS")
+            return SimpleNamespace(
+                results=[
+                    AsyncResult(x.options["task_id"], backend=fake_backend, app=my_celery_app)
+                    for x in self.tasks
+                ]
+            )
+
+    revoked = []
+    monkeypatch.setattr(scorer_advanced, "group", FakeGroup)
+    monkeypatch.setattr(scorer_advanced, "RESULT_COLLECTION", "poll")
+    monkeypatch.setattr(scorer_advanced.celery_app.control, "revoke", revoked.extend)
+    input = [ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x"}) for i in range(3)]
+
+    results = {x.item_id: x for x in compute_scores(input, hedge_after=0.3)}
+
+    assert len(results) == 3
+    assert [x.kwargs["item_id"] for x in sent[1]] == ["1", "2"]
+    assert results["0"].score == 0.0
+    assert results["0"].timings.winner == "original" and results["0"].timings.hedge_sent == 0
+    assert results["1"].score == 1.0
+    assert results["1"].timings.winner == "hedge" and results["1"].timings.hedge_sent >= 0.3
+    assert results["1"].timings.task_id == sent[1][0].options["task_id"]
+    assert results["2"].error == "Timed out waiting for results"
+    # the original of item 1 is still queued somewhere, and both copies of item 2 timed out
+    item_2 = {sent[0][2].options["task_id"], sent[1][1].options["task_id"]}
+    assert revoked[0] == sent[0][1].options["task_id"]
+    assert set(revoked[1:]) == item_2
+    assert fake_backend.client.keys() == []
+
+
+def test_task_options(my_celery_app):
+    options = task_options(PREFETCH_QUEUE, deadline=1_700_000_000.5, task_id="x")
+    assert options["queue"] == PREFETCH_QUEUE
+    assert options["headers"] == {"deadline": 1_700_000_000.5}
+    assert options["task_id"] == "x"
+    assert task_options()["queue"] == my_celery_app.conf.task_default_queue
+    assert "headers" not in task_options()
+
+
+def test_expired_tasks_are_skipped(my_celery_app, fake_backend, monkeypatch):
+    monkeypatch.setattr(tasks, "app", SimpleNamespace(backend=fake_backend))
+    monkeypatch.setattr(tasks, "expired_drops", {})
+    kwargs = {"item_id": "1", "text": "x"}
+
+    late = tasks.random_scorer.apply(kwargs=kwargs, **task_options(deadline=time.time() - 1))
+    on_time = tasks.random_scorer.apply(kwargs=kwargs, **task_options(deadline=time.time() + 5))
+
+    assert late.state == "IGNORED"
+    assert on_time.state == "SUCCESS"
+    assert tasks.expired_drops == {tasks.random_scorer.name: 1}
+    assert expired_drop_counts(fake_backend) == {tasks.random_scorer.name: 1}
+
+
+@pytest.mark.usefixtures("app_backend")
+def test_compute_scores_compact(my_celery_app, fake_backend, monkeypatch):
+    class FakeGroup:
+        def __init__(self, tasks):
+            self.tasks = tasks
+
+        def apply_async(self):
+            # the last batch never runs
+            for task in self.tasks[:-1]:
+                tasks.random_batch_scorer.apply(args=task.args, **task.options)
+
+    revoked = []
+    monkeypatch.setattr(tasks, "app", SimpleNamespace(backend=fake_backend))
+    monkeypatch.setattr(scorer_advanced, "group", FakeGroup)
+    monkeypatch.setattr(scorer_advanced.celery_app.control, "revoke", revoked.extend)
+    input = [ScoringInput(ScorerType.RANDOM, {"item_id": str(i), "text": "x"}) for i in range(5)]
+    input[1].data["raise_exception"] = True
+
+    results = {x.item_id: x for x in compute_scores_compact(input, chunk_size=2)}
+
+    assert sorted(results) == ["0", "1", "2", "3", "4"]
+    assert all(0 <= results[x].score <= 1 and results[x].error is None for x in "023")
+    assert results["0"].timings.success and results["0"].timings.completed > 0
+    assert results["1"].error is not None
+    assert results["4"].error == "Timed out waiting for results"
+    assert results["0"].timings.task_id == results["1"].timings.task_id
+    assert revoked == [results["4"].timings.task_id]
+    # no Celery results and no leftover stream
+    assert fake_backend.client.keys() == []
+
+
+@pytest.mark.usefixtures("app_backend")
+def test_compact_task_failure_reports_every_item(fake_backend, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("worker broke")
+
+    monkeypatch.setattr(tasks, "app", SimpleNamespace(backend=fake_backend))
+    monkeypatch.setattr(tasks, "score_batch", fail)
+    options = task_options(deadline=time.time() + 5, ignore_result=True)
+    options["headers"].update(result_stream="test-stream", result_index=0)
+    items = [{"item_id": str(i), "text": "x"} for i in range(3)]
+
+    tasks.random_batch_scorer.apply(args=(items,), **options)
+
+    records = read_records(fake_backend.client, "test-stream", 1, time.time() + 1)
+    assert records == {0: [{"error": "worker broke"}] * 3}
+
+
+def test_worker_count_is_read_in_the_background(monkeypatch):
+    class SlowInspect:
+        def stats(self):
+            time.sleep(0.2)
+            return {"w1": {"pool": {"max-concurrency": 3}}, "w2": {"pool": {}}}
+
+    monkeypatch.delenv("SCORER_WORKER_COUNT", raising=False)
+    monkeypatch.setattr(scorer_advanced, "_worker_count", 1)
+    monkeypatch.setattr(scorer_advanced, "_worker_count_thread", None)
+    monkeypatch.setattr(
+        scorer_advanced.celery_app.control, "inspect", lambda timeout: SlowInspect()
+    )
+
+    t_start = time.time()
+    assert scorer_advanced.worker_count() == 1
+    assert time.time() - t_start < 0.1
+    while scorer_advanced.worker_count() == 1 and time.time() - t_start < 2:
+        time.sleep(0.01)
+    assert scorer_advanced.worker_count() == 4
+
+
+def test_choose_chunk_size():
+    assert choose_chunk_size(10, 8) == 1
+    assert choose_chunk_size(200, 4) == 25
+    assert choose_chunk_size(10_000, 2) == 50
+    assert choose_chunk_size(0, 4) == 1
+
+
+def test_score_batch_keeps_per_item_errors(sample_data_with_exception):
+    results = tasks.score_batch(
+        sample_data_with_exception, RandomScoreInput, tasks.do_random_scoring
+    )
+    assert [x["item_id"] for x in results] == [x["item_id"] for x in sample_data_with_exception]
+    assert "error" in results[0]
+    assert all("score" in x for x in results[1:])
+
+
+def test_sentiment_batch_matches_per_item_scores():
+    items = [{"item_id": str(i), "text": text} for i, text in enumerate(sample_posts)]
+    items.append({"item_id": "bad"})
+
+    results = tasks.score_sentiment_batch(items)
+
+    assert [x["item_id"] for x in results] == [x["item_id"] for x in items]
+    for item, result in zip(items, results[:-1]):
+        expected = tasks.do_sentiment_scoring(SentimentScoreInput(**item)).score
+        assert result["score"] == pytest.approx(expected, abs=1e-4)
+        assert result["t_start"] <= result["t_end"]
+    assert "error" in results[-1]
+
+
+def test_sentiment_model_loaded_once(monkeypatch):
+    loads = []
+
+    class FakeAnalyzer:
+        def __init__(self):
+            loads.append(self)
+
+        def polarity_scores(self, text):
+            return {"compound": 0.5}
+
+    monkeypatch.setitem(tasks.MODEL_LOADERS, "sentiment", FakeAnalyzer)
+    monkeypatch.delitem(tasks.MODEL_LOADERS, "sentiment_batch")
+    monkeypatch.setattr(tasks, "_models", {})
+    tasks.warm_models()
+    for text in sample_posts:
+        assert tasks.do_sentiment_scoring(SentimentScoreInput(item_id="1", text=text)).score == 0.5
+
+    assert len(loads) == 1
+    assert "sentiment" in tasks.model_load_seconds
@@ -6,11 +6,16 @@ PRC dev team; use and modify it freely if you find it helpful.
 """
 
 import time
+import timeit
 from itertools import count
+from unittest.mock import patch
 
 import requests
 
+from scorer_worker import tasks
+
 URL = "http://localhost:8002/score"
+MODEL_STATS_URL = "http://localhost:8002/model_stats"
 
 
 def datagen(n, task_latency_sec):
@@ -37,5 +42,23 @@ def do_request():
     print(network_time, max_time)
 
 
+def sentiment_task_latency(n=20):
+    """Mean time to score one item with `tasks.do_sentiment_scoring`, in this process"""
+    input = tasks.SentimentScoreInput(item_id="0", text="asdf")
+    return timeit.timeit(lambda: tasks.do_sentiment_scoring(input), number=n) / n
+
+
+def compare_model_reuse():
+    print(f"Model load time at worker startup: {requests.get(MODEL_STATS_URL).json()}")
+    tasks.warm_models()
+    shared = sentiment_task_latency()
+    # what every task would pay without the per-process model
+    with patch.object(tasks, "get_model", lambda name: tasks.MODEL_LOADERS[name]()):
+        fresh = sentiment_task_latency()
+    print(f"Mean sentiment task latency, shared model: {shared * 1000:.2f}ms")
+    print(f"Mean sentiment task latency, model loaded per task: {fresh * 1000:.2f}ms")
+
+
 if __name__ == "__main__":
     do_request()
+    compare_model_reuse()
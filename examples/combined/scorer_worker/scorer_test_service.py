@@ -26,6 +26,8 @@ Add the following to docker-compose in order to use it:
 import logging
 from typing import Any
 
+from celery_app import app as celery_app
+from celery_app import expired_drop_counts
 from fastapi import FastAPI
 from pydantic import BaseModel, Field
 from scorer_advanced import ScorerType, ScoringInput, compute_scores
@@ -94,6 +96,18 @@ def score_basic(input: ScoringRequest) -> ScoringResponse:
     return ScoringResponse(data=scores)
 
 
+@app.get("/model_stats")
+def model_stats() -> dict[str, float]:
+    """Model load times (seconds) of whichever worker process picks up the task"""
+    return celery_app.send_task("scorer_worker.tasks.model_stats").get(timeout=DEADLINE_SECONDS)
+
+
+@app.get("/deadline_stats")
+def deadline_stats() -> dict[str, int]:
+    """Tasks that workers skipped because their deadline had passed, by task name"""
+    return expired_drop_counts()
+
+
 @app.get("/")
 def health_check():
     return {"status": "ok"}
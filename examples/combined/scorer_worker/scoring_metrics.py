@@ -0,0 +1,88 @@
+"""Prometheus histograms of scoring task timings
+
+Every `ScoringOutput` carries the `Timings` of its task, measured from the start of the
+request. `ScoringMetrics` turns them into one histogram per phase, labelled by ScorerType,
+so a dashboard shows which part of scoring is slow:
+
+ - `scoring_dispatch_seconds`: sending the tasks to the broker (`sent` to `enqueued`)
+ - `scoring_queue_wait_seconds`: waiting in the queue for a worker (`enqueued` to
+   `started`); grows when there are too few workers
+ - `scoring_execution_seconds`: running the task (`started` to `completed`)
+ - `scoring_result_fetch_seconds`: getting the result back to the dispatcher (`completed`
+   to `result_received`); grows when result collection polls too slowly
+ - `scoring_latency_seconds`: the whole round trip (to `result_received`)
+
+Items that got no result are only counted, in `scoring_items_total{outcome}`. Items scored
+by the same (batch) task share its timings, which are observed once. `started` and
+`completed` come from the worker's clock, so a skewed clock can shift time between phases;
+negative durations are recorded as 0.
+
+Example, with the registry passed to `expose_metrics`:
+
+    scoring_metrics = ScoringMetrics(registry)
+    output = await compute_scores_async(input)
+    scoring_metrics.observe(output)
+"""
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from scorer_worker.scorer_advanced import ScoringOutput
+
+# Scoring happens within a deadline of about a second; phases range from sub-millisecond
+# (dispatch) to most of the deadline (queue wait under load)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+TIMEOUT_ERROR = "Timed out waiting for results"
+
+
+class ScoringMetrics:
+    """Per-phase scoring histograms and item outcome counts, registered in `registry`."""
+
+    def __init__(self, registry: CollectorRegistry):
+        def histogram(name: str, description: str) -> Histogram:
+            return Histogram(
+                name, description, ["scorer_type"], buckets=LATENCY_BUCKETS, registry=registry
+            )
+
+        self.dispatch = histogram("scoring_dispatch_seconds", "Time to send scoring tasks")
+        self.queue_wait = histogram(
+            "scoring_queue_wait_seconds", "Time scoring tasks waited for a worker"
+        )
+        self.execution = histogram("scoring_execution_seconds", "Time to run scoring tasks")
+        self.result_fetch = histogram(
+            "scoring_result_fetch_seconds", "Time from task completion to result received"
+        )
+        self.latency = histogram(
+            "scoring_latency_seconds", "Time from the start of scoring to result received"
+        )
+        self.items = Counter(
+            "scoring_items_total",
+            "Scored items, by outcome: ok, error or timeout",
+            ["scorer_type", "outcome"],
+            registry=registry,
+        )
+
+    def observe(self, output: list[ScoringOutput]):
+        """Record the timings and outcomes of a request's scoring results"""
+        seen = set()
+        for x in output:
+            scorer_type = x.scorer_type.name
+            if x.error is None:
+                outcome = "ok"
+            else:
+                outcome = "timeout" if x.error == TIMEOUT_ERROR else "error"
+            self.items.labels(scorer_type, outcome).inc()
+
+            timings = x.timings
+            if not timings.success or timings.task_id in seen:
+                continue
+            seen.add(timings.task_id)
+            phases = [
+                (self.dispatch, timings.enqueued - timings.sent),
+                (self.queue_wait, timings.started - timings.enqueued),
+                (self.execution, timings.completed - timings.started),
+                (self.result_fetch, timings.result_received - timings.completed),
+                (self.latency, timings.result_received),
+            ]
+            for histogram, duration in phases:
+                histogram.labels(scorer_type).observe(max(duration, 0.0))
@@ -0,0 +1,39 @@
+from prometheus_client import CollectorRegistry
+
+from scorer_worker.scorer_advanced import ScorerType, ScoringOutput, Timings
+from scorer_worker.scoring_metrics import ScoringMetrics
+
+
+def finished(task_id):
+    timings = Timings(task_id, sent=0.001, enqueued=0.003, started=0.05, completed=0.2)
+    timings.result_received, timings.success = 0.25, True
+    return timings
+
+
+def test_observe():
+    registry = CollectorRegistry()
+    metrics = ScoringMetrics(registry)
+    batch = finished("batch")
+    output = [
+        ScoringOutput("1", ScorerType.SENTIMENT, batch, score=0.1),
+        ScoringOutput("2", ScorerType.SENTIMENT, batch, score=0.2),
+        ScoringOutput("3", ScorerType.RANDOM, finished("single"), score=0.3),
+        ScoringOutput(
+            "4", ScorerType.RANDOM, Timings("late"), error="Timed out waiting for results"
+        ),
+        ScoringOutput("5", ScorerType.RANDOM, Timings("failed"), error="boom"),
+    ]
+
+    metrics.observe(output)
+
+    def sample(name, scorer_type, **labels):
+        return registry.get_sample_value(name, {"scorer_type": scorer_type, **labels})
+
+    # the batch's timings are observed once, for both of its items
+    assert sample("scoring_queue_wait_seconds_count", "SENTIMENT") == 1
+    assert abs(sample("scoring_queue_wait_seconds_sum", "SENTIMENT") - 0.047) < 1e-9
+    assert abs(sample("scoring_result_fetch_seconds_sum", "RANDOM") - 0.05) < 1e-9
+    assert sample("scoring_latency_seconds_count", "RANDOM") == 1
+    assert sample("scoring_items_total", "SENTIMENT", outcome="ok") == 2
+    assert sample("scoring_items_total", "RANDOM", outcome="timeout") == 1
+    assert sample("scoring_items_total", "RANDOM", outcome="error") == 1
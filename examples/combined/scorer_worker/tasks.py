@@ -26,23 +26,41 @@ Attributes:
 Functions:
     random_scorer(**kwargs) -> dict[str, Any]: runner for random scorer
     sentiment_scorer(**kwargs) -> dict[str, Any]: runner for sentiment scorer
+    random_batch_scorer(items) -> list[dict[str, Any]]: runner for random scorer, many items
+    sentiment_batch_scorer(items) -> list[dict[str, Any]]: runner for sentiment scorer, many items;
+        scores the whole batch at once with the vectorized analyzer in `vader_batch`
+    model_stats() -> dict[str, float]: model load times of the worker process that runs it
+
+All scoring tasks use the ScoringTask base class: a task whose `deadline` header (see
+`celery_app.task_options`) has passed when a worker picks it up is skipped and counted,
+instead of spending worker time on a result that nobody will read. ScoringTask also
+implements the compact result transport (see `compact_results`).
 
 Models:
     RandomScoreInput
     RandomScoreOutput
     SentimentScoreInput
     SentimentScoreOutput
+    ScoreError
 """
 
 import logging
 import random
 import time
-from typing import Any
+from typing import Any, Callable
 
+import redis
+from celery import Task
+from celery.backends.redis import RedisBackend
+from celery.exceptions import Ignore, SoftTimeLimitExceeded
+from celery.signals import worker_process_init, worker_process_shutdown
 from nltk.sentiment import SentimentIntensityAnalyzer
 from pydantic import BaseModel, Field
 
-from scorer_worker.celery_app import app
+from scorer_worker.celery_app import EXPIRED_DROPS_KEY, app
+from scorer_worker.compact_results import write_records
+from scorer_worker.tracing import context_headers, setup_tracing, shutdown_tracing, task_span
+from scorer_worker.vader_batch import BatchSentimentAnalyzer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -56,6 +74,45 @@ KILL_DEADLINE_SECONDS = 5
 TIME_LIMIT_SECONDS = 4
 
 
+# Models are loaded once per worker process, when the process starts (see `warm_models`),
+# and shared by every task that process runs. Register a loader here for each scorer type
+# that needs a model.
+MODEL_LOADERS: dict[str, Callable[[], Any]] = {
+    "sentiment": SentimentIntensityAnalyzer,
+    "sentiment_batch": lambda: BatchSentimentAnalyzer(get_model("sentiment")),
+}
+
+_models: dict[str, Any] = {}
+model_load_seconds: dict[str, float] = {}
+
+
+def get_model(name: str) -> Any:
+    """Return this process's instance of a model, loading it on first use."""
+    model = _models.get(name)
+    if model is None:
+        start = time.time()
+        model = _models[name] = MODEL_LOADERS[name]()
+        model_load_seconds[name] = time.time() - start
+        logger.info(f"Loaded model {name} in {model_load_seconds[name]:.3f}s")
+    return model
+
+
+@worker_process_init.connect
+def warm_models(**kwargs):
+    for name in MODEL_LOADERS:
+        get_model(name)
+
+
+@worker_process_init.connect
+def start_tracing(**kwargs):
+    setup_tracing("scorer_worker")
+
+
+@worker_process_shutdown.connect
+def stop_tracing(**kwargs):
+    shutdown_tracing()
+
+
 class SentimentScoreInput(BaseModel):
     item_id: str = Field(description="The ID of the item to score")
     text: str = Field(description="The body of the post for scoring")
@@ -85,10 +142,111 @@ class RandomScoreOutput(ScoreOutput):
     pass
 
 
+class ScoreError(BaseModel):
+    item_id: str = Field(description="The ID of the item that failed to score")
+    error: str = Field(description="Description of the failure")
+
+
 class TimeoutException(Exception):
     pass
 
 
+# Tasks skipped by this worker process because their deadline had passed, by task name.
+# The totals over all workers are kept in the result backend (see `expired_drop_counts`).
+expired_drops: dict[str, int] = {}
+
+
+def task_header(request, name: str) -> Any:
+    """A custom header of a task request, or None"""
+    value = getattr(request, name, None)
+    if value is None:
+        value = (getattr(request, "headers", None) or {}).get(name)
+    return value
+
+
+def record_expired_drop(task_name: str):
+    expired_drops[task_name] = expired_drops.get(task_name, 0) + 1
+    if isinstance(app.backend, RedisBackend):
+        try:
+            app.backend.client.hincrby(EXPIRED_DROPS_KEY, task_name, 1)
+        except redis.RedisError as e:
+            logger.error(f"Error recording expired drop: {e}")
+
+
+class ScoringTask(Task):
+    """Base class for scoring tasks.
+
+    - Tasks whose `deadline` header has passed are skipped. A skipped task is ignored: no
+      result is stored, and the dispatcher (which stopped waiting at the deadline) never
+      asks for one.
+    - Tasks with a `result_stream` header send their result in compact form to that stream
+      (see `compact_results`) instead of returning it.
+    - Tasks run in a tracing span that continues the dispatcher's trace (see `tracing`).
+    """
+
+    def __call__(self, *args, **kwargs):
+        headers = {name: task_header(self.request, name) for name in context_headers()}
+        with task_span(self.name, self.request.id, headers):
+            return self._run(*args, **kwargs)
+
+    def _run(self, *args, **kwargs):
+        deadline = task_header(self.request, "deadline")
+        if deadline is not None and time.time() > deadline:
+            logger.info(f"Task {self.request.id} skipped, {time.time() - deadline:.3f}s late")
+            record_expired_drop(self.name)
+            raise Ignore()
+
+        stream = task_header(self.request, "result_stream")
+        if stream is None:
+            return super().__call__(*args, **kwargs)
+        try:
+            result = super().__call__(*args, **kwargs)
+        except Exception as e:
+            # nothing else will reach the dispatcher, which would report the items as timed
+            # out; a batch task gets its items as the first argument
+            n_items = len(args[0]) if args and isinstance(args[0], list) else 1
+            self._write_records(stream, [{"error": str(e)}] * n_items)
+            raise
+        self._write_records(stream, result if isinstance(result, list) else [result])
+        return None
+
+    def _write_records(self, stream: str, records: list[dict[str, Any]]):
+        write_records(
+            app.backend.client, stream, task_header(self.request, "result_index"), records
+        )
+
+
+def score_batch(
+    items: list[dict[str, Any]],
+    input_model: type[BaseModel],
+    scoring_fn: Callable[[Any], ScoreOutput],
+) -> list[dict[str, Any]]:
+    """Score a list of items within one task, keeping per-item results and errors.
+
+    An exception while scoring one item is recorded as a ScoreError for that item only.
+    If the task's soft time limit is reached, the items scored so far are returned and
+    the rest are marked as timed out.
+    """
+    output = []
+    for i, kwargs in enumerate(items):
+        start = time.time()
+        try:
+            result = scoring_fn(input_model(**kwargs))
+        except SoftTimeLimitExceeded:
+            for remaining in items[i:]:
+                output.append(
+                    ScoreError(item_id=remaining["item_id"], error="Task time limit exceeded")
+                )
+            break
+        except Exception as e:
+            output.append(ScoreError(item_id=kwargs["item_id"], error=str(e)))
+            continue
+        result.t_start = start
+        result.t_end = time.time()
+        output.append(result)
+    return [x.model_dump() for x in output]
+
+
 def do_random_scoring(input: RandomScoreInput) -> RandomScoreOutput:
     if input.sleep:
         time.sleep(input.sleep)
@@ -100,7 +258,12 @@ def do_random_scoring(input: RandomScoreInput) -> RandomScoreOutput:
     )
 
 
-@app.task(bind=True, time_limit=KILL_DEADLINE_SECONDS, soft_time_limit=TIME_LIMIT_SECONDS)
+@app.task(
+    bind=True,
+    base=ScoringTask,
+    time_limit=KILL_DEADLINE_SECONDS,
+    soft_time_limit=TIME_LIMIT_SECONDS,
+)
 def random_scorer(self, **kwargs) -> dict[str, Any]:
     """Output random score
 
@@ -125,16 +288,40 @@ def random_scorer(self, **kwargs) -> dict[str, Any]:
     return result.model_dump()
 
 
+@app.task(
+    bind=True,
+    base=ScoringTask,
+    time_limit=KILL_DEADLINE_SECONDS,
+    soft_time_limit=TIME_LIMIT_SECONDS,
+)
+def random_batch_scorer(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Output random scores for a batch of items
+
+    Args:
+        items (list[dict[str, Any]]): Each item should be convertible to RandomScoreInput.
+
+    Returns:
+        list[dict[str, Any]]: One record per input item, in order: a dictionary representation
+                              of RandomScoreOutput, or of ScoreError if that item failed.
+    """
+    logger.info(f"Task {self.request.id} started by {self.request.hostname} ({len(items)} items)")
+    return score_batch(items, RandomScoreInput, do_random_scoring)
+
+
 def do_sentiment_scoring(input: SentimentScoreInput) -> SentimentScoreOutput:
-    sia = SentimentIntensityAnalyzer()
-    score = sia.polarity_scores(input.text)
+    score = get_model("sentiment").polarity_scores(input.text)
     return SentimentScoreOutput(
         item_id=input.item_id,
         score=score.get("compound", 0),
     )
 
 
-@app.task(bind=True, time_limit=KILL_DEADLINE_SECONDS, soft_time_limit=TIME_LIMIT_SECONDS)
+@app.task(
+    bind=True,
+    base=ScoringTask,
+    time_limit=KILL_DEADLINE_SECONDS,
+    soft_time_limit=TIME_LIMIT_SECONDS,
+)
 def sentiment_scorer(self, **kwargs) -> dict[str, Any]:
     """Use NLTK to perform sentiment scoring
 
@@ -157,3 +344,62 @@ def sentiment_scorer(self, **kwargs) -> dict[str, Any]:
     result.t_start = start
     result.t_end = time.time()
     return result.model_dump()
+
+
+@app.task(
+    bind=True,
+    base=ScoringTask,
+    time_limit=KILL_DEADLINE_SECONDS,
+    soft_time_limit=TIME_LIMIT_SECONDS,
+)
+def sentiment_batch_scorer(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Use NLTK to perform sentiment scoring on a batch of items
+
+    Args:
+        items (list[dict[str, Any]]): Each item should be convertible to SentimentScoreInput.
+
+    Returns:
+        list[dict[str, Any]]: One record per input item, in order: a dictionary representation
+                              of SentimentScoreOutput, or of ScoreError if that item failed.
+    """
+    logger.info(f"Task {self.request.id} started by {self.request.hostname} ({len(items)} items)")
+    return score_sentiment_batch(items)
+
+
+def score_sentiment_batch(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Score a list of items with one call to the vectorized analyzer (see `vader_batch`).
+
+    The output is the same as `score_batch` with `do_sentiment_scoring`, except that all the
+    items of the batch share their start and end times.
+    """
+    start = time.time()
+    output: list[BaseModel | None] = [None] * len(items)
+    inputs = []
+    for i, kwargs in enumerate(items):
+        try:
+            inputs.append((i, SentimentScoreInput(**kwargs)))
+        except Exception as e:
+            output[i] = ScoreError(item_id=kwargs["item_id"], error=str(e))
+    try:
+        scores = get_model("sentiment_batch").compound_scores([x.text for _, x in inputs])
+    except SoftTimeLimitExceeded:
+        scores = None
+    end = time.time()
+    for n, (i, input) in enumerate(inputs):
+        if scores is None:
+            output[i] = ScoreError(item_id=input.item_id, error="Task time limit exceeded")
+        else:
+            output[i] = SentimentScoreOutput(
+                item_id=input.item_id, score=float(scores[n]), t_start=start, t_end=end
+            )
+    return [x.model_dump() for x in output]
+
+
+@app.task
+def model_stats() -> dict[str, float]:
+    """Report how long the models took to load in the worker process that runs this task
+
+    Returns:
+        dict[str, float]: Load time in seconds, keyed by model name.
+    """
+    return model_load_seconds
@@ -0,0 +1,285 @@
+"""OpenTelemetry tracing across the ranking server, Celery dispatch and scorer tasks
+
+The latency of a `/rank` request is spread over the server, the broker, the workers and
+result collection. Tracing follows one request through all of them:
+ - the ranking server runs each HTTP request in a span, continuing the caller's trace if
+   the request has a `traceparent` header
+ - the dispatchers (`compute_scores*` in `scorer_advanced` and `scorer_async`) run in a
+   span, and `celery_app.task_options` puts its trace context into the headers of every
+   task they send
+ - `tasks.ScoringTask` continues that context on the worker, with a span per task (marked
+   `celery.skipped` if the task's deadline had passed)
+ - when the dispatcher is done, its span gets a `result` event per task, at the time the
+   result was received, so the gap between the end of a task span and its result event is
+   the time spent getting the result back
+
+Tracing is optional: it needs `opentelemetry-api` and `opentelemetry-sdk`, and is off unless
+TRACE_FILE is set (or `setup_tracing` is given an exporter). Spans are then appended to
+TRACE_FILE as JSON lines; all processes can share one file. Otherwise the helpers here do
+nothing.
+
+To break down the slowest requests in a trace file:
+
+    python -m scorer_worker.tracing traces.jsonl --slowest 3
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any
+
+from celery.exceptions import Ignore
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # tracing is off
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+"""File that spans are appended to, as JSON lines; tracing is off if unset"""
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+_provider = None
+
+
+def setup_tracing(service_name: str, exporter: Any = None) -> bool:
+    """Start recording this process's spans. Call once per process, before any span starts.
+
+    Args:
+        service_name (str): Recorded as the `service.name` of the spans.
+        exporter: An OpenTelemetry SpanExporter to send spans to synchronously, e.g. an
+            `InMemorySpanExporter` in tests. Defaults to appending to TRACE_FILE.
+
+    Returns:
+        bool: Whether tracing is on.
+    """
+    global _provider
+    if exporter is None and not TRACE_FILE:
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+            SimpleSpanProcessor,
+        )
+    except ImportError:
+        logger.warning("Tracing needs opentelemetry-api and opentelemetry-sdk, it is off")
+        return False
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if exporter is not None:
+        _provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        out = open(TRACE_FILE, "a", buffering=1)  # noqa: SIM115 (open for the process lifetime)
+        file_exporter = ConsoleSpanExporter(
+            out=out, formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+        _provider.add_span_processor(BatchSpanProcessor(file_exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing {service_name} to {exporter or TRACE_FILE}")
+    return True
+
+
+def shutdown_tracing():
+    """Export the spans that are still buffered"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def _tracer():
+    return trace.get_tracer("scorer_worker")
+
+
+def inject_context(headers: dict[str, Any]) -> dict[str, Any]:
+    """Add the current trace context to `headers` (e.g. a Celery task's), if there is one"""
+    if trace is not None:
+        propagate.inject(headers)
+    return headers
+
+
+def _extract(carrier: Mapping[str, Any] | None):
+    if not carrier:
+        return None
+    return propagate.extract({k: v for k, v in carrier.items() if v is not None})
+
+
+@contextmanager
+def span(
+    name: str, carrier: Mapping[str, Any] | None = None, server: bool = False, **attributes
+) -> Iterator[None]:
+    """Run a block in a new span, a child of the current one or of the context in `carrier`
+
+    Args:
+        name (str): The span name.
+        carrier (Mapping[str, Any] | None): Headers to continue a trace from, e.g. an HTTP
+            request's. The current span is the parent if None.
+        server (bool): Whether the span serves a remote request.
+        attributes: Span attributes.
+    """
+    if trace is None:
+        yield
+        return
+    kind = SpanKind.SERVER if server else SpanKind.INTERNAL
+    with _tracer().start_as_current_span(
+        name, context=_extract(carrier), kind=kind, attributes=attributes
+    ):
+        yield
+
+
+@contextmanager
+def task_span(name: str, task_id: str | None, headers: Mapping[str, Any]) -> Iterator[None]:
+    """Run a Celery task in a span, continuing the trace context from its `headers`
+
+    A task that is skipped with `Ignore` is marked `celery.skipped`, not failed.
+    """
+    if trace is None:
+        yield
+        return
+    with _tracer().start_as_current_span(
+        name,
+        context=_extract(headers),
+        kind=SpanKind.CONSUMER,
+        attributes={"celery.task_id": task_id or ""},
+        record_exception=False,
+        set_status_on_exception=False,
+    ) as current:
+        try:
+            yield
+        except Ignore:
+            current.set_attribute("celery.skipped", True)
+            raise
+        except Exception as e:
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def context_headers() -> list[str]:
+    """Names of the headers that carry the trace context"""
+    if trace is None:
+        return []
+    return sorted(propagate.get_global_textmap().fields)
+
+
+def traced(name: str) -> Callable:
+    """Decorator: run each call of a function (or coroutine function) in a span"""
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_outputs(output: list, t_start: float):
+    """Annotate the current (dispatch) span with the outcome of its tasks.
+
+    Adds a `result` event per task that delivered a result, at the time it was received,
+    and the number of items, failed items and timed out items as attributes.
+    """
+    if trace is None:
+        return
+    current = trace.get_current_span()
+    if not current.is_recording():
+        return
+    seen = set()
+    for x in output:
+        timings = x.timings
+        if not timings.success or timings.task_id in seen:
+            continue
+        seen.add(timings.task_id)
+        current.add_event(
+            "result",
+            {"celery.task_id": timings.task_id, "scorer_type": x.scorer_type.name},
+            timestamp=int((t_start + timings.result_received) * 1e9),
+        )
+    errors = [x.error for x in output if x.error is not None]
+    current.set_attribute("scoring.items", len(output))
+    current.set_attribute("scoring.errors", len(errors))
+    current.set_attribute("scoring.timed_out", errors.count("Timed out waiting for results"))
+
+
+def load_traces(lines: list[str]) -> dict[str, list[dict[str, Any]]]:
+    """Spans from a trace file's lines, grouped by trace id"""
+    traces: dict[str, list[dict[str, Any]]] = {}
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            traces.setdefault(record["context"]["trace_id"], []).append(record)
+    return traces
+
+
+def _seconds(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+def breakdown(spans: list[dict[str, Any]]) -> list[str]:
+    """One line per span of a trace, as a tree: start offset, duration, service and name"""
+    children: dict[str | None, list[dict[str, Any]]] = {}
+    ids = {x["context"]["span_id"] for x in spans}
+    for x in spans:
+        parent = x.get("parent_id") if x.get("parent_id") in ids else None
+        children.setdefault(parent, []).append(x)
+    t0 = min(_seconds(x["start_time"]) for x in spans)
+    lines = []
+
+    def visit(parent: str | None, depth: int):
+        for x in sorted(children.get(parent, []), key=lambda x: x["start_time"]):
+            start = _seconds(x["start_time"]) - t0
+            duration = _seconds(x["end_time"]) - _seconds(x["start_time"])
+            service = x.get("resource", {}).get("attributes", {}).get("service.name", "")
+            lines.append(
+                f"{start * 1000:8.1f}ms {duration * 1000:8.1f}ms  "
+                f"{'  ' * depth}{x['name']} [{service}]"
+            )
+            visit(x["context"]["span_id"], depth + 1)
+
+    visit(None, 0)
+    return lines
+
+
+def duration(spans: list[dict[str, Any]]) -> float:
+    """Duration of a trace, from its first span start to its last span end, in seconds"""
+    start = min(_seconds(x["start_time"]) for x in spans)
+    return max(_seconds(x["end_time"]) for x in spans) - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down the slowest traces in a file")
+    parser.add_argument("trace_file")
+    parser.add_argument("--slowest", type=int, default=1, help="number of traces to show")
+    args = parser.parse_args()
+
+    with open(args.trace_file) as f:
+        traces = load_traces(f.readlines())
+    for trace_id, spans in sorted(traces.items(), key=lambda x: -duration(x[1]))[: args.slowest]:
+        print(f"trace {trace_id}: {duration(spans) * 1000:.1f}ms, {len(spans)} spans")
+        print("\n".join(breakdown(spans)))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from celery.exceptions import Ignore
+
+from scorer_worker import tracing
+from scorer_worker.celery_app import task_options
+
+
+def span_record(name, span_id, parent_id, start, end, service="ranking_server"):
+    return json.dumps(
+        {
+            "name": name,
+            "context": {"trace_id": "0x01", "span_id": span_id},
+            "parent_id": parent_id,
+            "start_time": f"2024-05-01T12:00:00.{start:06d}Z",
+            "end_time": f"2024-05-01T12:00:00.{end:06d}Z",
+            "resource": {"attributes": {"service.name": service}},
+        }
+    )
+
+
+def test_breakdown():
+    lines = [
+        span_record("scorer_worker.tasks.random_scorer", "0x3", "0x2", 20000, 70000, "worker"),
+        span_record("compute_scores_async", "0x2", "0x1", 10000, 90000),
+        span_record("POST /rank", "0x1", None, 0, 100000),
+        "",
+    ]
+
+    traces = tracing.load_traces(lines)
+
+    assert list(traces) == ["0x01"]
+    assert tracing.duration(traces["0x01"]) == pytest.approx(0.1)
+    assert tracing.breakdown(traces["0x01"]) == [
+        "     0.0ms    100.0ms  POST /rank [ranking_server]",
+        "    10.0ms     80.0ms    compute_scores_async [ranking_server]",
+        "    20.0ms     50.0ms      scorer_worker.tasks.random_scorer [worker]",
+    ]
+
+
+def test_helpers_without_tracing():
+    with tracing.span("request"):
+        assert "traceparent" not in task_options(deadline=1.0)["headers"]
+
+
+@pytest.fixture(scope="module")
+def exporter():
+    in_memory = pytest.importorskip(
+        "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+    ).InMemorySpanExporter()
+    assert tracing.setup_tracing("test", in_memory)
+    return in_memory
+
+
+@pytest.fixture
+def spans(exporter):
+    exporter.clear()
+    return exporter
+
+
+def test_task_span_continues_dispatch_trace(spans):
+    with tracing.span("POST /rank", carrier={}, server=True):
+        headers = task_options(deadline=1.0)["headers"]
+    with pytest.raises(Ignore), tracing.task_span("task", "task-1", headers):
+        raise Ignore()
+
+    request, task = spans.get_finished_spans()
+    assert task.context.trace_id == request.context.trace_id
+    assert task.parent.span_id == request.context.span_id
+    assert task.attributes["celery.task_id"] == "task-1"
+    assert task.attributes["celery.skipped"]
+    assert task.status.is_ok
+
+
+def test_record_outputs(spans):
+    from scorer_worker.scorer_advanced import ScorerType, ScoringOutput, Timings
+
+    done = Timings("a", result_received=0.5, success=True)
+    output = [
+        ScoringOutput("1", ScorerType.RANDOM, done, score=0.5),
+        ScoringOutput("2", ScorerType.RANDOM, done, score=0.5),
+        ScoringOutput("3", ScorerType.RANDOM, Timings("b"), error="Timed out waiting for results"),
+    ]
+
+    with tracing.span("compute_scores"):
+        tracing.record_outputs(output, t_start=1000.0)
+
+    (dispatch,) = spans.get_finished_spans()
+    assert [(x.name, x.timestamp) for x in dispatch.events] == [("result", 1000_500_000_000)]
+    assert dispatch.attributes["scoring.items"] == 3
+    assert dispatch.attributes["scoring.timed_out"] == 1
@@ -0,0 +1,257 @@
+"""Batch VADER sentiment scoring
+
+NLTK's `SentimentIntensityAnalyzer.polarity_scores` scores one text at a time, in pure
+Python, and spends most of that time on string handling: for every text it builds a table
+of each word combined with each punctuation mark, and then walks the tokens applying the
+VADER rules with dictionary lookups.
+
+`BatchSentimentAnalyzer` computes the same compound scores for a whole batch of texts:
+ - texts are tokenized exactly like VADER does, into one flat list of tokens for the batch
+ - each token is mapped to an integer through a vocabulary index built once from the VADER
+   lexicon, booster and negation lists; unknown words get batch-local ids
+ - valences and word classes are then looked up for all tokens at once in NumPy arrays, and
+   the VADER rules (capitalization, boosters, negation, "never so", idioms, "least", "but")
+   are applied as array operations over the whole batch
+ - per-text sums, punctuation emphasis and normalization are also computed for the batch
+
+Only the compound score is computed, as that is what the scorers use. Like
+`polarity_scores(text)["compound"]`, it is rounded to 4 decimals, and it follows VADER's
+quirks (e.g. a repeated token is scored in the context of its first occurrence).
+"""
+
+import string
+
+import numpy as np
+from nltk.sentiment import SentimentIntensityAnalyzer
+
+PUNCTUATION = string.punctuation
+
+# Words that the rules compare exactly (case-sensitive), and the phrases they appear in
+_EXACT_WORDS = ["never", "so", "this"]
+_BOOSTER_PHRASES = ["just enough", "kind of", "sort of"]
+
+
+class BatchSentimentAnalyzer:
+    """Vectorized VADER compound scores for many texts at once.
+
+    Args:
+        analyzer (SentimentIntensityAnalyzer | None): The analyzer whose lexicon and constants
+            to use. A new one is loaded if not given.
+    """
+
+    def __init__(self, analyzer: SentimentIntensityAnalyzer | None = None):
+        analyzer = analyzer or SentimentIntensityAnalyzer()
+        self.constants = c = analyzer.constants
+        self._punc_list = set(c.PUNC_LIST)
+        self._remove_punctuation = c.REGEX_REMOVE_PUNCTUATION
+
+        # vocabulary of lower-cased words that carry a valence or play a part in a rule
+        words = sorted(
+            set(analyzer.lexicon)
+            | set(c.BOOSTER_DICT)
+            | set(c.NEGATE)
+            | {"kind", "of", "least", "at", "very", "but"}
+        )
+        self._index = {word: i for i, word in enumerate(words)}
+        self._valence = np.array([analyzer.lexicon.get(w, 0.0) for w in words])
+        self._in_lexicon = np.array([w in analyzer.lexicon for w in words])
+        self._booster = np.array([c.BOOSTER_DICT.get(w, 0.0) for w in words])
+        self._is_booster = np.array([w in c.BOOSTER_DICT for w in words])
+        self._negated = np.array([self._is_negation(w) for w in words])
+        self._ids = {w: self._index[w] for w in ["kind", "of", "least", "at", "very", "but"]}
+
+        # exact (case-sensitive) words, for "never so/this", idioms and booster phrases
+        phrases = list(c.SPECIAL_CASE_IDIOMS) + _BOOSTER_PHRASES
+        exact_words = _EXACT_WORDS + sorted({w for p in phrases for w in p.split()})
+        self._exact = {word: i + 1 for i, word in enumerate(dict.fromkeys(exact_words))}
+        self._idioms = [
+            ([self._exact[w] for w in phrase.split()], value)
+            for phrase, value in c.SPECIAL_CASE_IDIOMS.items()
+        ]
+        self._booster_phrases = [[self._exact[w] for w in p.split()] for p in _BOOSTER_PHRASES]
+
+    def _is_negation(self, word: str) -> bool:
+        return word in self.constants.NEGATE or "n't" in word
+
+    def tokenize(self, text: str) -> list[str]:
+        """VADER's `SentiText.words_and_emoticons`, without building its punctuation table.
+
+        A token keeps its punctuation unless it is a word of the punctuation-free text (of
+        two or more characters) with one item of VADER's punctuation list before or after it.
+        """
+        words_only = {w for w in self._remove_punctuation.sub("", text).split() if len(w) > 1}
+        tokens = []
+        for token in text.split():
+            if len(token) <= 1:
+                continue
+            if token[0] in PUNCTUATION:
+                word = token.lstrip(PUNCTUATION)
+                if token[: len(token) - len(word)] in self._punc_list and word in words_only:
+                    token = word
+            elif token[-1] in PUNCTUATION:
+                word = token.rstrip(PUNCTUATION)
+                if token[len(word) :] in self._punc_list and word in words_only:
+                    token = word
+            tokens.append(token)
+        return tokens
+
+    def compound_scores(self, texts: list[str]) -> np.ndarray:
+        """VADER compound scores of `texts`, as an array of floats in [-1, 1]"""
+        c = self.constants
+        n_docs = len(texts)
+        if n_docs == 0:
+            return np.zeros(0)
+
+        # tokenize, and map tokens to vocabulary ids (unknown words get ids past the index)
+        index = self._index
+        unknown: dict[str, int] = {}
+        word_ids, exact_ids, upper, first_local, doc_lengths = [], [], [], [], []
+        for text in texts:
+            tokens = self.tokenize(text)
+            first: dict[str, int] = {}
+            for j, token in enumerate(tokens):
+                lower = token.lower()
+                word_id = index.get(lower)
+                if word_id is None:
+                    word_id = unknown.setdefault(lower, len(index) + len(unknown))
+                word_ids.append(word_id)
+                exact_ids.append(self._exact.get(token, 0))
+                upper.append(token.isupper())
+                first_local.append(first.setdefault(token, j))
+            doc_lengths.append(len(tokens))
+
+        lengths = np.array(doc_lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        n = int(lengths.sum())
+        doc = np.repeat(np.arange(n_docs), lengths)
+        local = np.arange(n) - starts[doc]
+        remaining = lengths[doc] - local - 1  # tokens after this one in its text
+
+        word = np.array(word_ids, dtype=np.int64)
+        exact = np.array(exact_ids, dtype=np.int64)
+        upper = np.array(upper, dtype=bool)
+        n_unknown = len(unknown)
+        valence = np.concatenate((self._valence, np.zeros(n_unknown)))
+        in_lexicon = np.concatenate((self._in_lexicon, np.zeros(n_unknown, dtype=bool)))
+        booster = np.concatenate((self._booster, np.zeros(n_unknown)))
+        is_booster = np.concatenate((self._is_booster, np.zeros(n_unknown, dtype=bool)))
+        negated = np.concatenate(
+            (self._negated, np.array([self._is_negation(w) for w in unknown], dtype=bool))
+        )
+
+        # "some but not all words are ALL CAPS"
+        n_upper = np.bincount(doc, weights=upper, minlength=n_docs)
+        cap_diff = ((lengths - n_upper) > 0) & ((lengths - n_upper) < lengths)
+        emphasized = upper & cap_diff[doc]
+
+        def at(values: np.ndarray, offset: int, fill=0) -> np.ndarray:
+            """`values` of the token `offset` positions away in the same text, else `fill`"""
+            shifted = np.full_like(values, fill)
+            if offset < 0 and n > -offset:
+                shifted[-offset:] = values[:offset]
+            elif offset > 0 and n > offset:
+                shifted[:-offset] = values[offset:]
+            inside = (local + offset >= 0) if offset < 0 else (remaining - offset >= 0)
+            return np.where(inside, shifted, fill)
+
+        ids = self._ids
+        lex = in_lexicon[word]
+        v = valence[word]
+        v = np.where(lex & emphasized, np.where(v > 0, v + c.C_INCR, v - c.C_INCR), v)
+
+        exact_at = {k: at(exact, k) for k in (-3, -2, -1, 1, 2)}
+        exact_at[0] = exact
+        so_this = {self._exact["so"], self._exact["this"]}
+
+        for k in range(3):
+            offset = -(k + 1)
+            prev = at(word, offset, fill=-1)
+            active = lex & (local > k) & ~in_lexicon[prev]
+            # scalar_inc_dec: boosters and dampeners, stronger in ALL CAPS
+            s = np.where(v < 0, -booster[prev], booster[prev])
+            s = np.where(
+                is_booster[prev] & at(emphasized, offset),
+                np.where(v > 0, s + c.C_INCR, s - c.C_INCR),
+                s,
+            )
+            s = s * (1, 0.95, 0.9)[k]
+            v = np.where(active, v + s, v)
+            # _never_check
+            never = self._exact["never"]
+            if k == 0:
+                factor = np.where(negated[prev], c.N_SCALAR, 1.0)
+            elif k == 1:
+                never_so = (exact_at[-2] == never) & np.isin(exact_at[-1], list(so_this))
+                factor = np.where(never_so, 1.5, np.where(negated[prev], c.N_SCALAR, 1.0))
+            else:
+                never_so = (exact_at[-3] == never) & np.isin(exact_at[-2], list(so_this))
+                never_so |= np.isin(exact_at[-1], list(so_this))
+                factor = np.where(never_so, 1.25, np.where(negated[prev], c.N_SCALAR, 1.0))
+            v = np.where(active, v * factor, v)
+            if k == 2:
+                v = np.where(active, self._idioms_check(v, exact_at, remaining), v)
+
+        # _least_check
+        least = at(word, -1, fill=-1) == ids["least"]
+        before_least = at(word, -2, fill=-1)
+        not_at_least = ~np.isin(before_least, [ids["at"], ids["very"]])
+        v = np.where(lex & least & not_at_least, v * c.N_SCALAR, v)
+
+        # booster words and the "kind" of "kind of" score 0, as do words not in the lexicon
+        kind_of = (word == ids["kind"]) & (at(word, 1, fill=-1) == ids["of"])
+        v = np.where(lex & ~kind_of & ~is_booster[word], v, 0.0)
+
+        # each token gets the score of the first occurrence of the same token in its text
+        sentiments = v[starts[doc] + np.array(first_local, dtype=np.int64)]
+
+        # _but_check: halve the words before the first "but" and boost the ones after it
+        but_local = np.full(n_docs, n + 1)
+        is_but = word == ids["but"]
+        np.minimum.at(but_local, doc[is_but], local[is_but])
+        but_at = but_local[doc]
+        has_but = but_at <= n
+        sentiments = np.where(has_but & (local < but_at), sentiments * 0.5, sentiments)
+        sentiments = np.where(has_but & (local > but_at), sentiments * 1.5, sentiments)
+
+        # score_valence
+        sums = np.bincount(doc, weights=sentiments, minlength=n_docs)
+        exclamations = np.minimum([text.count("!") for text in texts], 4)
+        questions = np.array([text.count("?") for text in texts])
+        emphasis = exclamations * 0.292 + np.where(
+            questions > 1, np.where(questions <= 3, questions * 0.18, 0.96), 0
+        )
+        sums = sums + np.sign(sums) * emphasis
+        return np.round(sums / np.sqrt(sums * sums + 15), 4)
+
+    def _idioms_check(
+        self, v: np.ndarray, exact_at: dict[int, np.ndarray], remaining: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized `_idioms_check`, for tokens with at least three tokens before them"""
+
+        def matches(phrase: list[int], offset: int) -> np.ndarray:
+            return np.logical_and.reduce(
+                [exact_at[offset + i] == word for i, word in enumerate(phrase)]
+            )
+
+        def idiom_value(length: int, offset: int) -> np.ndarray:
+            value = np.full(len(v), np.nan)
+            for phrase, phrase_value in self._idioms:
+                if len(phrase) == length:
+                    value = np.where(matches(phrase, offset), phrase_value, value)
+            return value
+
+        # the first idiom that ends at or just before the token, in VADER's order ...
+        replacement = np.full(len(v), np.nan)
+        for length, offset in [(2, -1), (3, -2), (2, -2), (3, -3), (2, -3)]:
+            value = idiom_value(length, offset)
+            replacement = np.where(np.isnan(replacement), value, replacement)
+        # ... unless an idiom starts at the token
+        for length in (2, 3):
+            value = idiom_value(length, 0)
+            replacement = np.where(np.isnan(value), replacement, value)
+        v = np.where(np.isnan(replacement), v, replacement)
+
+        booster_phrase = np.zeros(len(v), dtype=bool)
+        for phrase in self._booster_phrases:
+            booster_phrase |= matches(phrase, -3) | matches(phrase, -2)
+        return np.where(booster_phrase, v + self.constants.B_DECR, v)
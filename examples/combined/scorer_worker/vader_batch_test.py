@@ -0,0 +1,55 @@
+import pytest
+from nltk.sentiment import SentimentIntensityAnalyzer
+from nltk.sentiment.vader import SentiText
+
+from scorer_worker.scorer_test import sample_posts
+from scorer_worker.vader_batch import BatchSentimentAnalyzer
+
+# texts that exercise each of VADER's rules
+rule_texts = [
+    "That is NOT GOOD at all!!",  # negation, ALL CAPS, exclamation marks
+    "I am EXTREMELY happy, you are barely happy",  # boosters and dampeners
+    "never so happy",
+    "it's never this bad??? ",  # "never so/this", question marks
+    "I am not very happy but he is VERY happy",  # "but"
+    "kind of good",
+    "He is sort of kind of nice",  # booster phrases
+    "the shit is the bomb",
+    "cut the mustard good",
+    "yeah right, good",  # idioms
+    "at least it's good",
+    "least good",
+    "very least good",  # "least"
+    "good good GOOD :) :-) <3",  # repeated tokens, emoticons
+    "(good) 'bad' good! ...",  # punctuation around words
+    "",
+    "a",
+    "!!!",
+]
+
+
+@pytest.fixture(scope="module")
+def sia():
+    return SentimentIntensityAnalyzer()
+
+
+def test_matches_polarity_scores(sia):
+    texts = sample_posts + rule_texts
+    expected = [sia.polarity_scores(text)["compound"] for text in texts]
+
+    scores = BatchSentimentAnalyzer(sia).compound_scores(texts)
+
+    assert scores == pytest.approx(expected, abs=1e-4)
+
+
+def test_tokenize(sia):
+    analyzer = BatchSentimentAnalyzer(sia)
+    for text in sample_posts + rule_texts:
+        expected = SentiText(
+            text, sia.constants.PUNC_LIST, sia.constants.REGEX_REMOVE_PUNCTUATION
+        ).words_and_emoticons
+        assert analyzer.tokenize(text) == expected
+
+
+def test_empty_batch(sia):
+    assert len(BatchSentimentAnalyzer(sia).compound_scores([])) == 0
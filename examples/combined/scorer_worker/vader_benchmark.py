@@ -0,0 +1,54 @@
+"""Compare per-item and batch VADER sentiment scoring.
+
+Scores feeds made of the sample posts with `SentimentIntensityAnalyzer.polarity_scores`
+in a loop, and with `vader_batch.BatchSentimentAnalyzer.compound_scores` in one call:
+
+    python -m scorer_worker.vader_benchmark --items 10 100 1000 10000
+"""
+
+import argparse
+import statistics
+import time
+from itertools import cycle, islice
+
+import numpy as np
+from nltk.sentiment import SentimentIntensityAnalyzer
+
+from scorer_worker.scorer_test import sample_posts
+from scorer_worker.vader_batch import BatchSentimentAnalyzer
+
+
+def timed(fn, texts: list[str], repeat: int) -> tuple[float, list[float]]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = fn(texts)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), list(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sia = SentimentIntensityAnalyzer()
+    batch = BatchSentimentAnalyzer(sia)
+
+    def loop(texts):
+        return [sia.polarity_scores(text)["compound"] for text in texts]
+
+    for items in args.items:
+        texts = list(islice(cycle(sample_posts), items))
+        loop_time, expected = timed(loop, texts, args.repeat)
+        batch_time, scores = timed(batch.compound_scores, texts, args.repeat)
+        max_diff = float(np.max(np.abs(np.array(expected) - np.array(scores))))
+        print(
+            f"{items:>6} items  loop {loop_time * 1000:8.2f}ms  batch {batch_time * 1000:8.2f}ms"
+            f"  speedup {loop_time / batch_time:5.1f}x  max diff {max_diff:.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Validation throughput of `ContentItem` lists with discriminated vs. plain-union engagements.
+
+The plain-union model reproduces the original `ContentItem.engagements` field, where pydantic
+tries each engagement model in turn.
+
+Usage:
+    python engagements_benchmark.py [--repeat N]
+"""
+
+import argparse
+import timeit
+from typing import Union
+
+from pydantic import Field, TypeAdapter
+from ranking_challenge.fake import fake_item
+from ranking_challenge.request import (
+    ContentItem,
+    FacebookEngagements,
+    RedditEngagements,
+    TwitterEngagements,
+)
+
+PLATFORMS = ["twitter", "reddit", "facebook"]
+LIST_SIZES = [10, 100, 1000]
+
+
+class UnionContentItem(ContentItem):
+    engagements: Union[TwitterEngagements, RedditEngagements, FacebookEngagements] = Field(
+        description="Engagement counts for the content item."
+    )
+
+
+discriminated = TypeAdapter(list[ContentItem])
+plain_union = TypeAdapter(list[UnionContentItem])
+
+
+def run_benchmark(repeat):
+    print(f"{'platform':<10}{'items':>7}{'union (items/s)':>18}{'discriminated (items/s)':>26}")
+    for platform in PLATFORMS:
+        for n_items in LIST_SIZES:
+            items = [fake_item(platform=platform) for _ in range(n_items)]
+            body = discriminated.dump_json(items)
+            union_time = min(
+                timeit.repeat(lambda: plain_union.validate_json(body), number=1, repeat=repeat)
+            )
+            discriminated_time = min(
+                timeit.repeat(lambda: discriminated.validate_json(body), number=1, repeat=repeat)
+            )
+            print(
+                f"{platform:<10}{n_items:>7}{n_items / union_time:>18,.0f}"
+                f"{n_items / discriminated_time:>26,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark engagements validation.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing runs per list")
+    args = parser.parse_args()
+
+    run_benchmark(args.repeat)
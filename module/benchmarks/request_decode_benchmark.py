@@ -0,0 +1,45 @@
+"""Compare `RankingRequest.model_validate_json` with the trusted-input decoder.
+
+Feeds are generated with `ranking_challenge.fake`, one per platform and feed size.
+
+Usage:
+    python request_decode_benchmark.py [--repeat N]
+"""
+
+import argparse
+import timeit
+
+from ranking_challenge.fake import fake_request
+from ranking_challenge.request import RankingRequest, parse_ranking_request
+
+PLATFORMS = ["twitter", "reddit", "facebook"]
+FEED_SIZES = [10, 100, 1000]
+
+
+def run_benchmark(repeat):
+    print(f"{'platform':<10}{'items':>7}{'validated (ms)':>16}{'trusted (ms)':>14}{'speedup':>9}")
+    for platform in PLATFORMS:
+        for n_items in FEED_SIZES:
+            body = fake_request(n_posts=n_items, platform=platform).model_dump_json()
+            validated = min(
+                timeit.repeat(
+                    lambda: RankingRequest.model_validate_json(body), number=1, repeat=repeat
+                )
+            )
+            trusted = min(
+                timeit.repeat(
+                    lambda: parse_ranking_request(body, trusted=True), number=1, repeat=repeat
+                )
+            )
+            print(
+                f"{platform:<10}{n_items:>7}{validated * 1000:>16.3f}{trusted * 1000:>14.3f}"
+                f"{validated / trusted:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ranking request decoding.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing runs per feed")
+    args = parser.parse_args()
+
+    run_benchmark(args.repeat)
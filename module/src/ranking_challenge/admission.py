@@ -0,0 +1,229 @@
+"""Admission control for ranking servers: shed load by returning the original order.
+
+A ranker that accepts every request slows down for all of them once it is saturated, until
+requests time out at the router. It is better to answer some requests right away with the
+feed as it was (the "identity ranking", ordered by `ContentItem.original_rank`), and give
+the rest the full ranking in time.
+
+`AdmissionController` decides when to shed, from two signals:
+ - the number of `/rank` requests in flight in this process
+ - event-loop lag: how late a timer that should fire every `lag_interval` seconds runs,
+   which grows when the loop is busy with CPU work or has too many tasks
+
+`AdmissionControlMiddleware` answers shed requests with the identity ranking, without
+reaching the ranker. With a `budget`, requests that were admitted but haven't been ranked
+after `budget` seconds also get the identity ranking.
+
+Usage:
+
+    admission = AdmissionController(max_in_flight=32, max_loop_lag=0.1, registry=registry)
+    app.add_middleware(AdmissionControlMiddleware, controller=admission, budget=0.5)
+"""
+
+import asyncio
+import time
+from typing import Optional, Union
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+from pydantic_core import from_json
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .response import encode_ranking_response
+
+SHED_IN_FLIGHT = "in_flight"
+SHED_LOOP_LAG = "loop_lag"
+SHED_BUDGET = "budget"
+
+
+def identity_ranking(body: Union[str, bytes]) -> list[str]:
+    """The item IDs of a ranking request body, in their original order.
+
+    Items are ordered by `original_rank`; items without one keep their position in the
+    request, after the ranked ones. Only the IDs and ranks are decoded, so this is cheap even
+    for a large feed.
+    """
+    items = from_json(body).get("items") or []
+    order = sorted(
+        range(len(items)),
+        key=lambda i: (
+            items[i].get("original_rank") is None,
+            items[i].get("original_rank") or 0,
+            i,
+        ),
+    )
+    return [items[i]["id"] for i in order]
+
+
+class AdmissionController:
+    """Tracks in-flight requests and event-loop lag, and decides when to shed load.
+
+    Args:
+        max_in_flight: Requests in flight beyond which new requests are shed. None disables
+            this check.
+        max_loop_lag: Event-loop lag, in seconds, beyond which new requests are shed. None
+            disables this check.
+        lag_interval: How often the event-loop lag is sampled, in seconds.
+        registry: If given, shed counts, in-flight requests and loop lag are also exported to
+            this Prometheus registry.
+
+    Attributes:
+        in_flight (int): Admitted requests that haven't finished yet.
+        loop_lag (float): The last event-loop lag sample, in seconds.
+        admitted (int): Requests let through.
+        shed (dict[str, int]): Requests answered with the identity ranking, by reason.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = 64,
+        max_loop_lag: Optional[float] = 0.1,
+        lag_interval: float = 0.05,
+        registry: Optional[CollectorRegistry] = None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.lag_interval = lag_interval
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self.admitted = 0
+        self.shed = {SHED_IN_FLIGHT: 0, SHED_LOOP_LAG: 0, SHED_BUDGET: 0}
+        self._monitor: Optional[asyncio.Task] = None
+
+        self._shed_counter = None
+        self._in_flight_gauge = None
+        self._lag_gauge = None
+        if registry is not None:
+            self._shed_counter = Counter(
+                "ranking_requests_shed_total",
+                "Ranking requests answered with the original order, by reason",
+                ["reason"],
+                registry=registry,
+            )
+            self._in_flight_gauge = Gauge(
+                "ranking_requests_in_flight",
+                "Ranking requests being processed",
+                registry=registry,
+            )
+            self._lag_gauge = Gauge(
+                "ranking_event_loop_lag_seconds",
+                "Delay of the last event-loop lag probe",
+                registry=registry,
+            )
+
+    def _ensure_monitor(self):
+        """Start sampling the lag on the running event loop, if not already."""
+        if self.max_loop_lag is None:
+            return
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.get_running_loop().create_task(self._sample_lag())
+
+    async def _sample_lag(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag = max(time.monotonic() - start - self.lag_interval, 0.0)
+            if self._lag_gauge is not None:
+                self._lag_gauge.set(self.loop_lag)
+
+    def admit(self) -> Optional[str]:
+        """Decide on a new request. Returns None to admit it, or the reason to shed it.
+
+        An admitted request must be reported with `release` when it finishes.
+        """
+        self._ensure_monitor()
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            reason = SHED_IN_FLIGHT
+        elif self.max_loop_lag is not None and self.loop_lag > self.max_loop_lag:
+            reason = SHED_LOOP_LAG
+        else:
+            self.in_flight += 1
+            self.admitted += 1
+            if self._in_flight_gauge is not None:
+                self._in_flight_gauge.inc()
+            return None
+        self.record_shed(reason)
+        return reason
+
+    def release(self):
+        """Report that an admitted request finished."""
+        self.in_flight -= 1
+        if self._in_flight_gauge is not None:
+            self._in_flight_gauge.dec()
+
+    def record_shed(self, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        if self._shed_counter is not None:
+            self._shed_counter.labels(reason).inc()
+
+    def stop(self):
+        """Stop sampling the event-loop lag."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    """Answers requests POSTed to `path` with the identity ranking while overloaded.
+
+    Args:
+        controller: Decides which requests to admit.
+        path: The ranking endpoint.
+        budget: If given, admitted requests that take longer than this many seconds are also
+            answered with the identity ranking. The ranker keeps running in the background;
+            its response is discarded.
+
+    Shed responses have `metadata.intervention_on` set to False, and an `X-Load-Shed` header
+    with the reason.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        path: str = "/rank",
+        budget: Optional[float] = None,
+    ):
+        super().__init__(app)
+        self.controller = controller
+        self.path = path
+        self.budget = budget
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "POST" or request.url.path != self.path:
+            return await call_next(request)
+
+        reason = self.controller.admit()
+        if reason is not None:
+            return self._shed_response(await request.body(), reason)
+
+        if self.budget is None:
+            try:
+                return await call_next(request)
+            finally:
+                self.controller.release()
+
+        body = await request.body()
+        ranking = asyncio.ensure_future(call_next(request))
+        ranking.add_done_callback(self._ranking_done)
+        done, _ = await asyncio.wait([ranking], timeout=self.budget)
+        if done:
+            return ranking.result()
+        self.controller.record_shed(SHED_BUDGET)
+        return self._shed_response(body, SHED_BUDGET)
+
+    def _ranking_done(self, task: asyncio.Future):
+        self.controller.release()
+        if not task.cancelled():
+            task.exception()  # a late failure has nobody to report to
+
+    def _shed_response(self, body: bytes, reason: str) -> Response:
+        try:
+            ranked_ids = identity_ranking(body)
+        except (ValueError, AttributeError, KeyError, TypeError):
+            return Response(status_code=503, headers={"X-Load-Shed": reason})
+        content = encode_ranking_response(ranked_ids, metadata={"intervention_on": False})
+        return Response(
+            content=content, media_type="application/json", headers={"X-Load-Shed": reason}
+        )
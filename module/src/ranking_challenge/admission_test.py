@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from ranking_challenge import fake
+from ranking_challenge.admission import (
+    AdmissionController,
+    AdmissionControlMiddleware,
+    identity_ranking,
+)
+from ranking_challenge.request import RankingRequest
+
+JSON = {"Content-Type": "application/json"}
+
+
+def make_app(controller, budget=None, handler_delay=0.0):
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, controller=controller, budget=budget)
+    calls = []
+
+    @app.post("/rank")
+    async def rank(ranking_request: RankingRequest):
+        calls.append(ranking_request)
+        await asyncio.sleep(handler_delay)
+        return {"ranked_ids": [item.id for item in reversed(ranking_request.items)]}
+
+    return app, calls
+
+
+def test_identity_ranking():
+    request = fake.fake_request(n_posts=4)
+    for item, rank in zip(request.items, [2, None, 0, 1]):
+        item.original_rank = rank
+    ids = [item.id for item in request.items]
+
+    assert identity_ranking(request.model_dump_json()) == [ids[2], ids[3], ids[0], ids[1]]
+
+
+def test_sheds_beyond_max_in_flight():
+    registry = CollectorRegistry()
+    controller = AdmissionController(max_in_flight=1, max_loop_lag=None, registry=registry)
+    app, calls = make_app(controller, handler_delay=0.2)
+    request = fake.fake_request(n_posts=3)
+    body = request.model_dump_json()
+
+    with TestClient(app) as client:
+        responses = []
+        threads = [
+            threading.Thread(
+                target=lambda: responses.append(client.post("/rank", content=body, headers=JSON))
+            )
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+    ranked = [item.id for item in reversed(request.items)]
+    identity = identity_ranking(body)
+    assert len(calls) == 1
+    assert sorted(x.json()["ranked_ids"] for x in responses) == sorted([ranked, identity])
+    shed = next(x for x in responses if "x-load-shed" in x.headers)
+    assert shed.headers["x-load-shed"] == "in_flight"
+    assert shed.json()["metadata"] == {"intervention_on": False}
+    assert controller.in_flight == 0
+    assert controller.shed["in_flight"] == 1
+    assert registry.get_sample_value("ranking_requests_shed_total", {"reason": "in_flight"}) == 1
+
+
+def test_sheds_on_loop_lag():
+    controller = AdmissionController(max_in_flight=None, max_loop_lag=0.05)
+    app, calls = make_app(controller)
+
+    @app.post("/block")
+    async def block():
+        time.sleep(0.2)  # noqa: ASYNC251 (blocks the event loop on purpose)
+
+    body = fake.fake_request(n_posts=2).model_dump_json()
+    with TestClient(app) as client:
+        assert "x-load-shed" not in client.post("/rank", content=body, headers=JSON).headers
+        client.post("/block")
+        response = client.post("/rank", content=body, headers=JSON)
+
+    assert response.headers["x-load-shed"] == "loop_lag"
+    assert len(calls) == 1
+    controller.stop()
+
+
+def test_budget_returns_identity_ranking():
+    controller = AdmissionController(max_in_flight=None, max_loop_lag=None)
+    app, _ = make_app(controller, budget=0.05, handler_delay=0.5)
+    request = fake.fake_request(n_posts=3)
+
+    with TestClient(app) as client:
+        response = client.post("/rank", content=request.model_dump_json(), headers=JSON)
+
+    assert response.status_code == 200
+    assert response.headers["x-load-shed"] == "budget"
+    assert response.json()["ranked_ids"] == identity_ranking(request.model_dump_json())
+    assert controller.shed["budget"] == 1
+
+
+def test_other_routes_are_not_controlled():
+    controller = AdmissionController(max_in_flight=0, max_loop_lag=None)
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, controller=controller)
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"ok": True}
+    assert controller.shed["in_flight"] == 0
@@ -0,0 +1,249 @@
+"""Per-process cache of parsed ranking requests (and optionally responses), keyed by body.
+
+The request router re-sends near-identical bodies: a prefetch (`session.prefetch=True`) is
+followed by the real request, and requests are retried on timeout. `RequestCache` remembers
+the parsed `RankingRequest` for each body, and, if the ranker allows it, the response it
+produced, so that repeated bodies skip both parsing and ranking.
+
+The cache key is a hash of the raw body with the `prefetch` flag masked out, so a prefetch and
+the matching real request share an entry. The returned request always carries the `prefetch`
+flag of the body that was actually received. Cached requests are shared between callers,
+so they must not be modified.
+
+Usage, parsing only:
+
+    cache = RequestCache(max_size=256, ttl=30)
+
+    @app.post("/rank")
+    async def rank(fastapi_req: Request) -> RankingResponse:
+        ranking_request = cache.parse(await fastapi_req.body())
+
+Usage, replaying responses without changing ranker code:
+
+    cache = RequestCache(max_size=256, ttl=30, cache_responses=True)
+    app.add_middleware(RequestCacheMiddleware, cache=cache)
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+from prometheus_client import CollectorRegistry, Counter
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .request import RankingRequest, parse_ranking_request
+
+# Starts with a literal, so that `re` can skip through the body quickly (a lookbehind for
+# escaped quotes makes it try every position); escaped quotes are skipped in `_prefetch_matches`
+_prefetch_re = re.compile(rb'"prefetch"\s*:\s*(true|false|null)')
+
+
+@dataclass
+class _Entry:
+    expires: float
+    request: Optional[RankingRequest] = None
+    response: Optional[bytes] = None
+    media_type: Optional[str] = None
+
+
+def _body_bytes(body: Union[str, bytes]) -> bytes:
+    return body.encode() if isinstance(body, str) else bytes(body)
+
+
+def _prefetch_matches(body: bytes) -> Iterator[re.Match]:
+    for match in _prefetch_re.finditer(body):
+        if body[match.start() - 1 : match.start()] != b"\\":
+            yield match
+
+
+def _prefetch_flag(body: bytes) -> Optional[bool]:
+    match = next(_prefetch_matches(body), None)
+    if match is None:
+        return False  # the Session default
+    return {b"true": True, b"false": False, b"null": None}[match.group(1)]
+
+
+class RequestCache:
+    """LRU + TTL cache from request bodies to parsed requests and responses.
+
+    Args:
+        max_size: Maximum number of bodies to remember; the least recently used is evicted.
+        ttl: Seconds an entry stays valid after it is created.
+        cache_responses: Whether responses may be stored and replayed. Only enable this if
+            your ranker returns the same ranking for the same request, and doesn't depend on
+            seeing the real request after a prefetch.
+        trusted: Passed to `parse_ranking_request` when parsing a new body.
+        registry: If given, hit/miss counters are also exported to this Prometheus registry.
+
+    Attributes:
+        hits, misses (int): Lookups of parsed requests that did / did not find an entry.
+        response_hits, response_misses (int): The same, for responses.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: float = 30.0,
+        cache_responses: bool = False,
+        trusted: bool = False,
+        registry: Optional[CollectorRegistry] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_responses = cache_responses
+        self.trusted = trusted
+        self.hits = 0
+        self.misses = 0
+        self.response_hits = 0
+        self.response_misses = 0
+        self._entries: OrderedDict[bytes, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._counter = None
+        if registry is not None:
+            self._counter = Counter(
+                "ranking_request_cache_lookups_total",
+                "Lookups in the ranking request cache",
+                ["kind", "result"],
+                registry=registry,
+            )
+
+    @staticmethod
+    def key(body: Union[str, bytes]) -> bytes:
+        """The cache key for a body: a hash of it with the prefetch flag masked out."""
+        body = _body_bytes(body)
+        masked = []
+        end = 0
+        for match in _prefetch_matches(body):
+            masked += [body[end : match.start()], b'"prefetch":null']
+            end = match.end()
+        masked.append(body[end:])
+        return hashlib.blake2b(b"".join(masked), digest_size=16).digest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _record(self, kind: str, hit: bool):
+        if kind == "request":
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        elif hit:
+            self.response_hits += 1
+        else:
+            self.response_misses += 1
+        if self._counter is not None:
+            self._counter.labels(kind, "hit" if hit else "miss").inc()
+
+    def _get_entry(self, key: bytes) -> Optional[_Entry]:
+        # must be called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_entry(self, key: bytes) -> _Entry:
+        # must be called with the lock held
+        entry = self._get_entry(key)
+        if entry is None:
+            entry = _Entry(expires=time.monotonic() + self.ttl)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def parse(self, body: Union[str, bytes]) -> RankingRequest:
+        """Return the parsed request for `body`, parsing it only if it isn't cached.
+
+        The request is shared with every other caller that sends the same body: treat it as
+        read-only. Only its `session` is copied, when the prefetch flag differs.
+        """
+        body = _body_bytes(body)
+        key = self.key(body)
+        with self._lock:
+            entry = self._get_entry(key)
+            request = entry.request if entry is not None else None
+            self._record("request", request is not None)
+
+        if request is None:
+            request = parse_ranking_request(body, trusted=self.trusted)
+            with self._lock:
+                self._put_entry(key).request = request
+
+        prefetch = _prefetch_flag(body)
+        if request.session.prefetch != prefetch:
+            session = request.session.model_copy(update={"prefetch": prefetch})
+            request = request.model_copy(update={"session": session})
+        return request
+
+    def get_response(self, body: Union[str, bytes]) -> Optional[tuple[bytes, str]]:
+        """Return the cached `(content, media_type)` response for `body`, if there is one."""
+        if not self.cache_responses:
+            return None
+        with self._lock:
+            entry = self._get_entry(self.key(body))
+            response = None
+            if entry is not None and entry.response is not None:
+                response = (entry.response, entry.media_type)
+            self._record("response", response is not None)
+        return response
+
+    def put_response(
+        self, body: Union[str, bytes], content: bytes, media_type: str = "application/json"
+    ):
+        """Remember the serialized response produced for `body`."""
+        if not self.cache_responses:
+            return
+        with self._lock:
+            entry = self._put_entry(self.key(body))
+            entry.response = content
+            entry.media_type = media_type
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RequestCacheMiddleware(BaseHTTPMiddleware):
+    """Replays cached responses for repeated bodies POSTed to `path`.
+
+    Successful responses are stored in `cache` (which must have `cache_responses=True`);
+    later requests with the same body (ignoring the prefetch flag) get the stored response
+    without reaching the ranker.
+    """
+
+    def __init__(self, app, cache: RequestCache, path: str = "/rank"):
+        super().__init__(app)
+        self.cache = cache
+        self.path = path
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "POST" or request.url.path != self.path:
+            return await call_next(request)
+
+        body = await request.body()
+        cached = self.cache.get_response(body)
+        if cached is not None:
+            content, media_type = cached
+            return Response(content=content, media_type=media_type)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        media_type = response.headers.get("content-type", "application/json")
+        self.cache.put_response(body, content, media_type)
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        return Response(content=content, status_code=response.status_code, headers=headers)
@@ -0,0 +1,108 @@
+import time
+import timeit
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from ranking_challenge import fake
+from ranking_challenge.cache import RequestCache, RequestCacheMiddleware
+from ranking_challenge.request import parse_ranking_request
+
+
+def test_parse_is_cached():
+    cache = RequestCache()
+    body = fake.fake_request(n_posts=3).model_dump_json()
+
+    first = cache.parse(body)
+    second = cache.parse(body.encode())
+
+    assert second is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_hit_is_cheaper_than_parsing():
+    cache = RequestCache(trusted=True)
+    body = fake.fake_request(n_posts=200).model_dump_json()
+    cache.parse(body)
+
+    parse = min(timeit.repeat(lambda: parse_ranking_request(body, trusted=True), number=5))
+    hit = min(timeit.repeat(lambda: cache.parse(body), number=5))
+
+    assert hit < parse
+
+
+def test_prefetch_shares_entry():
+    cache = RequestCache()
+    request = fake.fake_request(n_posts=3)
+    request.session.prefetch = True
+    prefetch_body = request.model_dump_json()
+    request.session.prefetch = False
+    real_body = request.model_dump_json()
+
+    prefetch = cache.parse(prefetch_body)
+    assert prefetch.session.prefetch is True
+    real = cache.parse(real_body)
+
+    assert real.session.prefetch is False
+    assert real.items is prefetch.items  # only the session is copied
+    assert real.items == request.items
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_and_ttl_eviction():
+    cache = RequestCache(max_size=2, ttl=60)
+    bodies = [fake.fake_request(n_posts=1).model_dump_json() for _ in range(3)]
+    for body in bodies:
+        cache.parse(body)
+
+    assert len(cache) == 2
+    cache.parse(bodies[0])
+    assert cache.misses == 4
+
+    cache = RequestCache(ttl=0.01)
+    cache.parse(bodies[0])
+    time.sleep(0.02)
+    cache.parse(bodies[0])
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_responses_only_when_allowed():
+    body = fake.fake_request(n_posts=1).model_dump_json()
+
+    cache = RequestCache()
+    cache.put_response(body, b"{}")
+    assert cache.get_response(body) is None
+
+    cache = RequestCache(cache_responses=True)
+    assert cache.get_response(body) is None
+    cache.put_response(body, b"{}")
+    assert cache.get_response(body) == (b"{}", "application/json")
+    assert (cache.response_hits, cache.response_misses) == (1, 1)
+
+
+def test_middleware_replays_responses():
+    registry = CollectorRegistry()
+    cache = RequestCache(cache_responses=True, registry=registry)
+    app = FastAPI()
+    app.add_middleware(RequestCacheMiddleware, cache=cache)
+    calls = []
+
+    @app.post("/rank")
+    async def rank(fastapi_req: Request):
+        ranking_request = cache.parse(await fastapi_req.body())
+        calls.append(ranking_request)
+        return {"ranked_ids": [item.id for item in ranking_request.items]}
+
+    client = TestClient(app)
+    body = fake.fake_request(n_posts=3).model_dump_json()
+
+    first = client.post("/rank", content=body)
+    second = client.post("/rank", content=body)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(calls) == 1
+    hits = registry.get_sample_value(
+        "ranking_request_cache_lookups_total", {"kind": "response", "result": "hit"}
+    )
+    assert hits == 1
@@ -0,0 +1,89 @@
+"""Columnar (struct-of-arrays) view of a ranking request.
+
+Rankers that compute features for a whole feed at once can use `RankingRequest.to_columns()`
+instead of walking `request.items` one pydantic object at a time. This module requires numpy,
+which is not a dependency of `ranking_challenge` itself: `pip install numpy`.
+"""
+
+from dataclasses import dataclass
+from datetime import timezone
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .request import ENGAGEMENT_MODELS
+
+if TYPE_CHECKING:
+    from .request import RankingRequest
+
+
+@dataclass
+class RequestColumns:
+    """The items of a ranking request, one array per field.
+
+    Attributes:
+        ids (list[str]): Item IDs, in request order.
+        texts (list[str]): Item texts. These are the same string objects as on the items.
+        created_at (np.ndarray): `datetime64[us]` creation times, in UTC.
+        original_rank (np.ndarray): `int64` original ranks, -1 where the item has none.
+        is_post (np.ndarray): Boolean, True for items of type `post`.
+        is_comment (np.ndarray): Boolean, True for items of type `comment`.
+        engagements (dict[str, np.ndarray]): `int64` counts keyed by engagement name, for the
+            engagement fields of the request's platform. Missing counts are 0. Deprecated
+            fields (reddit `upvote`/`downvote`) are left out.
+    """
+
+    ids: list[str]
+    texts: list[str]
+    created_at: np.ndarray
+    original_rank: np.ndarray
+    is_post: np.ndarray
+    is_comment: np.ndarray
+    engagements: dict[str, np.ndarray]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _utc_naive(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def request_columns(request: "RankingRequest") -> RequestColumns:
+    """Build a `RequestColumns` view of `request.items`."""
+    items = request.items
+    n_items = len(items)
+
+    engagements_model = ENGAGEMENT_MODELS[request.session.platform]
+    engagement_names = [
+        name for name, field in engagements_model.model_fields.items() if not field.deprecated
+    ]
+    engagements = {name: np.zeros(n_items, dtype=np.int64) for name in engagement_names}
+    for i, item in enumerate(items):
+        values = item.engagements.__dict__
+        for name in engagement_names:
+            value = values.get(name)
+            if value is not None:
+                engagements[name][i] = value
+
+    is_post = np.fromiter((item.type == "post" for item in items), dtype=bool, count=n_items)
+    original_rank = np.fromiter(
+        (-1 if item.original_rank is None else item.original_rank for item in items),
+        dtype=np.int64,
+        count=n_items,
+    )
+    created_at = np.array(
+        [_utc_naive(item.created_at) for item in items], dtype="datetime64[us]"
+    ).reshape(n_items)
+
+    return RequestColumns(
+        ids=[item.id for item in items],
+        texts=[item.text for item in items],
+        created_at=created_at,
+        original_rank=original_rank,
+        is_post=is_post,
+        is_comment=~is_post,
+        engagements=engagements,
+    )
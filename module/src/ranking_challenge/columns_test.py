@@ -0,0 +1,42 @@
+import pytest
+from ranking_challenge import fake
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("platform", ["twitter", "reddit", "facebook"])
+def test_to_columns(platform):
+    request = fake.fake_request(n_posts=3, n_comments=2, platform=platform)
+    request.items[0].original_rank = None
+
+    columns = request.to_columns()
+
+    assert len(columns) == len(request.items) == 9
+    assert columns.ids == [item.id for item in request.items]
+    assert columns.texts == [item.text for item in request.items]
+    assert columns.original_rank[0] == -1
+    assert list(columns.original_rank[1:]) == [item.original_rank for item in request.items[1:]]
+    assert columns.is_post.sum() == 3
+    assert columns.is_comment.sum() == 6
+    assert columns.created_at.dtype == np.dtype("datetime64[us]")
+
+    for name, counts in columns.engagements.items():
+        assert counts.dtype == np.int64
+        assert list(counts) == [getattr(item.engagements, name) for item in request.items]
+
+
+def test_to_columns_skips_deprecated_reddit_fields():
+    request = fake.fake_request(n_posts=2, platform="reddit")
+
+    columns = request.to_columns()
+
+    assert set(columns.engagements) == {"score", "comment", "award"}
+
+
+def test_to_columns_empty_request():
+    request = fake.fake_request(n_posts=0)
+
+    columns = request.to_columns()
+
+    assert len(columns) == 0
+    assert columns.created_at.shape == (0,)
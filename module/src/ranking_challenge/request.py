@@ -1,8 +1,17 @@
 # ruff: noqa: E501
+import re
 from datetime import datetime
-from typing import Literal, Optional, Union
+from typing import Annotated, Literal, Optional, Union
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import (
+    BaseModel,
+    Discriminator,
+    Field,
+    HttpUrl,
+    PlainValidator,
+    Tag,
+    TypeAdapter,
+)
 from pydantic.types import NonNegativeInt
 
 from .survey import SurveyResponse
@@ -51,6 +60,51 @@ class FacebookEngagements(BaseModel):
     share: NonNegativeInt
 
 
+ENGAGEMENT_MODELS: dict[str, type[BaseModel]] = {
+    "twitter": TwitterEngagements,
+    "reddit": RedditEngagements,
+    "facebook": FacebookEngagements,
+}
+
+# A field that only one platform's engagement model requires, used to recognise engagement
+# records that don't say which platform they came from.
+_PLATFORM_ENGAGEMENT_KEYS = {
+    "retweet": "twitter",
+    "award": "reddit",
+    "love": "facebook",
+}
+
+
+def engagements_platform(value) -> Optional[str]:
+    """Return the platform an engagements record belongs to, or None if it can't be told.
+
+    Records may name their platform explicitly with a `platform` key. Otherwise (as in all
+    existing PRC JSON) the platform is recognised from the fields that are present.
+    """
+    if isinstance(value, dict):
+        platform = value.get("platform")
+        if platform is not None:
+            return platform
+        for key, platform in _PLATFORM_ENGAGEMENT_KEYS.items():
+            if key in value:
+                return platform
+        return None
+    for platform, model in ENGAGEMENT_MODELS.items():
+        if isinstance(value, model):
+            return platform
+    return None
+
+
+Engagements = Annotated[
+    Union[
+        Annotated[TwitterEngagements, Tag("twitter")],
+        Annotated[RedditEngagements, Tag("reddit")],
+        Annotated[FacebookEngagements, Tag("facebook")],
+    ],
+    Discriminator(engagements_platform),
+]
+
+
 class ContentItem(BaseModel):
     """A content item to be ranked"""
 
@@ -97,9 +151,7 @@ class ContentItem(BaseModel):
         description="The time that the item was created in UTC, in `YYYY-MM-DD hh:mm:ss` format, at the highest resolution available (which may be as low as the hour)."
     )
 
-    engagements: Union[TwitterEngagements, RedditEngagements, FacebookEngagements] = Field(
-        description="Engagement counts for the content item."
-    )
+    engagements: Engagements = Field(description="Engagement counts for the content item.")
 
     language: Optional[str] = Field(
         description="Language of the content item, as identified by the platform (potentially only on twitter).",
@@ -151,3 +203,124 @@ class RankingRequest(BaseModel):
         default=None,
     )
     items: list[ContentItem] = Field(description="The content items to be ranked.")
+
+    def to_columns(self):
+        """Return the items as a `ranking_challenge.columns.RequestColumns` (requires numpy)."""
+        from .columns import request_columns
+
+        return request_columns(self)
+
+
+# Trusted-input decoding
+#
+# `RankingRequest.model_validate_json` validates every field of every item, including
+# trying each engagement model in turn and parsing every embedded URL. Traffic that comes
+# from the PRC request router has already been validated upstream, so rankers can opt in
+# to a cheaper decode that trusts the shape of the payload.
+
+_url_adapter = TypeAdapter(HttpUrl)
+
+
+class LazyUrlList(list):
+    """A list of URLs that are only parsed into `HttpUrl` when they are read.
+
+    Items decoded with `trusted=True` store the raw strings sent by the router; each one is
+    converted (and cached) the first time it is accessed.
+    """
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = super().__getitem__(index)
+        if isinstance(value, str):
+            value = _url_adapter.validate_python(value)
+            super().__setitem__(index, value)
+        return value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _lazy_url_list(value):
+    return None if value is None else LazyUrlList(value)
+
+
+_LazyUrls = Annotated[Optional[list[Union[HttpUrl, str]]], PlainValidator(_lazy_url_list)]
+
+
+class _TrustedContentItem(ContentItem):
+    embedded_urls: _LazyUrls
+
+
+class _TrustedTwitterItem(_TrustedContentItem):
+    engagements: TwitterEngagements
+
+
+class _TrustedRedditItem(_TrustedContentItem):
+    engagements: RedditEngagements
+
+
+class _TrustedFacebookItem(_TrustedContentItem):
+    engagements: FacebookEngagements
+
+
+class _TrustedTwitterRequest(RankingRequest):
+    items: list[_TrustedTwitterItem]
+
+
+class _TrustedRedditRequest(RankingRequest):
+    items: list[_TrustedRedditItem]
+
+
+class _TrustedFacebookRequest(RankingRequest):
+    items: list[_TrustedFacebookItem]
+
+
+_TRUSTED_REQUEST_MODELS: dict[str, type[RankingRequest]] = {
+    "twitter": _TrustedTwitterRequest,
+    "reddit": _TrustedRedditRequest,
+    "facebook": _TrustedFacebookRequest,
+}
+
+# A guess at the session platform: the first unescaped `"platform": "..."` (quotes inside
+# JSON strings are always escaped). Engagement records may have a `platform` key too, so
+# the guess can be wrong; `parse_ranking_request` checks it against the parsed
+# `session.platform` and falls back to the full model when they differ.
+_PLATFORM_PATTERN = r'(?<!\\)"platform"\s*:\s*"(\w+)"'
+_platform_re = re.compile(_PLATFORM_PATTERN)
+_platform_re_bytes = re.compile(_PLATFORM_PATTERN.encode())
+
+
+def _sniff_platform(data: Union[str, bytes]) -> Optional[str]:
+    pattern = _platform_re_bytes if isinstance(data, (bytes, bytearray)) else _platform_re
+    match = pattern.search(data)
+    if match is None:
+        return None
+    platform = match.group(1)
+    return platform.decode() if isinstance(platform, bytes) else platform
+
+
+def parse_ranking_request(data: Union[str, bytes], trusted: bool = False) -> RankingRequest:
+    """Decode a JSON ranking request.
+
+    Args:
+        data: The raw request body.
+        trusted: If False (the default), this is equivalent to
+            `RankingRequest.model_validate_json(data)`. If True, the engagement model is
+            picked from `session.platform` instead of trying each one in turn, and embedded
+            URLs are kept as strings until they are read (see `LazyUrlList`).
+
+    Only enable `trusted` for traffic from the PRC request router, or another source that
+    has already validated the payload. Items are still instances of `ContentItem`.
+    """
+    if not trusted:
+        return RankingRequest.model_validate_json(data)
+
+    model = _TRUSTED_REQUEST_MODELS.get(_sniff_platform(data))
+    if model is None:
+        return RankingRequest.model_validate_json(data)
+    request = model.model_validate_json(data)
+    if _TRUSTED_REQUEST_MODELS[request.session.platform] is not model:
+        return RankingRequest.model_validate_json(data)
+    return request
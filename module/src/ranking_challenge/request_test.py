@@ -0,0 +1,94 @@
+import pytest
+from pydantic import HttpUrl
+from ranking_challenge import fake
+from ranking_challenge.request import (
+    ContentItem,
+    FacebookEngagements,
+    LazyUrlList,
+    RankingRequest,
+    RedditEngagements,
+    TwitterEngagements,
+    parse_ranking_request,
+)
+
+
+@pytest.mark.parametrize("platform", ["twitter", "reddit", "facebook"])
+def test_trusted_parse_matches_validated(platform):
+    request = fake.fake_request(n_posts=5, n_comments=2, platform=platform)
+    json_data = request.model_dump_json()
+
+    validated = RankingRequest.model_validate_json(json_data)
+    trusted = parse_ranking_request(json_data.encode(), trusted=True)
+
+    assert isinstance(trusted, RankingRequest)
+    assert all(isinstance(item, ContentItem) for item in trusted.items)
+    for expected, item in zip(validated.items, trusted.items):
+        assert type(item.engagements) is type(expected.engagements)
+        assert item.engagements == expected.engagements
+        assert item.created_at == expected.created_at
+        assert list(item.embedded_urls) == expected.embedded_urls
+    assert trusted.model_dump() == validated.model_dump()
+
+
+def test_trusted_parse_urls_are_lazy():
+    request = fake.fake_request(n_posts=1)
+    request.items[0].embedded_urls = ["https://example.com/a", "https://example.com/b"]
+
+    trusted = parse_ranking_request(request.model_dump_json(warnings=False), trusted=True)
+    urls = trusted.items[0].embedded_urls
+
+    assert isinstance(urls, LazyUrlList)
+    assert all(isinstance(url, str) for url in list.__iter__(urls))
+    assert urls[1] == HttpUrl("https://example.com/b")
+    assert isinstance(list.__getitem__(urls, 1), HttpUrl)
+    assert isinstance(list.__getitem__(urls, 0), str)
+
+
+def test_untrusted_parse_validates():
+    request = fake.fake_request(n_posts=1)
+    request.items[0].embedded_urls = ["not a url"]
+
+    with pytest.raises(ValueError):
+        parse_ranking_request(request.model_dump_json(warnings=False))
+
+
+@pytest.mark.parametrize(
+    "engagements, expected",
+    [
+        ({"retweet": 1, "like": 2, "comment": 3, "share": 4}, TwitterEngagements),
+        ({"comment": 3, "award": 0}, RedditEngagements),
+        ({"upvote": 5, "downvote": 1, "comment": 3, "award": 0}, RedditEngagements),
+        (
+            {
+                "like": 1,
+                "love": 2,
+                "care": 3,
+                "haha": 4,
+                "wow": 5,
+                "sad": 6,
+                "angry": 7,
+                "comment": 8,
+                "share": 9,
+            },
+            FacebookEngagements,
+        ),
+    ],
+)
+def test_engagements_discriminated_by_fields(engagements, expected):
+    item = fake.fake_item().model_dump()
+    item["engagements"] = engagements
+
+    loaded = ContentItem.model_validate(item)
+    assert type(loaded.engagements) is expected
+
+
+def test_engagements_explicit_platform():
+    item = fake.fake_item(platform="reddit").model_dump()
+    item["engagements"]["platform"] = "twitter"
+
+    # the explicit tag wins, so this reddit record fails twitter validation
+    with pytest.raises(ValueError):
+        ContentItem.model_validate(item)
+
+    item["engagements"]["platform"] = "reddit"
+    assert type(ContentItem.model_validate(item).engagements) is RedditEngagements
@@ -1,7 +1,8 @@
-from typing import Optional
+from typing import Optional, Union
 from uuid import uuid4
 
 from pydantic import BaseModel, Field, HttpUrl
+from pydantic_core import to_json
 
 
 class NewItem(BaseModel):
@@ -36,3 +37,33 @@ class RankingResponse(BaseModel):
         default=None,
     )
 
+
+def encode_ranking_response(
+    ranked_ids: list[str],
+    new_items: Optional[list[Union[NewItem, dict]]] = None,
+    metadata: Optional[Union[RankingResponseMetadata, dict]] = None,
+    debug: bool = False,
+) -> bytes:
+    """Serialize a ranking response straight to JSON bytes, without building a `RankingResponse`.
+
+    Args:
+        ranked_ids: The IDs of the content items, in display order.
+        new_items: New items to insert, as `NewItem`s or dicts with `id` and `url`.
+        metadata: Optional `RankingResponseMetadata` (or equivalent dict).
+        debug: If True, validate the response with `RankingResponse` and check that the IDs
+            are unique and that every new item appears in `ranked_ids`. Leave this off in
+            production; the checks cost about as much as building the model.
+
+    Returns:
+        The JSON body, in the same shape as `RankingResponse.model_dump_json()`. Return it with
+        a JSON content type, e.g. `Response(content=body, media_type="application/json")`.
+    """
+    if debug:
+        response = RankingResponse(ranked_ids=ranked_ids, new_items=new_items, metadata=metadata)
+        if len(set(response.ranked_ids)) != len(response.ranked_ids):
+            raise ValueError("ranked_ids contains duplicate IDs")
+        missing = {str(item.id) for item in response.new_items or []} - set(response.ranked_ids)
+        if missing:
+            raise ValueError(f"new_items not present in ranked_ids: {sorted(missing)}")
+
+    return to_json({"ranked_ids": ranked_ids, "new_items": new_items, "metadata": metadata})
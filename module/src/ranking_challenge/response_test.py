@@ -0,0 +1,46 @@
+import pytest
+from ranking_challenge import fake
+from ranking_challenge.response import (
+    NewItem,
+    RankingResponse,
+    RankingResponseMetadata,
+    encode_ranking_response,
+)
+
+
+def test_encode_matches_model_dump():
+    response = fake.fake_response([str(i) for i in range(5)], 2)
+    response.metadata = RankingResponseMetadata(intervention_on=True)
+
+    body = encode_ranking_response(
+        response.ranked_ids, response.new_items, response.metadata, debug=True
+    )
+
+    assert body == response.model_dump_json().encode()
+    assert RankingResponse.model_validate_json(body) == response
+
+
+def test_encode_accepts_dicts():
+    new_item = {"id": "new", "url": "https://example.com/new"}
+
+    body = encode_ranking_response(["a", "new"], [new_item], {"intervention_on": False})
+
+    loaded = RankingResponse.model_validate_json(body)
+    assert loaded.new_items == [NewItem(**new_item)]
+    assert loaded.metadata.intervention_on is False
+
+
+def test_encode_debug_checks_invariants():
+    with pytest.raises(ValueError, match="duplicate"):
+        encode_ranking_response(["a", "a"], debug=True)
+
+    new_item = {"id": "new", "url": "https://example.com/new"}
+    with pytest.raises(ValueError, match="new_items"):
+        encode_ranking_response(["a"], [new_item], debug=True)
+
+    with pytest.raises(ValueError):
+        encode_ranking_response(["a", "new"], [{"id": "new", "url": "not a url"}], debug=True)
+
+    # without debug, nothing is checked
+    body = encode_ranking_response(["a", "a"])
+    assert body == b'{"ranked_ids":["a","a"],"new_items":null,"metadata":null}'